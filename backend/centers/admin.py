@@ -6,7 +6,7 @@ from .models import Center
 class CenterAdmin(admin.ModelAdmin):
     """Admin for Center model"""
     list_display = ('name', 'county', 'address', 'lat', 'lng')
-    list_filter = ('county',)
+    list_filter = ('county_ref', 'constituency_ref')
     search_fields = ('name', 'address', 'county')
     readonly_fields = ('id',)
 
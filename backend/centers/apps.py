@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CentersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'centers'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .models import Center
+        from .nearest import center_changed
+
+        post_save.connect(center_changed, sender=Center, dispatch_uid='centers.nearest.center_saved')
+        post_delete.connect(center_changed, sender=Center, dispatch_uid='centers.nearest.center_deleted')
@@ -0,0 +1,283 @@
+"""
+Offline geocoding of registration centers.
+
+    python manage.py geocode_centers                      # every center missing lat/lng or constituency
+    python manage.py geocode_centers --county Nairobi --remote
+
+A ``Gazetteer`` is built from what the tree already holds: the polling
+stations (center names) and wards of centers that have coordinates, and the
+constituencies of the bundled boundary file. Names are normalized
+(lowercase, no punctuation, common abbreviations spelled out) and split into
+trigrams; each county has its own trigram index, so a lookup only compares
+against that county's places. A center without coordinates is placed at the
+best matching polling station, else at the middle of the best matching
+ward, within ``SIMILARITY``; station and ward names carrying numbers only
+match the same numbers. A constituency match only fills in ``constituency``.
+
+Centers with coordinates but no constituency get the constituency whose
+polygon contains them. With ``remote``, centers the gazetteer cannot place
+are sent to Google Maps (``GOOGLE_MAPS_API_KEY``). Every answer, including
+"not found", is kept in ``GeocodedAddress``, so each distinct address is
+sent once however often the job runs. A batch's addresses are resolved
+before its transaction opens, so no lock is held while waiting on Google.
+
+Updated centers are written with ``bulk_update`` and logged for
+``/api/sync/`` directly, since that sends no signals.
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import regions
+from core.geodata import constituencies, constituency_at
+from core.integrations import get_maps_client
+from core.models import Change
+from .models import Center, GeocodedAddress
+from .nearest import center_changed, haversine_km
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY = 0.6  # Least trigram similarity (shared / all trigrams) of a match
+AMBIGUOUS_KM = 2  # A name used by stations further apart than this places nothing
+
+STATION, WARD, CONSTITUENCY = 'station', 'ward', 'constituency'
+LOCATING = (STATION, WARD)  # Matches precise enough to take coordinates from
+
+ABBREVIATIONS = {
+    'pri': 'primary', 'prim': 'primary', 'pry': 'primary',
+    'sec': 'secondary', 'sch': 'school', 'schl': 'school',
+    'st': 'saint', 'ctr': 'centre', 'center': 'centre', 'mkt': 'market',
+    'disp': 'dispensary', 'hq': 'headquarters', 'poly': 'polytechnic',
+}
+
+Place = namedtuple('Place', 'name kind county constituency lat lng')
+
+
+def normalize(text):
+    """'St. Mary's Pri. Sch.' -> 'saint marys primary school'"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in re.findall(r'[a-z0-9]+', text.replace("'", '')))
+
+
+def trigrams(name):
+    """Trigrams of each word of a normalized name, padded as PostgreSQL's pg_trgm does"""
+    grams = set()
+    for word in name.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def numbers(name):
+    return [word for word in name.split() if word.isdigit()]
+
+
+class Gazetteer:
+    """Named places of each county, indexed by trigram"""
+
+    def __init__(self, places):
+        self.places = places
+        self.grams = [trigrams(place.name) for place in places]
+        self.postings = defaultdict(lambda: defaultdict(list))  # (county, kind) -> trigram -> place indexes
+        self.exact = {}
+        for i, place in enumerate(places):
+            self.exact.setdefault((place.county, place.kind, place.name), place)
+            postings = self.postings[place.county, place.kind]
+            for gram in self.grams[i]:
+                postings[gram].append(i)
+
+    @classmethod
+    def load(cls):
+        stations, wards = defaultdict(list), defaultdict(list)
+        rows = Center.objects.exclude(lat=None).exclude(lng=None).order_by().values_list(
+            'name', 'polling_station_name', 'county', 'constituency', 'ward', 'lat', 'lng')
+        for name, station, county, constituency, ward, lat, lng in rows.iterator(5000):
+            county, point = normalize(county), (float(lat), float(lng), constituency)
+            for station_name in {normalize(name), normalize(station)} - {''}:
+                stations[county, station_name].append(point)
+            if ward:
+                wards[county, normalize(ward)].append(point)
+
+        places = []
+        for kind, named in ((STATION, stations), (WARD, wards)):
+            for (county, name), points in named.items():
+                lat, lng = sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
+                if kind == STATION and any(haversine_km(lat, lng, p[0], p[1]) > AMBIGUOUS_KM for p in points):
+                    continue
+                constituency = Counter(p[2] for p in points if p[2]).most_common(1)
+                places.append(Place(name, kind, county, constituency[0][0] if constituency else None, lat, lng))
+        for constituency in constituencies():
+            places.append(Place(normalize(constituency['name']), CONSTITUENCY, normalize(constituency['county']),
+                                constituency['name'], None, None))
+        return cls(places)
+
+    def search(self, text, county, kind):
+        """The ``kind`` place of ``county`` most similar to ``text``, or None"""
+        name = normalize(text)
+        if not name:
+            return None
+        place = self.exact.get((county, kind, name))
+        if place is not None:
+            return place
+        grams = trigrams(name)
+        shared = Counter()
+        postings = self.postings.get((county, kind), {})
+        for gram in grams:
+            shared.update(postings.get(gram, ()))
+        best, best_score = None, SIMILARITY
+        for i, count in shared.items():
+            score = count / (len(grams) + len(self.grams[i]) - count)
+            if score >= best_score and (kind == CONSTITUENCY or numbers(self.places[i].name) == numbers(name)):
+                best, best_score = self.places[i], score
+        return best
+
+    def locate(self, center):
+        """The best place for a center: a station, else a ward, else a constituency; or None"""
+        county = normalize(center.county)
+        parts = [part for part in (center.address or '').split(',') if normalize(part) not in ('', county)]
+        for kind, texts in ((STATION, [center.polling_station_name, center.name, *parts]),
+                            (WARD, [center.ward, *parts]),
+                            (CONSTITUENCY, [center.constituency, *parts])):
+            for text in texts:
+                place = self.search(text, county, kind) if text else None
+                if place is not None:
+                    return place
+        return None
+
+
+def address_query(center):
+    """What is sent to the remote geocoder for a center"""
+    parts = (center.polling_station_name or center.name, center.address, center.county, 'Kenya')
+    return ', '.join(dict.fromkeys(part.strip() for part in parts if part and part.strip()))
+
+
+def address_key(query):
+    return hashlib.sha256(normalize(query).encode()).hexdigest()
+
+
+def remote_geocode(query):
+    """``(lat, lng)`` from Google Maps, or None when it has no result; raises when it fails"""
+    results = get_maps_client().geocode(query, components={'country': 'KE'})
+    if not results:
+        return None
+    location = results[0]['geometry']['location']
+    return location['lat'], location['lng']
+
+
+def coordinate(value):
+    return Decimal(f'{value:.8f}')
+
+
+def remote_answers(gazetteer, centers, counts):
+    """
+    ``{address key: GeocodedAddress}`` for the ``centers`` the gazetteer
+    cannot place, asking Google Maps for the addresses not asked before.
+    """
+    queries = {}
+    for center in centers:
+        if center.get_coordinates() is None:
+            place = gazetteer.locate(center)
+            if place is None or place.kind not in LOCATING:
+                query = address_query(center)
+                queries[address_key(query)] = query
+
+    answers = GeocodedAddress.objects.in_bulk(list(queries), field_name='key')
+    for key, query in queries.items():
+        if key in answers:
+            continue
+        try:
+            location = remote_geocode(query)
+        except Exception:
+            # Not cached: a later run asks again
+            logger.exception('Geocoding %r failed', query)
+            continue
+        answers[key] = GeocodedAddress.objects.create(
+            key=key, query=query,
+            lat=coordinate(location[0]) if location else None,
+            lng=coordinate(location[1]) if location else None)
+        counts['remote'] += 1
+    return answers
+
+
+def geocode_batch(gazetteer, centers, answers, counts):
+    """
+    Fill in what is missing on ``centers``; returns those changed. Centers
+    the gazetteer cannot place take the remote ``answers`` (see
+    ``remote_answers``), if given.
+    """
+    changed, filled = {}, set()
+    for center in centers:
+        # Centers with coordinates take their constituency from the boundary file below
+        place = gazetteer.locate(center) if center.get_coordinates() is None else None
+        if center.get_coordinates() is None:
+            if place is not None and place.kind in LOCATING:
+                center.lat, center.lng = coordinate(place.lat), coordinate(place.lng)
+                counts[place.kind] += 1
+                changed[center.pk] = center
+            else:
+                answer = answers.get(address_key(address_query(center))) if answers is not None else None
+                if answer is None or answer.lat is None:
+                    counts['unplaced'] += 1
+                else:
+                    center.lat, center.lng = answer.lat, answer.lng
+                    counts['geocoded'] += 1
+                    changed[center.pk] = center
+        if place is not None and place.constituency and not center.constituency:
+            center.constituency = place.constituency
+            changed[center.pk] = center
+            filled.add(center.pk)
+
+    for center in centers:
+        coordinates = center.get_coordinates()
+        if not center.constituency and coordinates is not None:
+            found = constituency_at(*coordinates)
+            if found is not None:
+                center.constituency = found['name']
+                changed[center.pk] = center
+                filled.add(center.pk)
+    counts['constituency'] += len(filled)
+
+    now = timezone.now()
+    for center in changed.values():
+        center.updated_at = now
+        regions.assign(center)
+    Center.objects.bulk_update(changed.values(), ['lat', 'lng', 'constituency', 'constituency_ref', 'county_ref',
+                                                  'ward_ref', 'updated_at'])
+    Change.objects.bulk_create([Change(model='centers', object_id=pk, action=Change.UPDATED) for pk in changed])
+    return list(changed.values())
+
+
+def geocode_centers(centers=None, remote=False, batch_size=500):
+    """
+    Fill in ``lat``/``lng`` and ``constituency`` where missing, for all
+    centers or the ``centers`` queryset. Returns counts by outcome: how many
+    were placed at a ``station`` or ``ward``, ``geocoded`` remotely (with
+    ``remote`` API calls made), left ``unplaced``, given a ``constituency``,
+    and ``updated`` in all.
+    """
+    centers = Center.objects.all() if centers is None else centers
+    missing = Q(lat=None) | Q(lng=None) | Q(constituency=None) | Q(constituency='')
+    ids = list(centers.filter(missing).order_by().values_list('pk', flat=True))
+    counts = Counter()
+    if not ids:
+        return counts
+    if remote and get_maps_client() is None:
+        logger.warning('GOOGLE_MAPS_API_KEY is not set; geocoding offline only')
+        remote = False
+    gazetteer = Gazetteer.load()
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        answers = remote_answers(gazetteer, Center.objects.filter(pk__in=batch_ids), counts) if remote else None
+        with transaction.atomic():
+            batch = list(Center.objects.filter(pk__in=batch_ids))
+            counts['updated'] += len(geocode_batch(gazetteer, batch, answers, counts))
+    if counts['updated']:
+        center_changed(Center)
+    return counts
@@ -0,0 +1,51 @@
+"""
+Fill in missing coordinates and constituencies of registration centers.
+
+    python manage.py geocode_centers
+    python manage.py geocode_centers --county Nairobi --remote    # Google Maps for what is left
+    python manage.py geocode_centers --queue                      # as a background job
+
+Centers are matched offline against the polling stations, wards and
+constituencies already known; ``--remote`` sends the rest to Google Maps
+once per distinct address. See ``centers.geocoder``.
+"""
+import operator
+import time
+from functools import reduce
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from centers import geocoder
+from centers.models import Center
+from centers.tasks import geocode_centers
+from core.regions import county_filter
+
+
+class Command(BaseCommand):
+    help = 'Fill in missing coordinates and constituencies of registration centers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--county', action='append', default=[], help='County to geocode (repeatable)')
+        parser.add_argument('--remote', action='store_true', help='Ask Google Maps for centers not found offline')
+        parser.add_argument('--batch-size', type=int, default=500, help='Centers updated per transaction')
+        parser.add_argument('--queue', action='store_true', help='Queue a job per county (or one) instead of running now')
+
+    def handle(self, *args, **options):
+        counties = options['county']
+        if options['queue']:
+            payloads = [{'county': county, 'remote': options['remote']} for county in counties]
+            geocode_centers.enqueue_many(payloads or [{'remote': options['remote']}])
+            self.stdout.write(f'Queued {len(payloads) or 1} jobs')
+            return
+
+        centers = Center.objects.all()
+        if counties:
+            centers = centers.filter(reduce(operator.or_, (Q(**county_filter(county)) for county in counties)))
+        started = time.monotonic()
+        counts = geocoder.geocode_centers(centers, remote=options['remote'], batch_size=options['batch_size'])
+        self.stdout.write(
+            f"Updated {counts['updated']} centers in {time.monotonic() - started:.1f}s: "
+            f"{counts['station']} by polling station, {counts['ward']} by ward, "
+            f"{counts['geocoded']} remotely ({counts['remote']} requests), "
+            f"{counts['constituency']} constituencies filled, {counts['unplaced']} not placed")
@@ -0,0 +1,46 @@
+"""
+Assign users their nearest registration center and an open squad near it.
+
+    python manage.py recommend_centers --county Nairobi --county Kiambu
+    python manage.py recommend_centers --all --queue     # one background job per county
+
+Recommendations are stored in ``CenterRecommendation`` for SMS campaigns.
+Users are placed by their saved coordinates, else their ward, else their
+county. See ``centers.nearest``.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from centers import nearest
+from centers.tasks import recommend_county
+from core.models import County
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Store each user's nearest registration center and an open squad near it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--county', action='append', default=[], help='County to assign (repeatable)')
+        parser.add_argument('--all', action='store_true', help='Every county with users')
+        parser.add_argument('--queue', action='store_true', help='Queue a job per county instead of running now')
+
+    def handle(self, *args, **options):
+        counties = options['county']
+        if options['all']:
+            counties = list(County.objects.filter(Exists(User.objects.filter(county_ref=OuterRef('pk'))))
+                            .values_list('name', flat=True))
+        if not counties:
+            raise CommandError('Pass --county or --all')
+
+        if options['queue']:
+            recommend_county.enqueue_many([{'county': county} for county in counties])
+            self.stdout.write(f'Queued {len(counties)} counties')
+            return
+        distances = 'NumPy' if nearest.np is not None else 'Python'
+        for county in counties:
+            started = time.monotonic()
+            assigned = nearest.recommend_county(county)
+            self.stdout.write(f'{county}: {assigned} users in {time.monotonic() - started:.1f}s ({distances})')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0002_center_constituency_center_polling_station_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="center",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0003_center_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="center",
+            index=models.Index(
+                fields=["county", "name"], name="centers_center_county_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:46
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0004_indexes"),
+        ("squads", "0008_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CenterRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "county",
+                    models.CharField(
+                        help_text="The user's county when recommended", max_length=50
+                    ),
+                ),
+                ("distance_km", models.FloatField()),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("coordinates", "Coordinates"),
+                            ("ward", "Ward"),
+                            ("county", "County"),
+                        ],
+                        help_text="Where the user's location came from",
+                        max_length=20,
+                    ),
+                ),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "center",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommendations",
+                        to="centers.center",
+                    ),
+                ),
+                (
+                    "squad",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Nearest public squad with free slots",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="recommendations",
+                        to="squads.squad",
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="center_recommendation",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["county", "center"], name="centers_recommendation_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:55
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0005_centerrecommendation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodedAddress",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="SHA-256 of the normalized query",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                ("query", models.TextField()),
+                (
+                    "lat",
+                    models.DecimalField(
+                        blank=True, decimal_places=8, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "lng",
+                    models.DecimalField(
+                        blank=True, decimal_places=8, max_digits=11, null=True
+                    ),
+                ),
+                ("provider", models.CharField(default="google", max_length=20)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name_plural": "geocoded addresses",
+            },
+        ),
+    ]
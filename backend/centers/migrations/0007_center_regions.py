@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from core.regions import backfill
+    backfill(apps.get_model, models=[('centers', 'Center')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0006_geocodedaddress"),
+        ("core", "0005_regions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="center",
+            name="constituency_ref",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Set from constituency",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="centers",
+                to="core.constituency",
+                verbose_name="constituency",
+            ),
+        ),
+        migrations.AddField(
+            model_name="center",
+            name="county_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                help_text="Set from county",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="centers",
+                to="core.county",
+                verbose_name="county",
+            ),
+        ),
+        migrations.AddField(
+            model_name="center",
+            name="ward_ref",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Set from ward",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="centers",
+                to="core.ward",
+                verbose_name="ward",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="center",
+            index=models.Index(
+                fields=["county_ref", "name"], name="centers_center_region_idx"
+            ),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
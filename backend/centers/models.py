@@ -1,30 +1,104 @@
+from django.conf import settings
 from django.db import models
-import uuid
+from core.ids import uuid7
+from core.regions import RegionFields
 
 
-class Center(models.Model):
+class Center(RegionFields, models.Model):
     """
     IEBC Registration Center model
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=200)
     county = models.CharField(max_length=50)
     constituency = models.CharField(max_length=100, blank=True, null=True)
     ward = models.CharField(max_length=100, blank=True, null=True)
+    county_ref = models.ForeignKey('core.County', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                   db_index=False, related_name='centers', verbose_name='county',
+                                   help_text="Set from county")  # Indexed by centers_center_region_idx
+    constituency_ref = models.ForeignKey('core.Constituency', on_delete=models.SET_NULL, null=True, blank=True,
+                                         editable=False, related_name='centers', verbose_name='constituency',
+                                         help_text="Set from constituency")
+    ward_ref = models.ForeignKey('core.Ward', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                 related_name='centers', verbose_name='ward', help_text="Set from ward")
     polling_station_name = models.CharField(max_length=200, blank=True, null=True, help_text="Primary school or polling station name")
     address = models.TextField()
     lat = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
     lng = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
     opening_hours = models.JSONField(blank=True, null=True, help_text="Store opening hours as JSON")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    region_fields = ('county', 'constituency', 'ward')
+    creates_wards = True
 
     def __str__(self):
         return f"{self.name} - {self.county}"
 
     class Meta:
         ordering = ['county', 'name']
+        indexes = [
+            # Centers of a county by name, and the full list in its default order
+            models.Index(fields=['county', 'name'], name='centers_center_county_idx'),
+            # Centers of a county by name, filtered by its key (CentersByCountyView)
+            models.Index(fields=['county_ref', 'name'], name='centers_center_region_idx'),
+        ]
 
     def get_coordinates(self):
         """Return coordinates as a tuple"""
         if self.lat and self.lng:
             return (float(self.lat), float(self.lng))
         return None
+
+
+class CenterRecommendation(models.Model):
+    """
+    The registration center nearest a user, and an open squad to join near
+    it, assigned in bulk for SMS campaigns (see centers.nearest).
+    """
+    SOURCE_CHOICES = [
+        ('coordinates', 'Coordinates'),
+        ('ward', 'Ward'),
+        ('county', 'County'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                related_name='center_recommendation')
+    county = models.CharField(max_length=50, help_text="The user's county when recommended")
+    center = models.ForeignKey(Center, on_delete=models.CASCADE, related_name='recommendations')
+    distance_km = models.FloatField()
+    squad = models.ForeignKey('squads.Squad', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='recommendations', help_text="Nearest public squad with free slots")
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES,
+                              help_text="Where the user's location came from")
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.center_id}"
+
+    class Meta:
+        indexes = [
+            # A county's recommendations, by center, for a campaign
+            models.Index(fields=['county', 'center'], name='centers_recommendation_idx'),
+        ]
+
+
+class GeocodedAddress(models.Model):
+    """
+    A remote geocoder's answer for one address, so each distinct address
+    is only sent once (see centers.geocoder). No coordinates means the
+    geocoder found nothing.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the normalized query")
+    query = models.TextField()
+    lat = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    lng = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    provider = models.CharField(max_length=20, default='google')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.query
+
+    class Meta:
+        verbose_name_plural = 'geocoded addresses'
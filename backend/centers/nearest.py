@@ -0,0 +1,239 @@
+"""
+Nearest registration centers, and open squads to join at them.
+
+    GET /api/centers/nearby/                        # from the user's saved location
+    GET /api/centers/nearby/?lat=-1.2864&lng=36.8172&limit=5&squads=3
+
+    {
+        "origin": {"lat": -1.2864, "lng": 36.8172, "source": "coordinates"},
+        "results": [
+            {"id": "...", "name": "...", ..., "distance": 0.84,
+             "open_squads": [{"id": "...", "name": "...", "member_count": 4, "remaining_slots": 6, ...}]},
+            ...
+        ]
+    }
+
+Distances are great-circle (haversine) distances from the origin to every
+center, computed over an in-memory array of center coordinates
+(``CenterIndex``) rather than in SQL, which SQLite cannot index. NumPy
+ranks all centers in one vectorized pass when it is installed; without it
+the formula runs in a Python loop. The index is loaded on first use and
+reloaded after a center changes in this process, or after
+``CENTER_INDEX_MAX_AGE`` seconds so other processes' changes show up.
+
+The origin is the user's coordinates, else the middle of the centers in
+their ward, else in their county. ``recommend_county()`` assigns every user
+of a county their nearest center and an open squad near it in one pass, for
+SMS campaigns (``manage.py recommend_centers``).
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.regions import in_county
+from squads import discovery
+from squads.models import Squad, SquadMember
+from users.models import User
+from .models import Center, CenterRecommendation
+
+try:
+    import numpy as np
+except ImportError:  # Optional; without it distances are computed in a Python loop
+    np = None
+
+EARTH_RADIUS_KM = 6371.0088
+BLOCK_SIZE = 4_000_000  # Origin x center similarities held in memory at once
+
+_lock = threading.Lock()
+_index = None
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in degrees"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class CenterIndex:
+    """
+    Coordinates of every center that has them, and the middle of each ward
+    and county.
+
+    With NumPy, centers are also kept as unit vectors: the nearest centers to
+    a point are those with the largest dot product with it, so a block of
+    origins is ranked against every center with one matrix multiplication,
+    and the haversine formula only runs for the few closest.
+    """
+
+    def __init__(self, rows):
+        self.ids = []
+        lats, lngs = [], []
+        areas = defaultdict(list)
+        for center_id, lat, lng, county_id, ward_id in rows:
+            self.ids.append(center_id)
+            lats.append(lat)
+            lngs.append(lng)
+            if county_id:
+                areas['county', county_id].append((lat, lng))
+            if ward_id:
+                areas['ward', ward_id].append((lat, lng))
+        if np is not None:
+            # In radians
+            self.lats, self.lngs = np.radians(lats), np.radians(lngs)
+            self.vectors = unit_vectors(self.lats, self.lngs)
+        else:
+            self.lats, self.lngs = lats, lngs
+        self.middles = {area: (sum(lat for lat, _ in points) / len(points), sum(lng for _, lng in points) / len(points))
+                        for area, points in areas.items()}
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls):
+        rows = Center.objects.exclude(lat=None).exclude(lng=None).order_by().values_list(
+            'id', 'lat', 'lng', 'county_ref_id', 'ward_ref_id')
+        return cls((center_id, float(lat), float(lng), county_id, ward_id)
+                   for center_id, lat, lng, county_id, ward_id in rows.iterator(5000))
+
+    def origin(self, user):
+        """``(lat, lng, source)`` to measure from for ``user``, or None"""
+        coordinates = user.get_coordinates()
+        if coordinates is not None:
+            return (*coordinates, 'coordinates')
+        if ('ward', user.ward_ref_id) in self.middles:
+            return (*self.middles['ward', user.ward_ref_id], 'ward')
+        if ('county', user.county_ref_id) in self.middles:
+            return (*self.middles['county', user.county_ref_id], 'county')
+        return None
+
+    def nearest(self, lat, lng, limit):
+        """``[(center id, km), ...]`` of the ``limit`` nearest centers to (lat, lng), nearest first"""
+        if np is not None:
+            return self.nearest_many([(lat, lng)], limit)[0]
+        distances = [haversine_km(lat, lng, center_lat, center_lng) for center_lat, center_lng in zip(self.lats, self.lngs)]
+        order = sorted(range(len(distances)), key=distances.__getitem__)[:limit]
+        return [(self.ids[i], distances[i]) for i in order]
+
+    def nearest_many(self, origins, limit):
+        """``nearest()`` for each of many ``(lat, lng)`` origins, a block of origins at a time"""
+        limit = min(limit, len(self.ids))
+        if limit <= 0:
+            # No center has coordinates yet
+            return [[] for _ in origins]
+        if np is None:
+            return [self.nearest(lat, lng, limit) for lat, lng in origins]
+        results = []
+        points = np.radians(np.array(origins, dtype=float).reshape(-1, 2))
+        rows = max(1, BLOCK_SIZE // len(self.ids))
+        for start in range(0, len(points), rows):
+            block = points[start:start + rows]
+            similarity = unit_vectors(block[:, 0], block[:, 1]) @ self.vectors.T
+            if limit < len(self.ids):
+                closest = np.argpartition(-similarity, limit - 1, axis=1)[:, :limit]
+            else:
+                closest = np.broadcast_to(np.arange(limit), (len(block), limit))
+            distances = haversine(block[:, 0:1], block[:, 1:2], self.lats[closest], self.lngs[closest])
+            order = np.argsort(distances, axis=1)
+            closest = np.take_along_axis(closest, order, axis=1).tolist()
+            distances = np.take_along_axis(distances, order, axis=1).tolist()
+            results.extend([(self.ids[i], km) for i, km in zip(row, row_km)]
+                           for row, row_km in zip(closest, distances))
+        return results
+
+
+def unit_vectors(lats, lngs):
+    """Points on the unit sphere for latitudes and longitudes in radians"""
+    cos_lats = np.cos(lats)
+    return np.column_stack((cos_lats * np.cos(lngs), cos_lats * np.sin(lngs), np.sin(lats)))
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """``haversine_km`` over NumPy arrays in radians"""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def get_index():
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index.loaded_at > settings.CENTER_INDEX_MAX_AGE:
+        with _lock:
+            if _index is index or _index is None:
+                _index = CenterIndex.load()
+            index = _index
+    return index
+
+
+def center_changed(sender, **kwargs):
+    """Reload the index on next use"""
+    global _index
+    _index = None
+
+
+def open_squads_queryset(center_ids):
+    """Public squads with free slots at these centers, most room first (see squads.discovery)"""
+    return Squad.objects.with_stats().filter(opening__registration_center_id__in=center_ids).order_by(
+        *discovery.ranking('opening__'), 'pk')
+
+
+def open_squads(center_ids, exclude_user=None):
+    """``open_squads_queryset()`` by center, leaving out those ``exclude_user`` belongs to"""
+    squads = open_squads_queryset(center_ids)
+    if exclude_user is not None:
+        squads = squads.exclude(members__user=exclude_user)
+    by_center = defaultdict(list)
+    for squad in squads:
+        by_center[squad.registration_center_id].append(squad)
+    return by_center
+
+
+def recommend_county(county, candidates=5, batch_size=2000):
+    """
+    Store the nearest center and an open squad near it for every active
+    user of ``county`` (see CenterRecommendation). Users sharing an origin,
+    e.g. everyone placed by their ward, are measured once. Returns the
+    number of users assigned.
+    """
+    index = get_index()
+    users = in_county(User.objects.filter(is_active=True), county).order_by().only(
+        'id', 'county_ref', 'ward_ref', 'latitude', 'longitude')
+    assigned = 0
+    batch = []
+    for user in users.iterator(batch_size):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            assigned += recommend_batch(index, county, batch, candidates)
+            batch = []
+    return assigned + recommend_batch(index, county, batch, candidates)
+
+
+def recommend_batch(index, county, users, candidates):
+    placed = [(user, index.origin(user)) for user in users]
+    placed = [(user, origin) for user, origin in placed if origin is not None]
+    if not placed:
+        return 0
+    origins = list(dict.fromkeys((lat, lng) for _, (lat, lng, _) in placed))
+    nearest = dict(zip(origins, index.nearest_many(origins, candidates)))
+    squads = open_squads({center_id for centers in nearest.values() for center_id, _ in centers})
+    joined = set(SquadMember.objects.filter(user__in=[user for user, _ in placed]).values_list('user_id', 'squad_id'))
+
+    now = timezone.now()
+    recommendations = []
+    for user, (lat, lng, source) in placed:
+        centers = nearest[lat, lng]
+        if not centers:
+            continue
+        squad = next((squad for center_id, _ in centers for squad in squads.get(center_id, ())
+                      if (user.pk, squad.pk) not in joined), None)
+        center_id, distance = centers[0]
+        recommendations.append(CenterRecommendation(
+            user=user, county=county, center_id=center_id, distance_km=round(distance, 3),
+            squad=squad, source=source, computed_at=now))
+    CenterRecommendation.objects.bulk_create(
+        recommendations, update_conflicts=True, unique_fields=['user'],
+        update_fields=['county', 'center', 'distance_km', 'squad', 'source', 'computed_at'])
+    return len(recommendations)
@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from core.sparse import SparseFieldsetMixin
 from .models import Center
+from .nearest import haversine_km
+from .tasks import geocode_centers
 
 
-class CenterSerializer(serializers.ModelSerializer):
+class CenterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Center model"""
     distance = serializers.SerializerMethodField()
 
@@ -10,15 +13,44 @@ class CenterSerializer(serializers.ModelSerializer):
         model = Center
         fields = ('id', 'name', 'county', 'constituency', 'ward', 'polling_station_name',
                  'address', 'lat', 'lng', 'opening_hours', 'distance')
+        sparse_sources = {'distance': ('lat', 'lng')}
 
     def get_distance(self, obj):
-        """Calculate distance from user's location (if provided)"""
-        request = self.context.get('request')
-        if request and hasattr(request, 'user') and request.user.latitude and request.user.longitude:
-            # This would use a distance calculation library in production
-            # For now, return None or a mock value
-            return None
-        return None
+        """Kilometres from the user's saved location, when both are known"""
+        distance = getattr(obj, 'distance_km', None)
+        if distance is None:
+            request = self.context.get('request')
+            user = getattr(request, 'user', None)
+            origin = user.get_coordinates() if getattr(user, 'is_authenticated', False) else None
+            coordinates = obj.get_coordinates()
+            if origin is None or coordinates is None:
+                return None
+            distance = haversine_km(*origin, *coordinates)
+        return round(distance, 2)
+
+
+class NearbyQuerySerializer(serializers.Serializer):
+    """Query parameters of /api/centers/nearby/"""
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lng = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=50)
+    squads = serializers.IntegerField(required=False, default=3, min_value=0, max_value=10,
+                                      help_text="Open squads listed per center")
+
+    def validate(self, data):
+        if ('lat' in data) != ('lng' in data):
+            raise serializers.ValidationError("Pass both lat and lng, or neither.")
+        return data
+
+
+class CenterSyncSerializer(serializers.ModelSerializer):
+    """Center as delivered by /api/sync/"""
+
+    class Meta:
+        model = Center
+        fields = ('id', 'name', 'county', 'constituency', 'ward', 'polling_station_name',
+                 'address', 'lat', 'lng', 'opening_hours', 'updated_at')
+        read_only_fields = fields
 
 
 class CenterCreateSerializer(serializers.ModelSerializer):
@@ -30,6 +62,8 @@ class CenterCreateSerializer(serializers.ModelSerializer):
                  'address', 'lat', 'lng', 'opening_hours')
 
     def create(self, validated_data):
-        # In production, you might want to geocode the address
-        # to get lat/lng coordinates if not provided
-        return super().create(validated_data)
+        center = super().create(validated_data)
+        if center.get_coordinates() is None or not center.constituency:
+            # Matched against the gazetteer, or geocoded once per address, by a job
+            geocode_centers.enqueue({'center_ids': [str(center.pk)], 'remote': True})
+        return center
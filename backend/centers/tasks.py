@@ -0,0 +1,22 @@
+from core.regions import in_county
+from jobs.queue import task
+
+from . import geocoder, nearest
+from .models import Center
+
+
+@task(name='centers.recommend_county', priority=-5, max_attempts=3)
+def recommend_county(payload):
+    """Assign every user of a county their nearest center and an open squad, for an SMS campaign"""
+    nearest.recommend_county(payload['county'])
+
+
+@task(name='centers.geocode_centers', priority=-5, max_attempts=3)
+def geocode_centers(payload):
+    """Fill in missing coordinates and constituencies of centers (see centers.geocoder)"""
+    centers = Center.objects.all()
+    if payload.get('center_ids'):
+        centers = centers.filter(pk__in=payload['center_ids'])
+    if payload.get('county'):
+        centers = in_county(centers, payload['county'])
+    geocoder.geocode_centers(centers, remote=payload.get('remote', False))
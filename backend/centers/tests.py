@@ -1,3 +1,145 @@
-from django.test import TestCase
+import datetime
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from core import regions
+from core.regions import resolver
+from squads.models import Squad, SquadMember
+from users.models import User
+from . import nearest, tasks
+from .models import Center, CenterRecommendation, GeocodedAddress
+from .nearest import CenterIndex
+from .views import async_centers_by_county
+
+
+class CenterIndexTests(TestCase):
+    ROWS = [('a', -1.2864, 36.8172, None, None), ('b', -4.0435, 39.6682, None, None), ('c', -0.0917, 34.768, None, None)]
+
+    def test_nearest_first(self):
+        for np in (nearest.np, None):
+            with self.subTest(numpy=np is not None), mock.patch.object(nearest, 'np', np):
+                found = CenterIndex(self.ROWS).nearest(-1.29, 36.82, 2)
+                self.assertEqual([center_id for center_id, _ in found], ['a', 'c'])
+                self.assertLess(found[0][1], 1)
+
+    def test_empty_index(self):
+        # A fresh deployment: no center has coordinates yet
+        for np in (nearest.np, None):
+            with self.subTest(numpy=np is not None), mock.patch.object(nearest, 'np', np):
+                index = CenterIndex([])
+                self.assertEqual(index.nearest(-1.2, 36.8, 5), [])
+                self.assertEqual(index.nearest_many([(-1.2, 36.8), (0.5, 35.2)], 5), [[], []])
+
+    def test_users_without_a_candidate_center_are_skipped(self):
+        user = User.objects.create_user('+254700000001', 'user@example.com', latitude='-1.2864', longitude='36.8172')
+        self.assertEqual(nearest.recommend_batch(CenterIndex([]), 'Nairobi', [user], 5), 0)
+
+
+class NearbyCentersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        if resolver().county('Nairobi') is None:
+            regions.seed()
+        cls.kilimani = Center.objects.create(name='Kilimani Primary School', county='Nairobi', address='Kilimani',
+                                             lat='-1.29000000', lng='36.78000000')
+        cls.mombasa = Center.objects.create(name='Tononoka Hall', county='Mombasa', address='Tononoka',
+                                            lat='-4.05000000', lng='39.66000000')
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        cls.squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=cls.owner, is_public=True,
+                                         max_members=10, registration_center=cls.kilimani,
+                                         voter_registration_date=datetime.date(2027, 1, 15))
+        SquadMember.objects.create(squad=cls.squad, user=cls.owner, role='leader')
+        cls.located = User.objects.create_user('+254700000002', 'located@example.com', county='Nairobi',
+                                               latitude='-1.28640000', longitude='36.81720000')
+        cls.in_county = User.objects.create_user('+254700000003', 'county@example.com', county='nairobi')
+        cls.unplaced = User.objects.create_user('+254700000004', 'unplaced@example.com')
+
+    def setUp(self):
+        nearest.center_changed(Center)
+        self.client = APIClient()
+
+    def nearby(self, user, query=''):
+        self.client.force_authenticate(user)
+        return self.client.get(f'/api/centers/nearby/{query}')
+
+    def test_coordinates(self):
+        data = self.nearby(self.unplaced, '?lat=-4.0435&lng=39.6682&limit=1').json()
+        self.assertEqual(data['origin'], {'lat': -4.0435, 'lng': 39.6682, 'source': 'coordinates'})
+        self.assertEqual([center['name'] for center in data['results']], ['Tononoka Hall'])
+        self.assertLess(data['results'][0]['distance'], 2)
+
+    def test_saved_location(self):
+        data = self.nearby(self.located).json()
+        self.assertEqual(data['origin']['source'], 'coordinates')
+        self.assertEqual([center['name'] for center in data['results']], ['Kilimani Primary School', 'Tononoka Hall'])
+        self.assertEqual([squad['name'] for squad in data['results'][0]['open_squads']], ['Kilimani'])
+        self.assertEqual(data['results'][0]['open_squads'][0]['remaining_slots'], 9)
+
+        data = self.nearby(self.in_county).json()
+        self.assertEqual(data['origin']['source'], 'county')
+        self.assertEqual(data['results'][0]['name'], 'Kilimani Primary School')
+
+    def test_open_squads_leave_out_the_users_own(self):
+        data = self.nearby(self.owner, '?lat=-1.29&lng=36.78&limit=1').json()
+        self.assertEqual(data['results'][0]['open_squads'], [])
+
+    def test_invalid(self):
+        self.assertEqual(self.nearby(self.unplaced).status_code, 400)
+        self.assertEqual(self.nearby(self.unplaced, '?lat=-1.29').status_code, 400)
+        self.assertEqual(self.nearby(self.unplaced, '?lat=91&lng=36.78').status_code, 400)
+
+    def test_recommend_county(self):
+        self.assertEqual(nearest.recommend_county('Nairobi'), 2)
+        recommendations = {recommendation.user_id: recommendation
+                           for recommendation in CenterRecommendation.objects.all()}
+        self.assertEqual(set(recommendations), {self.located.pk, self.in_county.pk})
+        located = recommendations[self.located.pk]
+        self.assertEqual((located.center_id, located.squad_id, located.source),
+                         (self.kilimani.pk, self.squad.pk, 'coordinates'))
+        self.assertEqual(recommendations[self.in_county.pk].source, 'county')
+
+        # Joining the squad leaves the user with the center but no squad to suggest; rerunning updates in place
+        SquadMember.objects.create(squad=self.squad, user=self.located)
+        self.assertEqual(nearest.recommend_county('Nairobi'), 2)
+        located = CenterRecommendation.objects.get(user=self.located)
+        self.assertEqual((located.center_id, located.squad_id), (self.kilimani.pk, None))
+        self.assertEqual(CenterRecommendation.objects.count(), 2)
+
+
+class AsyncCentersByCountyTests(TestCase):
+    async def test_resolves_county_off_the_event_loop(self):
+        await Center.objects.acreate(name='Kilimani Primary School', county='Nairobi', address='Kilimani')
+        resolver.cache_clear()  # Loaded on first use, which must not happen on the event loop
+        response = await async_centers_by_county(AsyncRequestFactory().get('/'), 'NAIROBI')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([center['name'] for center in json.loads(response.content)['results']],
+                         ['Kilimani Primary School'])
+
+
+class GeocodeTests(TestCase):
+    def test_remote_geocoding_by_county(self):
+        if resolver().county('Nairobi') is None:
+            regions.seed()
+        nairobi = Center.objects.create(name='Nowhere Hall 7', county='Nairobi', address='Plot 9, Nowhere Road')
+        Center.objects.create(name='Somewhere Hall 3', county='Mombasa', address='Plot 4, Somewhere Road')
+        outer = len(connection.atomic_blocks)
+        client = mock.Mock()
+
+        def geocode(query, components):
+            # Google is asked before the batch's transaction opens
+            self.assertEqual(len(connection.atomic_blocks), outer)
+            return [{'geometry': {'location': {'lat': -1.17, 'lng': 36.83}}}]
+        client.geocode.side_effect = geocode
+
+        with mock.patch('centers.geocoder.get_maps_client', return_value=client):
+            tasks.geocode_centers({'county': 'NAIROBI', 'remote': True})
+            tasks.geocode_centers({'county': 'nairobi', 'remote': True})
+        self.assertEqual([call.args[0] for call in client.geocode.call_args_list],
+                         ['Nowhere Hall 7, Plot 9, Nowhere Road, Nairobi, Kenya'])
+        nairobi.refresh_from_db()
+        self.assertEqual(nairobi.get_coordinates(), (-1.17, 36.83))
+        self.assertEqual(GeocodedAddress.objects.count(), 1)
@@ -1,11 +1,21 @@
-from rest_framework import generics, viewsets
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, generics, viewsets
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Q
+from core.async_views import apaginate, async_api_view
+from core.regions import county_filter, in_county
+from core.sparse import Fieldset, SparseFieldsetViewMixin, parse_fields, sparse_queryset
+from squads.serializers import SquadSerializer
 from .models import Center
-from .serializers import CenterSerializer, CenterCreateSerializer
+from .nearest import get_index, open_squads
+from .serializers import CenterSerializer, CenterCreateSerializer, NearbyQuerySerializer
 
+OPEN_SQUAD_FIELDS = 'id,name,max_members,member_count,remaining_slots,voter_registration_date'
 
-class CenterViewSet(viewsets.ModelViewSet):
+
+class CenterViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for Center CRUD operations"""
     serializer_class = CenterSerializer
     permission_classes = [IsAuthenticated]
@@ -16,7 +26,7 @@ class CenterViewSet(viewsets.ModelViewSet):
         search = self.request.query_params.get('search')
 
         if county:
-            queryset = queryset.filter(county=county)
+            queryset = in_county(queryset, county).order_by('name')
 
         if search:
             queryset = queryset.filter(
@@ -33,22 +43,61 @@ class CenterViewSet(viewsets.ModelViewSet):
         return CenterSerializer
 
 
-class NearbyCentersView(generics.ListAPIView):
-    """Get centers near user's location"""
-    serializer_class = CenterSerializer
+class NearbyCentersView(APIView):
+    """Nearest centers to the user, with open squads at each (see centers.nearest)"""
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        # In production, this would calculate actual distance
-        # For now, return all centers
-        return Center.objects.all()
+    def get(self, request):
+        params = NearbyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        index = get_index()
+        if 'lat' in params:
+            origin = (params['lat'], params['lng'], 'coordinates')
+        else:
+            origin = index.origin(request.user)
+            if origin is None:
+                raise exceptions.ValidationError(
+                    {'detail': 'Location unknown: pass lat and lng, or set your location, ward or county.'})
+        lat, lng, source = origin
 
+        nearest = index.nearest(lat, lng, params['limit'])
+        found = Center.objects.in_bulk([center_id for center_id, _ in nearest])
+        centers = []
+        for center_id, distance in nearest:
+            if center_id in found:  # Not deleted since the index was loaded
+                center = found[center_id]
+                center.distance_km = distance
+                centers.append(center)
+        squads = open_squads(found, exclude_user=request.user) if params['squads'] else {}
 
-class CentersByCountyView(generics.ListAPIView):
+        results = CenterSerializer(centers, many=True, context={'request': request}).data
+        fieldset = Fieldset(parse_fields(OPEN_SQUAD_FIELDS))
+        for center, result in zip(centers, results):
+            result['open_squads'] = SquadSerializer(
+                squads.get(center.pk, [])[:params['squads']], many=True, fieldset=fieldset).data
+        return Response({'origin': {'lat': lat, 'lng': lng, 'source': source}, 'results': results})
+
+
+class CentersByCountyView(SparseFieldsetViewMixin, generics.ListAPIView):
     """Get centers filtered by county"""
     serializer_class = CenterSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
         county = self.kwargs.get('county')
-        return Center.objects.filter(county=county)
+        return in_county(Center.objects.all(), county).order_by('name')
+
+
+@async_api_view(allow_anonymous=True)
+async def async_centers_by_county(request, county):
+    """Async CentersByCountyView for ASGI deployments"""
+    context = {'request': request}
+    fieldset = Fieldset.from_request(request)
+    # The county is looked up by the region resolver, which loads the counties on first use
+    queryset = Center.objects.filter(**await sync_to_async(county_filter)(county))
+    queryset = sparse_queryset(queryset.order_by('name'),
+                               CenterSerializer(many=True, context=context, fieldset=fieldset))
+    return await apaginate(request, queryset,
+                           lambda centers: CenterSerializer(centers, many=True, context=context, fieldset=fieldset).data)
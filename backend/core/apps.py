@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_init, post_save
+        from . import dashboard, outbox
+        from .metrics import OUTBOX_PENDING, install_query_observer
+        from .sync import SYNCED, row_deleted, row_saved
+
+        connection_created.connect(install_query_observer, dispatch_uid='core.metrics.query_observer')
+        for synced in SYNCED.values():
+            post_save.connect(row_saved, sender=synced.model, dispatch_uid=f'core.sync.{synced.name}.saved')
+            post_delete.connect(row_deleted, sender=synced.model, dispatch_uid=f'core.sync.{synced.name}.deleted')
+        for model in dashboard.TRACKED:
+            post_init.connect(dashboard.remember, sender=model, dispatch_uid=f'core.dashboard.{model.__name__}.loaded')
+        for model, saved, deleted in dashboard.HANDLERS:
+            if saved is not None:
+                post_save.connect(saved, sender=model, dispatch_uid=f'core.dashboard.{model.__name__}.saved')
+            post_delete.connect(deleted, sender=model, dispatch_uid=f'core.dashboard.{model.__name__}.deleted')
+        for model in self.apps.get_models():
+            if issubclass(model, outbox.DomainEvents):
+                post_delete.connect(outbox.instance_deleted, sender=model,
+                                    dispatch_uid=f'core.outbox.{model.__name__}.deleted')
+        OUTBOX_PENDING.set_function(outbox.pending)
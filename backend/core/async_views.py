@@ -0,0 +1,154 @@
+"""
+Helpers for native async (ASGI) read views.
+
+DRF's APIView is synchronous, so under ASGI every DRF request holds a thread
+for its whole duration. The hot read endpoints are also implemented as plain
+async Django views built from these helpers. They authenticate with the same
+JWT settings and throttles, paginate like PageNumberPagination and render
+with DRF's JSONRenderer, so clients get the same responses from both
+implementations.
+
+The view must load everything its serializer reads up front (see the
+``for_display()`` querysets). Serializers then run on the event loop without
+touching the database.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+renderer = JSONRenderer()
+
+
+def render(data, status=200, headers=None):
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json',
+                        headers=headers)
+
+
+async def aauthenticate(request):
+    """Async counterpart of JWTAuthentication.authenticate; returns a user or AnonymousUser"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return AnonymousUser()
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return AnonymousUser()
+
+    validated_token = authentication.get_validated_token(raw_token)
+    try:
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+
+    User = get_user_model()
+    try:
+        user = await User.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def check_throttles(request, view, throttle_classes):
+    """APIView.check_throttles for an async view; raises Throttled with the longest wait"""
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    if waits:
+        raise exceptions.Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+
+def error_response(exc):
+    """Render a TokenError or APIException the way DRF renders them"""
+    if isinstance(exc, TokenError):
+        return render({'detail': str(exc)}, status=401, headers={'WWW-Authenticate': 'Bearer realm="api"'})
+    headers = {'WWW-Authenticate': 'Bearer realm="api"'} if exc.status_code == 401 else None
+    if getattr(exc, 'wait', None):
+        headers = {'Retry-After': '%d' % exc.wait}
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return render(detail, status=exc.status_code, headers=headers)
+
+
+def async_api_view(allow_anonymous=False, throttle_classes=None):
+    """
+    Turn ``async def view(request, ...) -> data`` into a GET-only JSON view.
+
+    Requests are throttled by ``throttle_classes``, by default DRF's
+    ``DEFAULT_THROTTLE_CLASSES`` as for the synchronous views. Throttles
+    count in the cache, so they run in a thread. Authentication failures and
+    APIExceptions are rendered by ``error_response``.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return render({'detail': f'Method "{request.method}" not allowed.'}, status=405,
+                              headers={'Allow': 'GET, HEAD'})
+            try:
+                # Batched sub-requests (core.batch) arrive authenticated
+                request.user = getattr(request, '_force_auth_user', None) or await aauthenticate(request)
+                if not allow_anonymous and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                throttles = api_settings.DEFAULT_THROTTLE_CLASSES if throttle_classes is None else throttle_classes
+                await sync_to_async(check_throttles)(request, view, throttles)
+                data = await view(request, *args, **kwargs)
+            except (TokenError, exceptions.APIException) as exc:
+                return error_response(exc)
+            return render(data)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def apaginate(request, queryset, serialize):
+    """
+    Async PageNumberPagination: returns the same count/next/previous/results
+    payload. ``serialize`` turns the list of page objects into data.
+    """
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE')
+    page_param = request.GET.get('page', 1)
+    try:
+        page_number = 1 if page_param == 'last' else int(page_param)
+        if page_number < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise exceptions.NotFound('Invalid page.')
+
+    count = await queryset.acount()
+    num_pages = max(1, -(-count // page_size))
+    if page_param == 'last':
+        page_number = num_pages
+    if page_number > num_pages:
+        raise exceptions.NotFound('Invalid page.')
+
+    offset = (page_number - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page_number + 1) if page_number < num_pages else None
+    if page_number <= 1:
+        previous_url = None
+    elif page_number == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page_number - 1)
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': serialize(objects),
+    }
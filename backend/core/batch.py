@@ -0,0 +1,253 @@
+"""
+Batch requests: several API calls in one round trip.
+
+    POST /api/batch/
+    {"requests": [
+        {"method": "GET", "path": "/api/auth/profile/"},
+        {"method": "GET", "path": "/api/squads/my_membership/"},
+        {"method": "GET", "path": "/api/events/upcoming/?page=2"},
+        {"method": "PATCH", "path": "/api/auth/profile/", "body": {"county": "Nairobi"}}
+    ]}
+
+    {"responses": [
+        {"status": 200, "body": {...}},
+        ...
+    ]}
+
+Each sub-request is resolved with the URL resolver and handed to its view in
+process, so it gets the same permissions, validation and response as the
+standalone call. The batch authenticates once and its user is passed to
+every sub-request. Responses come back in request order, each with its own
+status code (and headers such as ``Location`` or ``ETag``); the batch itself
+answers 200 unless the batch request is malformed or its token is invalid.
+
+Consecutive reads (GET, HEAD) are independent and run concurrently, at most
+``BATCH_CONCURRENCY`` at a time, each on its own thread and database
+connection. Writes run one at a time, in order, after the reads before them
+have finished, so a read listed after a write sees it. Sub-requests do not
+share a transaction: a failed write does not undo the ones before it.
+
+A POST can carry its own ``Idempotency-Key`` (see core.idempotency), the
+only header a sub-request may set:
+
+    {"method": "POST", "path": "/api/squads/<id>/join/",
+     "headers": {"Idempotency-Key": "4f8c1d0e-..."}}
+
+so a retried batch replays the writes that already ran instead of running
+them again. The batch's own key is not passed on to its sub-requests.
+
+Sub-requests skip the middleware stack; they are counted in
+``batch_subrequests_total`` rather than ``http_requests_total``.
+"""
+import asyncio
+import io
+import json
+import logging
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import exceptions
+from rest_framework_simplejwt.exceptions import TokenError
+
+from . import idempotency, metrics
+from .async_views import aauthenticate, error_response, render
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+READ_METHODS = ('GET', 'HEAD')
+
+# Copied from the batch request to every sub-request
+ENVIRON_KEYS = ('SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL', 'REMOTE_ADDR', 'REMOTE_HOST')
+
+# Headers a sub-request may set, as they appear in its "headers"
+ITEM_HEADERS = {'idempotency-key': idempotency.HEADER}
+
+# Left out of per-item headers: they describe the rendering, not the resource
+OMITTED_HEADERS = {'content-type', 'content-length', 'vary', 'allow', 'x-frame-options'}
+
+
+class BatchItemError(Exception):
+    def __init__(self, status, detail):
+        self.status = status
+        self.detail = detail
+
+
+def parse_batch(body):
+    """The list of sub-requests in a batch request body"""
+    try:
+        data = json.loads(body or b'null')
+    except ValueError:
+        raise exceptions.ParseError()
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise exceptions.ValidationError({'requests': ['Expected a non-empty list of requests.']})
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        raise exceptions.ValidationError(
+            {'requests': [f'Ensure this list has at most {settings.BATCH_MAX_REQUESTS} requests.']})
+    return items
+
+
+def build_request(request, item):
+    """``(view, args, kwargs, sub_request)`` for one item of the batch ``request``"""
+    if not isinstance(item, dict):
+        raise BatchItemError(400, 'Expected an object with "method" and "path".')
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in METHODS:
+        raise BatchItemError(405, f'Method "{method}" not allowed.')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        raise BatchItemError(400, 'Path must start with /api/.')
+
+    url = urlsplit(path)
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        raise BatchItemError(404, 'Not found.')
+    if match.func is batch_view:
+        raise BatchItemError(400, 'Batch requests cannot be nested.')
+
+    headers = item.get('headers') or {}
+    if not isinstance(headers, dict) or any(
+            str(name).lower() not in ITEM_HEADERS or not isinstance(value, str) for name, value in headers.items()):
+        raise BatchItemError(400, 'Only an Idempotency-Key header can be set per request.')
+
+    body = b''
+    if method not in READ_METHODS and item.get('body') is not None:
+        body = json.dumps(item['body'], cls=DjangoJSONEncoder).encode()
+    environ = {key: value for key, value in request.META.items()
+               if (key.startswith('HTTP_') and key != idempotency.HEADER) or key in ENVIRON_KEYS}
+    environ.update({ITEM_HEADERS[name.lower()]: value for name, value in headers.items()})
+    environ.update({
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        # WSGI carries the raw path bytes as latin-1
+        'PATH_INFO': unquote_to_bytes(url.path).decode('iso-8859-1'),
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub_request = WSGIRequest(environ)
+    sub_request.resolver_match = match
+    if request.user.is_authenticated:
+        # Honoured by DRF's Request (and async_api_view): skips decoding the token again
+        sub_request._force_auth_user = request.user
+    return match.func, match.args, match.kwargs, sub_request
+
+
+def finish(response):
+    """Render a (DRF or template) response so its content can be read"""
+    if response.streaming:
+        response.close()
+        raise BatchItemError(400, 'Streaming responses cannot be batched.')
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def call_sync(view, request, args, kwargs):
+    return finish(view(request, *args, **kwargs))
+
+
+def call_in_thread(view, request, args, kwargs):
+    """Run a sync view on a worker thread, closing the thread's connection afterwards"""
+    try:
+        return call_sync(view, request, args, kwargs)
+    finally:
+        connections.close_all()
+
+
+async def dispatch(request, item, concurrent):
+    """``(status, response or detail)`` for one sub-request"""
+    try:
+        view, args, kwargs, sub_request = build_request(request, item)
+    except BatchItemError as exc:
+        return exc.status, exc.detail
+
+    async def get_response(sub_request):
+        if iscoroutinefunction(view):
+            return finish(await view(sub_request, *args, **kwargs))
+        if concurrent:
+            return await sync_to_async(call_in_thread, thread_sensitive=False)(view, sub_request, args, kwargs)
+        return await sync_to_async(call_sync)(view, sub_request, args, kwargs)
+
+    try:
+        # A POST with an Idempotency-Key is replayed as it would be without the batch
+        response = await idempotency.ahandle(sub_request, get_response)
+    except BatchItemError as exc:
+        return exc.status, exc.detail
+    except Http404:
+        return 404, 'Not found.'
+    except PermissionDenied:
+        return 403, 'You do not have permission to perform this action.'
+    except Exception:
+        logger.exception('Batched request %s %s failed', sub_request.method, sub_request.path)
+        return 500, 'Server error.'
+
+    view_name = sub_request.resolver_match.view_name or sub_request.resolver_match._func_path
+    metrics.BATCH_SUBREQUESTS.inc(view=view_name, method=sub_request.method, status=response.status_code)
+    return response.status_code, response
+
+
+def encode_result(status, result):
+    """One item of the combined response, as JSON bytes"""
+    if isinstance(result, str):
+        return json.dumps({'status': status, 'body': {'detail': result}}).encode()
+
+    head = {'status': status}
+    headers = {name: value for name, value in result.items() if name.lower() not in OMITTED_HEADERS}
+    if headers:
+        head['headers'] = headers
+    content = result.content
+    if not content:
+        body = b'null'
+    elif result.get('Content-Type', '').startswith('application/json'):
+        body = content  # Already JSON: spliced in rather than parsed and rendered again
+    else:
+        body = json.dumps(content.decode(result.charset, errors='replace')).encode()
+    return json.dumps(head).encode()[:-1] + b',"body":' + body + b'}'
+
+
+async def batch_view(request):
+    if request.method != 'POST':
+        return render({'detail': f'Method "{request.method}" not allowed.'}, status=405, headers={'Allow': 'POST'})
+    try:
+        request.user = await aauthenticate(request)
+        items = parse_batch(request.body)
+    except (TokenError, exceptions.APIException) as exc:
+        return error_response(exc)
+
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def read(item):
+        async with semaphore:
+            return await dispatch(request, item, concurrent=True)
+
+    results = []
+    reads = []
+    for item in items:
+        method = str(item.get('method', 'GET')).upper() if isinstance(item, dict) else None
+        if method in READ_METHODS:
+            reads.append(item)
+            continue
+        if reads:
+            results.extend(await asyncio.gather(*map(read, reads)))
+            reads = []
+        results.append(await dispatch(request, item, concurrent=False))
+    if reads:
+        results.extend(await asyncio.gather(*map(read, reads)))
+
+    content = b'{"responses":[' + b','.join(encode_result(*result) for result in results) + b']}'
+    return HttpResponse(content, content_type='application/json')
+
+
+batch_view.csrf_exempt = True
@@ -0,0 +1,405 @@
+"""
+End-to-end load test for the PamojaVote API.
+
+Virtual users are asyncio tasks, each holding one keep-alive HTTP/1.1
+connection. Every user signs in through the OTP flow and then repeatedly
+runs weighted user flows (browse, join, RSVP, invite, leaderboard) until the
+test duration elapses. Latencies are recorded per endpoint template, so
+``/api/squads/<uuid>/join/`` is reported as ``POST /api/squads/{id}/join/``.
+
+The module only uses the standard library, so it can be copied to and run
+from a separate load-generator box with ``python -m core.benchmarks.loadtest``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+OTP = '123456'  # Mock OTP accepted by VerifyOTPView in development
+
+
+class HTTPError(Exception):
+    pass
+
+
+class HTTPClient:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams"""
+
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """Send a request and return (status, body); JSON bodies are encoded for you"""
+        payload = b''
+        head = {'Host': f'{self.host}:{self.port}', 'Accept': 'application/json', 'Connection': 'keep-alive'}
+        if body is not None:
+            payload = json.dumps(body).encode()
+            head['Content-Type'] = 'application/json'
+        head['Content-Length'] = str(len(payload))
+        head.update(headers or {})
+        raw = f'{method} {path} HTTP/1.1\r\n'.encode()
+        raw += b''.join(f'{k}: {v}\r\n'.encode() for k, v in head.items()) + b'\r\n' + payload
+
+        for attempt in (1, 2):
+            if self.writer is None:
+                await self.connect()
+            try:
+                self.writer.write(raw)
+                await self.writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed an idle keep-alive connection; reconnect once
+                await self.close()
+                if attempt == 2:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self.reader.read()
+
+        if headers.get('connection', '').lower() == 'close' or 'content-length' not in headers and \
+                headers.get('transfer-encoding', '').lower() != 'chunked':
+            await self.close()
+        return status, data
+
+
+class Recorder:
+    """Collects latency samples and status codes per endpoint"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.started = None
+        self.finished = None
+
+    def record(self, endpoint, seconds, status):
+        self.samples[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def record_error(self, endpoint):
+        self.errors[endpoint] += 1
+
+    def summary(self):
+        elapsed = max((self.finished or time.monotonic()) - self.started, 1e-9)
+        result = {}
+        for endpoint in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples[endpoint])
+            statuses = self.statuses[endpoint]
+            result[endpoint] = {
+                'requests': len(samples),
+                'errors': self.errors[endpoint] + sum(n for code, n in statuses.items() if code >= 500),
+                'rps': len(samples) / elapsed,
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'statuses': {str(code): n for code, n in sorted(statuses.items())},
+            }
+        return result
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class VirtualUser:
+    """One simulated mobile client with its own connection and session"""
+
+    def __init__(self, client, recorder, phone_number, shared, rng):
+        self.client = client
+        self.recorder = recorder
+        self.phone_number = phone_number
+        self.shared = shared
+        self.rng = rng
+        self.token = None
+        self.county = None
+
+    async def call(self, endpoint, method, path, body=None, expect_json=True):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else None
+        started = time.perf_counter()
+        try:
+            status, data = await self.client.request(method, path, body, headers)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            # The connection is in an unknown state after a failure; start afresh
+            await self.client.close()
+            self.recorder.record_error(endpoint)
+            return None, None
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        if expect_json and data:
+            try:
+                return status, json.loads(data)
+            except ValueError:
+                return status, None
+        return status, None
+
+    async def login(self):
+        await self.call('POST /api/auth/login/', 'POST', '/api/auth/login/',
+                        {'phone_number': self.phone_number})
+        status, data = await self.call('POST /api/auth/verify-otp/', 'POST', '/api/auth/verify-otp/',
+                                       {'phone_number': self.phone_number, 'otp': OTP})
+        if status != 200 or not data:
+            raise HTTPError(f'Login failed for {self.phone_number}: {status}')
+        self.token = data['access_token']
+        self.county = data['user'].get('county')
+
+    # Flows
+
+    async def browse_public_squads(self):
+        page = self.rng.randint(1, self.shared['public_pages'])
+        status, data = await self.call('GET /api/public/squads/', 'GET', f'/api/public/squads/?page={page}')
+        if status == 200 and data:
+            if data.get('count'):
+                self.shared['public_pages'] = max(1, -(-data['count'] // max(len(data['results']), 1)))
+            squad_ids = self.shared['squad_ids']
+            for squad in data.get('results', []):
+                if len(squad_ids) < 5000:
+                    squad_ids.append(squad['id'])
+
+    async def join_squad(self):
+        if not self.shared['squad_ids']:
+            return await self.browse_public_squads()
+        squad_id = self.rng.choice(self.shared['squad_ids'])
+        status, _ = await self.call('POST /api/squads/{id}/join/', 'POST', f'/api/squads/{squad_id}/join/', {})
+        if status == 201:
+            # Leave again so the data set keeps its shape across runs
+            await self.call('POST /api/squads/{id}/leave/', 'POST', f'/api/squads/{squad_id}/leave/', {})
+        await self.call('GET /api/squads/my_membership/', 'GET', '/api/squads/my_membership/')
+
+    async def rsvp_event(self):
+        status, data = await self.call('GET /api/events/upcoming/', 'GET', '/api/events/upcoming/')
+        if status == 200 and data and data.get('results'):
+            event = self.rng.choice(data['results'])
+            await self.call('POST /api/events/{id}/rsvp/', 'POST', f"/api/events/{event['id']}/rsvp/",
+                            {'status': self.rng.choice(['yes', 'maybe', 'no'])})
+
+    async def send_bulk_invites(self):
+        status, data = await self.call('GET /api/squads/my_squads/', 'GET', '/api/squads/my_squads/')
+        if status == 200 and data:
+            squad = self.rng.choice(data)
+            phone_numbers = [f'+2547{self.rng.randrange(10 ** 8):08d}' for _ in range(self.rng.randint(1, 10))]
+            await self.call('POST /api/invites/bulk/', 'POST', '/api/invites/bulk/',
+                            {'squad_id': squad['id'], 'phone_numbers': phone_numbers, 'channel': 'whatsapp'})
+
+    async def read_leaderboard(self):
+        path = '/api/squads/leaderboard/'
+        if self.county:
+            path += f"?county={self.county.replace(' ', '%20')}"
+        await self.call('GET /api/squads/leaderboard/', 'GET', path)
+
+    async def read_hot_endpoints(self):
+        """Read-only mix of the endpoints that have async implementations"""
+        page = self.rng.randint(1, self.shared['public_pages'])
+        await self.call('GET /api/public/squads/', 'GET', f'/api/public/squads/?page={page}')
+        await self.call('GET /api/events/upcoming/', 'GET', '/api/events/upcoming/')
+        await self.call('GET /api/squads/my_membership/', 'GET', '/api/squads/my_membership/')
+        if self.county:
+            await self.call('GET /api/centers/county/{county}/', 'GET',
+                            f"/api/centers/county/{self.county.replace(' ', '%20')}/")
+
+
+FLOWS = {
+    'browse': (VirtualUser.browse_public_squads, 40),
+    'join': (VirtualUser.join_squad, 10),
+    'rsvp': (VirtualUser.rsvp_event, 25),
+    'invite': (VirtualUser.send_bulk_invites, 10),
+    'leaderboard': (VirtualUser.read_leaderboard, 15),
+    'reads': (VirtualUser.read_hot_endpoints, 100),
+}
+# The default mix; `reads` is meant to be run on its own (see `bench_async`)
+DEFAULT_FLOWS = ('browse', 'join', 'rsvp', 'invite', 'leaderboard')
+
+
+async def run_user(index, options, recorder, shared, deadline):
+    rng = random.Random(f"{options['seed']}:{index}")
+    host, port = options['host'], options['port']
+    phone_number = f"{options['phone_prefix']}{options['phone_start'] + index % options['phone_count']:08d}"
+    user = VirtualUser(HTTPClient(host, port, options['timeout']), recorder, phone_number, shared, rng)
+
+    # Stagger logins over the ramp-up period
+    await asyncio.sleep(options['ramp_up'] * index / max(options['concurrency'], 1))
+    try:
+        await user.login()
+        flows = [FLOWS[name] for name in options['flows']]
+        functions = [flow for flow, _ in flows]
+        weights = [weight for _, weight in flows]
+        while time.monotonic() < deadline:
+            await rng.choices(functions, weights)[0](user)
+            if options['think_time']:
+                await asyncio.sleep(rng.expovariate(1 / options['think_time']))
+    except HTTPError as exc:
+        recorder.record_error('login')
+        print(exc, file=sys.stderr)
+    finally:
+        await user.client.close()
+
+
+async def run(options):
+    """Run the load test and return the per-endpoint summary"""
+    recorder = Recorder()
+    shared = {'squad_ids': [], 'public_pages': 1}
+    recorder.started = time.monotonic()
+    deadline = recorder.started + options['ramp_up'] + options['duration']
+    await asyncio.gather(*(
+        run_user(i, options, recorder, shared, deadline) for i in range(options['concurrency'])
+    ))
+    recorder.finished = time.monotonic()
+    return recorder.summary()
+
+
+def compare(summary, baseline, tolerance):
+    """
+    Compare a summary against a stored baseline.
+
+    Returns a list of human readable regressions: p95 latency above the
+    baseline by more than ``tolerance`` or throughput below it by more than
+    ``tolerance``.
+    """
+    regressions = []
+    for endpoint, stats in summary.items():
+        base = baseline.get(endpoint)
+        if not base:
+            continue
+        if base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {stats['p95_ms']:.1f}ms vs baseline {base['p95_ms']:.1f}ms")
+        if base['rps'] and stats['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{endpoint}: {stats['rps']:.1f} req/s vs baseline {base['rps']:.1f} req/s")
+    return regressions
+
+
+def format_report(summary, baseline=None):
+    baseline = baseline or {}
+    lines = [f"{'endpoint':<36} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'base p95':>9}"]
+    for endpoint, stats in summary.items():
+        base = baseline.get(endpoint, {}).get('p95_ms')
+        lines.append(
+            f"{endpoint:<36} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+            f"{(f'{base:.1f}' if base else '-'):>9}"
+        )
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    """Shared by the ``loadtest`` management command and the module CLI"""
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load')
+    parser.add_argument('--concurrency', type=int, default=50, help='Number of virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run after ramp-up')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which users sign in')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='Mean pause between flows in seconds (0 = closed loop, as fast as possible)')
+    parser.add_argument('--flows', default=','.join(DEFAULT_FLOWS),
+                        help=f"Comma separated subset of {', '.join(FLOWS)}")
+    parser.add_argument('--phone-prefix', default='+2547', help='Phone prefix of the synthetic users')
+    parser.add_argument('--phone-start', type=int, default=0, help='First synthetic user index to sign in as')
+    parser.add_argument('--phone-count', type=int, default=1000, help='Number of distinct users to sign in as')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=2027)
+    parser.add_argument('--baseline', default=None, help='Baseline JSON file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Write this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression against the baseline (0.2 = 20%%)')
+    parser.add_argument('--output', default=None, help='Write the full JSON summary here')
+
+
+def build_options(args):
+    parts = urlsplit(args['base_url'])
+    flows = [name.strip() for name in args['flows'].split(',') if name.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        raise ValueError(f"Unknown flows: {', '.join(sorted(unknown))}")
+    return dict(args, host=parts.hostname, port=parts.port or 80, flows=flows)
+
+
+def execute(options, write=print):
+    """
+    Run the load test, print the report and handle baselines.
+
+    Returns the list of regressions against the baseline (empty when there
+    is no baseline or a new one is being saved).
+    """
+    summary = asyncio.run(run(options))
+
+    path = options['baseline']
+    baseline = {}
+    if path and os.path.exists(path) and not options['save_baseline']:
+        with open(path) as fh:
+            baseline = json.load(fh)['endpoints']
+
+    write(format_report(summary, baseline))
+    if options['output']:
+        with open(options['output'], 'w') as fh:
+            json.dump(summary, fh, indent=2)
+    if path and options['save_baseline']:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as fh:
+            json.dump({
+                'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'flows': options['flows'],
+                'endpoints': summary,
+            }, fh, indent=2)
+        write(f'Baseline written to {path}')
+    return compare(summary, baseline, options['tolerance'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    regressions = execute(build_options(vars(parser.parse_args(argv))))
+    if regressions:
+        print('\n'.join(['Regressions:'] + regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
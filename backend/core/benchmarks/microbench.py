@@ -0,0 +1,219 @@
+"""
+Microbenchmarks for the hot serializer and queryset code paths.
+
+Each benchmark times a single code path in isolation and counts the SQL
+queries it issues. Both are compared with the stored baseline in
+``baselines/microbench.json``:
+
+* a benchmark that issues more queries than its baseline always fails;
+* a benchmark whose median time exceeds the baseline by more than the
+  tolerance fails unless timing checks are disabled.
+
+Run with ``python manage.py microbench`` (see that command for options), or
+directly through the test runner::
+
+    python manage.py test core.benchmarks.microbench
+"""
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+from datetime import date
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from centers.models import Center
+from centers.serializers import CenterSerializer
+from core.sparse import Fieldset, sparse_queryset
+from events.models import Event
+from events.serializers import EventSerializer
+from squads.models import Squad
+from squads.serializers import SquadCreateSerializer, SquadSerializer
+from squads.views import PublicSquadsView, SquadViewSet
+from users.models import User
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baselines' / 'microbench.json'
+
+# Settings are read from the environment so the suite also works under a plain `manage.py test`
+SAVE_BASELINE = os.getenv('MICROBENCH_SAVE_BASELINE') == '1'
+CHECK_TIMING = os.getenv('MICROBENCH_CHECK_TIMING', '1') == '1'
+TOLERANCE = float(os.getenv('MICROBENCH_TOLERANCE', '0.5'))
+ROUNDS = int(os.getenv('MICROBENCH_ROUNDS', '5'))
+
+DATASET = {
+    'users': 2000,
+    'squads': 200,
+    'memberships': 4000,
+    'centers': 10000,
+    'events': 200,
+    'rsvps': 4000,
+    'invites': 0,
+}
+
+
+def load_baseline():
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH) as fh:
+            return json.load(fh)
+    return {}
+
+
+def benchmark(func, rounds=ROUNDS, warmup=1):
+    """
+    Time ``func`` over several rounds, pytest-benchmark style.
+
+    Returns timing statistics in milliseconds and the number of queries
+    issued by a single call.
+    """
+    for _ in range(warmup):
+        func()
+    with CaptureQueriesContext(connection) as ctx:
+        func()
+    queries = len(ctx.captured_queries)
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'queries': queries,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'stddev_ms': round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+        'rounds': rounds,
+    }
+
+
+class MicroBenchmarks(TestCase):
+    """Serializer and queryset hot paths on the synthetic dataset"""
+
+    results = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_dataset', seed=2027, anchor='2030-01-01', stdout=io.StringIO(), **DATASET)
+        cls.user = User.objects.filter(squad_memberships__isnull=False).order_by('phone_number').first()
+        cls.factory = APIRequestFactory()
+
+        # A center/date with only full squads makes validate() walk every candidate;
+        # the date lies outside the generated range so no synthetic squad has free slots
+        cls.busy_center = Center.objects.order_by('name').first()
+        cls.busy_date = date(2031, 1, 1)
+        Squad.objects.bulk_create([
+            Squad(name=f'Full squad {i}', county=cls.busy_center.county, max_members=0,
+                  voter_registration_date=cls.busy_date, registration_center=cls.busy_center,
+                  owner=cls.user)
+            for i in range(50)
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if SAVE_BASELINE and cls.results:
+            BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            baseline = load_baseline()
+            baseline.update(cls.results)
+            with open(BASELINE_PATH, 'w') as fh:
+                json.dump(dict(sorted(baseline.items())), fh, indent=2)
+                fh.write('\n')
+
+    def get_request(self, path='/'):
+        request = self.factory.get(path)
+        force_authenticate(request, user=self.user)
+        request.user = self.user
+        return request
+
+    def check(self, name, func):
+        stats = benchmark(func)
+        type(self).results[name] = stats
+        print(f"\n  {name}: {stats['median_ms']:.2f}ms median, {stats['queries']} queries", end='')
+
+        base = load_baseline().get(name)
+        if SAVE_BASELINE or not base:
+            return
+        self.assertLessEqual(
+            stats['queries'], base['queries'],
+            f"{name} issues {stats['queries']} queries, baseline is {base['queries']}"
+        )
+        if CHECK_TIMING:
+            limit = base['median_ms'] * (1 + TOLERANCE)
+            self.assertLessEqual(
+                stats['median_ms'], limit,
+                f"{name} median {stats['median_ms']:.2f}ms exceeds baseline {base['median_ms']:.2f}ms "
+                f"by more than {TOLERANCE:.0%}"
+            )
+
+    def test_squad_serializer_many(self):
+        view = PublicSquadsView()
+        view.request = self.get_request('/api/public/squads/')
+        queryset = view.get_queryset()[:100]
+        self.check('squad_serializer_many', lambda: SquadSerializer(list(queryset.all()), many=True).data)
+
+    def test_event_serializer_without_request(self):
+        queryset = Event.objects.for_display()[:100]
+        self.check('event_serializer_without_request', lambda: EventSerializer(list(queryset.all()), many=True).data)
+
+    def test_event_serializer_with_request(self):
+        queryset = Event.objects.for_display(self.user)[:100]
+        context = {'request': self.get_request()}
+        self.check(
+            'event_serializer_with_request',
+            lambda: EventSerializer(list(queryset.all()), many=True, context=context).data
+        )
+
+    def test_center_serializer_10k(self):
+        queryset = Center.objects.all()
+        self.assertGreaterEqual(queryset.count(), 10000)
+        self.check('center_serializer_10k', lambda: CenterSerializer(list(queryset.all()), many=True).data)
+
+    def test_center_serializer_10k_sparse(self):
+        # ?fields=id,name, as used by dropdowns and the map
+        fieldset = Fieldset({'id': {}, 'name': {}})
+        queryset = sparse_queryset(Center.objects.all(), CenterSerializer(many=True, fieldset=fieldset))
+        self.check(
+            'center_serializer_10k_sparse',
+            lambda: CenterSerializer(list(queryset.all()), many=True, fieldset=fieldset).data
+        )
+
+    def test_squad_serializer_many_sparse(self):
+        fieldset = Fieldset({'id': {}, 'name': {}, 'registration_center': {'name': {}}})
+        queryset = sparse_queryset(
+            Squad.objects.filter(is_public=True).for_display(fieldset)[:100],
+            SquadSerializer(many=True, fieldset=fieldset)
+        )
+        self.check(
+            'squad_serializer_many_sparse',
+            lambda: SquadSerializer(list(queryset.all()), many=True, fieldset=fieldset).data
+        )
+
+    def test_squad_create_validate_duplicate_check(self):
+        data = {
+            'name': 'New squad',
+            'county': self.busy_center.county,
+            'voter_registration_date': self.busy_date.isoformat(),
+            'registration_center': {'name': self.busy_center.name, 'county': self.busy_center.county},
+        }
+        context = {'request': self.get_request()}
+
+        def validate():
+            serializer = SquadCreateSerializer(data=data, context=context)
+            # validate() prints debug output for every candidate squad
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        self.check('squad_create_validate_duplicate_check', validate)
+
+    def test_squad_viewset_queryset(self):
+        view = SquadViewSet()
+        view.request = self.get_request('/api/squads/')
+        view.format_kwarg = None
+        self.check('squad_viewset_queryset', lambda: list(view.get_queryset()))
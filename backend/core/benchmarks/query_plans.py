@@ -0,0 +1,182 @@
+"""
+Query plans of the hot read paths, checked for full scans and sorts.
+
+Each check builds the queryset a view or job actually runs (through the
+view's ``get_queryset``/``filter_queryset`` with a sample user from the
+dataset, so filters and ordering are the real ones), asks the database for
+its plan with ``QuerySet.explain()`` and reports:
+
+* ``scan``: every row of a table is read, without an index (SQLite
+  ``SCAN <table>``, PostgreSQL ``Seq Scan``);
+* ``sort``: rows sorted after they are read (SQLite ``USE TEMP B-TREE``,
+  PostgreSQL ``Sort``), which an index in the right order avoids.
+
+Some findings are expected: a check's ``allow`` maps ``'scan <table>'`` or
+``'sort'`` to the reason it is acceptable (e.g. a sort by an aggregate). Anything
+else is a regression, usually a missing index or a filter an index does not
+cover. Run with ``python manage.py index_advisor`` against a database
+holding the synthetic dataset (``generate_dataset``).
+"""
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from centers.nearest import open_squads_queryset
+from centers.views import CenterViewSet, CentersByCountyView
+from core.dashboard import METRICS
+from core.models import Change, CountyStats, OutboxEvent
+from core.regions import county_filter, in_county
+from core.sync import visible_changes
+from events.models import EventReminder
+from events.views import EventRSVPViewSet, EventsBySquadView, EventViewSet, UpcomingEventsView
+from invites.models import Invite
+from invites.views import InviteViewSet
+from jobs.models import Job
+from squads import discovery
+from squads.exports import roster_queryset
+from squads.models import Squad, SquadMember
+from squads.views import DiscoverSquadsView, PublicSquadsView, SquadMemberViewSet, SquadViewSet
+
+SQLITE_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)$')
+SQL_ALIAS = re.compile(r'"(\w+)" ([TU]\d+)\b')  # Django's aliases for tables in subqueries and repeated joins
+SQLITE_SORT = re.compile(r'^USE TEMP B-TREE FOR ')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\S+)')
+POSTGRES_SORT = re.compile(r'(?:^|-> +)Sort +\(')
+
+
+class Sample:
+    """Ids from the dataset that the checks filter by"""
+
+    def __init__(self):
+        member = SquadMember.objects.order_by('joined_at').select_related('user', 'squad').first()
+        if member is None:
+            raise LookupError('No squad members; generate a dataset first.')
+        self.user = member.user
+        self.squad = member.squad
+        self.county = member.squad.county
+        self.center_id = Squad.objects.exclude(registration_center=None).values_list(
+            'registration_center_id', flat=True).first()
+        self.factory = APIRequestFactory()
+
+    def view_queryset(self, view_class, path='/', query=None, action='list', **kwargs):
+        """The page of rows a GET of ``view_class`` reads, as a queryset"""
+        request = self.factory.get(path, query or {})
+        force_authenticate(request, user=self.user)
+        view = view_class(action_map={'get': action}, args=(), kwargs=kwargs, format_kwarg=None)
+        view.request = view.initialize_request(request)
+        view.request.user  # Authenticate now, as dispatch() would
+        queryset = view.filter_queryset(view.get_queryset())
+        return queryset[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+
+
+class Check:
+    def __init__(self, name, queryset, allow=None):
+        self.name = name
+        self.queryset = queryset  # Called with a Sample
+        self.allow = allow or {}
+
+
+CHECKS = [
+    Check('squads.list', lambda s: s.view_queryset(SquadViewSet), allow={
+        'scan squads_squad': 'public OR owned OR member: no single index answers the OR',
+        'sort': 'the squads matched by the OR, newest first',
+    }),
+    Check('squads.public', lambda s: s.view_queryset(PublicSquadsView)),
+    Check('squads.leaderboard', lambda s: in_county(Squad.objects.with_stats().filter(
+        _member_count__gt=0), s.county).order_by('-_member_count'), allow={
+        'sort': 'ordered by the member count',
+    }),
+    Check('squads.duplicate_check', lambda s: discovery.search(center_ids=[s.center_id]).filter(
+        voter_registration_date=s.squad.voter_registration_date).select_related('squad', 'registration_center'), allow={
+        'sort': 'the few open squads of one center and date, most room first',
+    }),
+    Check('squads.discover_center', lambda s: s.view_queryset(DiscoverSquadsView, query={'center': s.center_id}), allow={
+        'sort': 'the open squads of one center, most room first',
+    }),
+    Check('squads.discover_county', lambda s: s.view_queryset(DiscoverSquadsView, query={
+        'county': s.county, 'date_from': timezone.localdate(), 'date_to': timezone.localdate() + timedelta(days=30),
+    }), allow={
+        'sort': "a county's open squads within a date window, most room first",
+    }),
+    Check('squads.registered_count', lambda s: SquadMember.objects.filter(
+        squad=s.squad, has_registered=True).order_by()),
+    Check('squads.memberships', lambda s: s.view_queryset(SquadMemberViewSet)),
+    Check('squads.my_membership', lambda s: SquadMember.objects.filter(user=s.user).select_related('squad')[:1]),
+    Check('events.list', lambda s: s.view_queryset(EventViewSet), allow={
+        'sort': "RSVP counts, and merging the user's squads' events by date",
+    }),
+    Check('events.upcoming', lambda s: s.view_queryset(UpcomingEventsView), allow={
+        'sort': "RSVP counts, and merging the user's squads' events by date",
+    }),
+    Check('events.by_squad', lambda s: s.view_queryset(EventsBySquadView, squad_id=s.squad.pk)),
+    Check('events.rsvps', lambda s: s.view_queryset(EventRSVPViewSet), allow={
+        'sort': "a user's RSVPs, newest first",
+    }),
+    Check('events.reminders_due', lambda s: EventReminder.objects.filter(
+        status='pending', remind_at__lte=timezone.now())),
+    Check('invites.list', lambda s: s.view_queryset(InviteViewSet)),
+    Check('invites.queue_depth', lambda s: Invite.objects.filter(status='sent', delivered_at__isnull=True)),
+    Check('centers.list', lambda s: s.view_queryset(CenterViewSet)),
+    Check('centers.county', lambda s: s.view_queryset(CentersByCountyView, county=s.county)),
+    Check('centers.filter', lambda s: s.view_queryset(CenterViewSet, query={'county': s.county})),
+    Check('centers.open_squads', lambda s: open_squads_queryset([s.center_id]), allow={
+        'sort': 'the open squads of a few centers, most room first',
+    }),
+    Check('sync.changes', lambda s: visible_changes(s.user).filter(
+        Q(id__gt=0, id__lte=10 ** 9) | Q(id__range=(1, 10)),
+    ).order_by('id').values_list('id', flat=True)[:settings.SYNC_PAGE_SIZE], allow={
+        'scan squads_squad|squads_squadmember': 'visible squads: public OR owned OR member',
+        'sort': 'the five visibility filters are merged, then ordered by id',
+    }),
+    Check('sync.gaps', lambda s: Change.objects.filter(id__gt=0, id__lte=10 ** 9).order_by('-id').values_list(
+        'id', 'changed_at')),
+    Check('exports.rosters', lambda s: roster_queryset(county_filter(s.county, prefix='squad__')), allow={
+        'sort': "the county's squads are found by county_ref, then their members sorted by squad and join date",
+    }),
+    Check('dashboard.totals', lambda s: CountyStats.objects.filter(day=None).values(
+        'county', 'county__name', *METRICS).order_by('county__name'), allow={
+        'sort': 'the 47 totals rows are sorted by county name',
+    }),
+    Check('dashboard.upcoming', lambda s: CountyStats.objects.filter(
+        day__gte=timezone.localdate()).values_list('county', 'events').order_by()),
+    Check('jobs.claim', lambda s: Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now()).order_by('-priority', 'run_at')),
+    Check('outbox.batch', lambda s: OutboxEvent.objects.filter(id__gt=0).order_by('id')[:500]),
+]
+
+
+def findings(plan, aliases=None):
+    """``(key, plan line)`` for each full scan (``'scan <table>'``) and sort (``'sort'``) in a plan"""
+    aliases = aliases or {}
+    found = []
+    for line in plan.splitlines():
+        if connection.vendor == 'sqlite':
+            # Rows are "id parent notused detail"
+            detail = line.split(' ', 3)[-1]
+            scan, sort = SQLITE_SCAN.match(detail), SQLITE_SORT.match(detail)
+        else:
+            detail = line.strip()
+            scan, sort = POSTGRES_SCAN.search(detail), POSTGRES_SORT.search(detail)
+        if scan:
+            found.append((f'scan {aliases.get(scan[1], scan[1])}', detail))
+        elif sort:
+            found.append(('sort', detail))
+    return found
+
+
+def run_check(check, sample):
+    """``(plan, [(key, plan line, reason it is allowed or None), ...])`` for one check"""
+    queryset = check.queryset(sample)
+    plan = queryset.explain()
+    tables = defaultdict(set)
+    for table, alias in SQL_ALIAS.findall(str(queryset.query)):
+        tables[alias].add(table)
+    # Subqueries reuse aliases (U0, ...): a reused one is reported as every table it stands for
+    aliases = {alias: '|'.join(sorted(names)) for alias, names in tables.items()}
+    return plan, [(key, line, check.allow.get(key)) for key, line in findings(plan, aliases)]
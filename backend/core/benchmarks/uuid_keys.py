@@ -0,0 +1,126 @@
+"""
+Insert throughput and primary key index size with random (version 4) and
+time-ordered (version 7, ``core.ids.uuid7``) UUID primary keys.
+
+For each kind of id a scratch table shaped like the insert-heavy tables
+(``invites_invite``, ``events_eventrsvp``, ``squads_squadmember``: a UUID
+primary key, a foreign key, a timestamp and a status) is filled with
+``rows`` rows, ``batch_size`` per transaction as ``bulk_create`` writes
+them. Rows/s are reported for the whole load and for its last tenth, when
+the index has long outgrown the page cache and every random id lands on a
+page that must be read first. The primary key index is then measured:
+size in bytes (``dbstat`` on SQLite, ``pg_relation_size`` on PostgreSQL)
+and, on SQLite, how full its leaf pages are. Last, the 1000 greatest ids
+are compared with the 1000 rows inserted last: the share in both is 100%
+when ``ORDER BY id DESC`` is newest first. The tables are dropped
+afterwards.
+"""
+import time
+import uuid
+
+from django.db import DatabaseError, connections, models, transaction
+from django.utils import timezone
+
+from core.ids import uuid7
+
+KINDS = {'v4': uuid.uuid4, 'v7': uuid7}
+OWNERS = 1000  # Distinct foreign key values, like inviters
+NEWEST = 1000  # Rows compared by ORDER BY id DESC
+
+
+def create_table(connection, table):
+    quoted = connection.ops.quote_name(table)
+    if connection.vendor == 'postgresql':
+        columns = 'id uuid NOT NULL PRIMARY KEY, owner_id uuid NOT NULL, seq bigint NOT NULL, ' \
+                  'created_at timestamp with time zone NOT NULL, status varchar(10) NOT NULL'
+    else:
+        columns = 'id char(32) NOT NULL PRIMARY KEY, owner_id char(32) NOT NULL, seq bigint NOT NULL, ' \
+                  'created_at datetime NOT NULL, status varchar(10) NOT NULL'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {quoted}')
+        cursor.execute(f'CREATE TABLE {quoted} ({columns})')
+
+
+def drop_table(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(table)}')
+
+
+def index_stats(connection, table):
+    """``(bytes, leaf fill)`` of a table's primary key index; fill is None where it cannot be measured"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_relation_size(%s)', [f'{table}_pkey'])
+            return cursor.fetchone()[0], None
+        if connection.vendor != 'sqlite':
+            return None, None
+        cursor.execute(f'PRAGMA index_list({connection.ops.quote_name(table)})')
+        index = next(name for _, name, _, origin, *_ in cursor.fetchall() if origin == 'pk')
+        try:
+            cursor.execute('SELECT SUM(pgsize), SUM(CASE WHEN pagetype = %s THEN pgsize - unused END), '
+                           'SUM(CASE WHEN pagetype = %s THEN pgsize END) FROM dbstat WHERE name = %s',
+                           ['leaf', 'leaf', index])
+        except DatabaseError:
+            return None, None  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+        size, used, leaves = cursor.fetchone()
+        return size, used / leaves if leaves else None
+
+
+def run_kind(connection, kind, rows, batch_size):
+    table = f'bench_uuid_{kind}'
+    make_id = KINDS[kind]
+    id_field, time_field = models.UUIDField(), models.DateTimeField()
+    owners = [id_field.get_db_prep_value(uuid.uuid4(), connection) for _ in range(OWNERS)]
+    sql = f'INSERT INTO {connection.ops.quote_name(table)} (id, owner_id, seq, created_at, status) ' \
+          f'VALUES (%s, %s, %s, %s, %s)'
+    create_table(connection, table)
+    try:
+        elapsed = tail_elapsed = 0.0
+        tail_start, tail_rows = rows - rows // 10, 0
+        for start in range(0, rows, batch_size):
+            now = time_field.get_db_prep_value(timezone.now(), connection)
+            batch = [(id_field.get_db_prep_value(make_id(), connection), owners[seq % OWNERS], seq, now, 'sent')
+                     for seq in range(start, min(start + batch_size, rows))]
+            started = time.perf_counter()
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            took = time.perf_counter() - started
+            elapsed += took
+            if start >= tail_start:
+                tail_elapsed += took
+                tail_rows += len(batch)
+        size, fill = index_stats(connection, table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT seq FROM {connection.ops.quote_name(table)} ORDER BY id DESC LIMIT {NEWEST}')
+            newest = sum(1 for (seq,) in cursor.fetchall() if seq >= rows - NEWEST)
+    finally:
+        drop_table(connection, table)
+    return {
+        'kind': kind,
+        'rows': rows,
+        'rows_per_second': rows / elapsed if elapsed else 0,
+        'tail_rows_per_second': tail_rows / tail_elapsed if tail_elapsed else 0,
+        'index_bytes': size,
+        'leaf_fill': fill,
+        'newest_by_id': newest / min(NEWEST, rows),
+    }
+
+
+def run(alias='default', rows=10_000_000, batch_size=10_000, kinds=tuple(KINDS)):
+    connection = connections[alias]
+    return [run_kind(connection, kind, rows, batch_size) for kind in kinds]
+
+
+def format_report(results):
+    lines = [f"{'id':<4} {'rows':>12} {'rows/s':>10} {'last 10%':>10} {'index MB':>9} {'B/row':>7} "
+             f"{'leaf fill':>9} {'newest by id':>13}"]
+    for result in results:
+        size, fill = result['index_bytes'], result['leaf_fill']
+        megabytes = 'n/a' if size is None else f'{size / 2 ** 20:.1f}'
+        per_row = 'n/a' if size is None else f"{size / result['rows']:.1f}"
+        fill = 'n/a' if fill is None else f'{fill:.0%}'
+        lines.append(
+            f"{result['kind']:<4} {result['rows']:>12,} {result['rows_per_second']:>10,.0f} "
+            f"{result['tail_rows_per_second']:>10,.0f} {megabytes:>9} {per_row:>7} {fill:>9} "
+            f"{result['newest_by_id']:>13.1%}")
+    return '\n'.join(lines)
@@ -0,0 +1,159 @@
+"""
+Response compression (gzip, and Brotli when the ``brotli`` package is
+installed).
+
+``CompressionMiddleware`` compresses text responses of at least
+``COMPRESSION_MIN_SIZE`` bytes for clients that accept it. Levels are
+tuned for responses generated per request, where compression time adds to
+latency; files compressed ahead of time (``manage.py build_geodata``) use the
+slowest, smallest settings instead.
+
+Streaming responses are compressed chunk by chunk and each chunk is flushed,
+so clients still receive rows as they are produced. Server-Sent Events are
+never compressed: a compressor would hold events back, and proxies treat
+``text/event-stream`` specially.
+"""
+import gzip
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip is offered
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/geo+json', 'application/javascript',
+    'application/xml', 'application/x-ndjson', 'application/vnd.oai.openapi', 'image/svg+xml',
+)
+NEVER_COMPRESSED = ('text/event-stream',)
+
+
+def accepted_encodings(accept_encoding):
+    """Codings in an Accept-Encoding header with a non-zero q-value"""
+    codings = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if q > 0:
+            codings.add(coding.strip().lower())
+    return codings
+
+
+def choose_encoding(request, available=None):
+    """The best coding the client accepts: 'br', 'gzip' or None"""
+    codings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if available is None:
+        available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    for coding in available:
+        if coding in codings or '*' in codings:
+            return coding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Compresses a stream chunk by chunk, flushing after each chunk"""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits 16 + MAX_WBITS: gzip header and trailer
+            self.compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.encoding = encoding
+
+    def chunk(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.finish() if self.encoding == 'br' else self.compressor.flush()
+
+    def compress(self, chunks):
+        for data in chunks:
+            if data:
+                yield self.chunk(data)
+        yield self.finish()
+
+    async def acompress(self, chunks):
+        async for data in chunks:
+            if data:
+                yield self.chunk(data)
+        yield self.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses for clients that send a matching Accept-Encoding.
+
+    Place it right after MetricsMiddleware so it sees the final response
+    body. Works in both sync and async stacks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if (response.has_header('Content-Encoding')
+                or content_type in NEVER_COMPRESSED
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        # Caches must keep the variants apart even when this response is sent as is
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = StreamCompressor(encoding)
+            if response.is_async:
+                response.streaming_content = compressor.acompress(response.streaming_content)
+            else:
+                response.streaming_content = compressor.compress(response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # The bytes differ from the uncompressed variant's
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,428 @@
+"""
+County dashboard: registration drive progress per county.
+
+    GET /api/dashboard/counties/
+    GET /api/dashboard/counties/?county=Nairobi&days=30    # plus a daily series
+
+    {
+        "counties": [
+            {"county": "Baringo", "users": 812, "squads": 40, "members": 1990,
+             "registered": 701, "registration_rate": 0.35, "upcoming_events": 12, "invites": 15870},
+            ...
+        ],
+        "totals": {...},
+        "daily": [{"day": "2026-05-01", "users": 3, ...}, ...]
+    }
+
+Counts are read from ``core.models.CountyStats``, one row per county and
+day plus a totals row per county, rather than by grouping memberships by
+their squad's county on every request. The totals come from one row per
+county; upcoming events from the rows dated today or later, so reads grow
+with the number of counties and how far ahead events are planned, not with
+the number of users or members.
+
+Users, squads, events and deleted invites are counted by signal handlers
+that add or subtract one as each write is saved. Memberships, registrations
+and new invites, the writes made most often, are counted off the request
+path by the ``core.dashboard`` outbox consumer (see ``core.outbox``;
+``manage.py run_consumers``), one update per county and day of each batch,
+under the county their event recorded. A squad moving to another county
+moves its own counts (members, events, invites by day: four grouped
+queries over that squad's rows) in the squad's save transaction. Since
+every update is an addition, it makes no difference whether an event for
+the squad is applied before or after the move. Writes that send no signals
+(``bulk_create``, ``QuerySet.update``, raw SQL) are caught up by
+``rebuild()`` (``manage.py rebuild_dashboard``), which reads ``(county,
+seconds since 1970)`` pairs computed by the database and buckets them into
+local days with NumPy when it is installed (in pure Python otherwise). Days
+are in ``TIME_ZONE``.
+
+Rows are keyed by ``core.County`` (``county_ref``, see core.regions) and
+counted under the county of their squad (memberships, events), the user's
+own county (users) and, for invites, the squad's, the event's squad's or
+else the inviter's county. Rows without a known county are not counted.
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Func, Q, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from events.models import Event
+from invites.models import Invite
+from squads.models import Squad, SquadMember
+from users.models import User
+from . import outbox, regions
+from .models import ConsumerPosition, CountyStats
+
+try:
+    import numpy as np
+except ImportError:  # Optional; without it the rebuild counts rows with a Counter
+    np = None
+
+METRICS = ('users', 'squads', 'members', 'registered', 'events', 'invites')
+COLUMNS = ('users', 'squads', 'members', 'registered', 'upcoming_events', 'invites')
+MAX_DAYS = 366
+EPOCH = date(1970, 1, 1)
+
+_local = threading.local()
+
+
+@contextmanager
+def paused():
+    """Skip incremental updates, e.g. around bulk deletes followed by ``rebuild()``"""
+    _local.paused = True
+    try:
+        yield
+    finally:
+        _local.paused = False
+
+
+def is_paused():
+    return getattr(_local, 'paused', False)
+
+
+def bump(county_id, day, **deltas):
+    """Add ``deltas`` to the county's row for ``day`` and to its totals row"""
+    deltas = {metric: delta for metric, delta in deltas.items() if delta}
+    if county_id is None or not deltas:
+        return
+    for key in (day, None):
+        rows = CountyStats.objects.filter(county_id=county_id, day=key)
+        changes = {metric: F(metric) + delta for metric, delta in deltas.items()}
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                CountyStats.objects.create(county_id=county_id, day=key, **deltas)
+        except IntegrityError:
+            rows.update(**changes)  # Created by a concurrent write
+
+
+# Incremental updates
+
+def local_day(value):
+    return timezone.localdate(value, timezone.get_default_timezone())
+
+
+def squad_county(squad_id):
+    return Squad.objects.filter(pk=squad_id).values_list('county_ref', flat=True).first()
+
+
+# Fields whose change moves a row to another county or day
+TRACKED = {
+    User: ('county_ref_id',),
+    Squad: ('county_ref_id',),
+    Event: ('squad_id', 'datetime'),
+}
+
+
+def remember(sender, instance, **kwargs):
+    """Keep the loaded values of the tracked fields, to compare on save (post_init)"""
+    instance._dashboard_loaded = {name: instance.__dict__[name] for name in TRACKED[sender] if name in instance.__dict__}
+
+
+def changed(instance, name):
+    """``(changed, previous value)`` of a tracked field since it was loaded or saved"""
+    loaded = getattr(instance, '_dashboard_loaded', {})
+    if name not in loaded:
+        return False, None  # Deferred when loaded
+    return loaded[name] != instance.__dict__.get(name), loaded[name]
+
+
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or is_paused():
+        return
+    day = local_day(instance.created_at)
+    if created:
+        bump(instance.county_ref_id, day, users=1)
+    else:
+        moved, county = changed(instance, 'county_ref_id')
+        if moved:
+            bump(county, day, users=-1)
+            bump(instance.county_ref_id, day, users=1)
+            # Invites outside a squad are counted under the inviter's county
+            sent = Invite.objects.filter(inviter=instance, squad=None, event=None).values_list(
+                TruncDate('sent_at', tzinfo=timezone.get_default_timezone())).annotate(count=Count('pk')).order_by()
+            for sent_day, count in sent:
+                bump(county, sent_day, invites=-count)
+                bump(instance.county_ref_id, sent_day, invites=count)
+    remember(sender, instance)
+
+
+def user_deleted(sender, instance, **kwargs):
+    if not is_paused():
+        bump(instance.county_ref_id, local_day(instance.created_at), users=-1)
+
+
+def squad_counts(squad):
+    """``{day: Counter}`` of everything counted under a squad's county"""
+    tz = timezone.get_default_timezone()
+    counts = defaultdict(Counter)
+    counts[local_day(squad.created_at)]['squads'] += 1
+    members = SquadMember.objects.filter(squad=squad)
+    for metric, rows, column in (
+        ('members', members, 'joined_at'),
+        ('registered', members.filter(has_registered=True), 'joined_at'),
+        ('events', Event.objects.filter(squad=squad), 'datetime'),
+        ('invites', Invite.objects.filter(Q(squad=squad) | Q(squad=None, event__squad=squad)), 'sent_at'),
+    ):
+        for day, count in rows.values_list(TruncDate(column, tzinfo=tz)).annotate(count=Count('pk')).order_by():
+            counts[day][metric] += count
+    return counts
+
+
+def squad_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or is_paused():
+        return
+    if created:
+        bump(instance.county_ref_id, local_day(instance.created_at), squads=1)
+    else:
+        moved, county = changed(instance, 'county_ref_id')
+        if moved:
+            # Runs in the squad's save transaction (Squad records squad.moved)
+            for day, counts in squad_counts(instance).items():
+                bump(county, day, **{metric: -count for metric, count in counts.items()})
+                bump(instance.county_ref_id, day, **counts)
+    remember(sender, instance)
+
+
+def squad_deleted(sender, instance, **kwargs):
+    if not is_paused():
+        bump(instance.county_ref_id, local_day(instance.created_at), squads=-1)
+
+
+def event_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or is_paused():
+        return
+    if created:
+        bump(squad_county(instance.squad_id), local_day(instance.datetime), events=1)
+    else:
+        moved_squad, squad_id = changed(instance, 'squad_id')
+        moved_time, datetime = changed(instance, 'datetime')
+        if moved_squad or moved_time:
+            bump(squad_county(squad_id if moved_squad else instance.squad_id),
+                 local_day(datetime if moved_time else instance.datetime), events=-1)
+            bump(squad_county(instance.squad_id), local_day(instance.datetime), events=1)
+    remember(sender, instance)
+
+
+def event_deleted(sender, instance, **kwargs):
+    if not is_paused():
+        bump(squad_county(instance.squad_id), local_day(instance.datetime), events=-1)
+
+
+def invite_deleted(sender, instance, **kwargs):
+    if not is_paused():
+        bump(instance.county_key(), local_day(instance.sent_at), invites=-1)
+
+
+HANDLERS = [
+    (User, user_saved, user_deleted),
+    (Squad, squad_saved, squad_deleted),
+    (Event, event_saved, event_deleted),
+    (Invite, None, invite_deleted),  # Created: counted by the outbox consumer
+]
+
+
+# Outbox consumer
+
+MEMBER_DELTAS = {
+    outbox.MEMBER_JOINED: 1,
+    outbox.MEMBER_LEFT: -1,
+}
+REGISTERED_DELTAS = {
+    outbox.MEMBER_REGISTERED: 1,
+    outbox.MEMBER_UNREGISTERED: -1,
+}
+
+
+@outbox.consumer('core.dashboard', events=[*MEMBER_DELTAS, *REGISTERED_DELTAS, outbox.INVITE_CREATED])
+def apply_events(events):
+    """Count a batch of membership, registration and invite events with one bump per county and day"""
+    deltas = defaultdict(Counter)
+    for event in events:
+        payload = event.payload
+        if event.name == outbox.INVITE_CREATED:
+            deltas[payload['county'], local_day(parse_datetime(payload['sent_at']))]['invites'] += 1
+            continue
+        counts = deltas[payload['county'], local_day(parse_datetime(payload['joined_at']))]
+        if event.name in MEMBER_DELTAS:
+            counts['members'] += MEMBER_DELTAS[event.name]
+            counts['registered'] += MEMBER_DELTAS[event.name] * int(payload['registered'])
+        else:
+            counts['registered'] += REGISTERED_DELTAS[event.name]
+    for (county, day), counts in deltas.items():
+        bump(county, day, **counts)
+
+
+# Full rebuild
+
+class EpochSeconds(Func):
+    """Seconds since 1970 of a datetime column, computed by the database rather than per row in Python"""
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+                           **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='FLOOR(EXTRACT(EPOCH FROM %(expressions)s))::bigint',
+                           **extra_context)
+
+
+def sources():
+    """``(metric, queryset of (county, epoch seconds) rows)`` for everything the dashboard counts"""
+    return [
+        ('users', User.objects.values_list('county_ref', EpochSeconds('created_at'))),
+        ('squads', Squad.objects.values_list('county_ref', EpochSeconds('created_at'))),
+        ('members', SquadMember.objects.values_list('squad__county_ref', EpochSeconds('joined_at'))),
+        ('registered', SquadMember.objects.filter(has_registered=True).values_list(
+            'squad__county_ref', EpochSeconds('joined_at'))),
+        ('events', Event.objects.values_list('squad__county_ref', EpochSeconds('datetime'))),
+        ('invites', Invite.objects.annotate(county=Case(
+            When(squad__isnull=False, then='squad__county_ref'),
+            When(event__isnull=False, then='event__squad__county_ref'),
+            default='inviter__county_ref',
+        )).values_list('county', EpochSeconds('sent_at'))),
+    ]
+
+
+@lru_cache(maxsize=None)
+def hour_offset(hour):
+    """UTC offset in seconds of TIME_ZONE during an hour since 1970"""
+    moment = datetime.fromtimestamp(hour * 3600, dt_timezone.utc)
+    return int(timezone.localtime(moment, timezone.get_default_timezone()).utcoffset().total_seconds())
+
+
+def local_date(seconds):
+    return EPOCH + timedelta(days=(seconds + hour_offset(seconds // 3600)) // 86400)
+
+
+def count_rows(rows, chunk_size):
+    """``Counter`` of ``(county, local date)`` pairs, read ``chunk_size`` rows at a time"""
+    counts = Counter()
+    chunk = []
+    for row in rows.order_by().iterator(chunk_size=chunk_size):
+        if row[0] is not None:  # Rows without a county are not counted
+            chunk.append(row)
+        if len(chunk) >= chunk_size:
+            count_chunk(counts, chunk)
+            chunk = []
+    if chunk:
+        count_chunk(counts, chunk)
+    return counts
+
+
+def count_chunk(counts, chunk):
+    if np is None:
+        counts.update((county, local_date(seconds)) for county, seconds in chunk)
+        return
+    # Counties and local days become integer codes and every distinct
+    # (county, day) pair is counted in one vectorized pass; Python only sees
+    # distinct counties, hours (for the time zone offset) and pairs
+    counties, seconds = zip(*chunk)
+    seconds = np.fromiter(seconds, dtype=np.int64, count=len(seconds))
+    names, county_codes = np.unique(np.array(counties), return_inverse=True)
+    hours, hour_codes = np.unique(seconds // 3600, return_inverse=True)
+    offsets = np.fromiter((hour_offset(hour) for hour in hours.tolist()), dtype=np.int64, count=len(hours))
+    days = (seconds + offsets[hour_codes]) // 86400
+    first_day = int(days.min())
+    span = int(days.max()) - first_day + 1
+    keys, key_counts = np.unique(county_codes * span + (days - first_day), return_counts=True)
+    for key, count in zip(keys.tolist(), key_counts.tolist()):
+        code, day = divmod(key, span)
+        counts[int(names[code]), EPOCH + timedelta(days=first_day + day)] += count
+
+
+def rebuild(chunk_size=100_000):
+    """Recount the dashboard from the source tables; returns the number of rows written"""
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # The counts and the outbox events marked applied below are
+                # read in one snapshot, taken once the locks are held: events
+                # committed during the recount are left to the consumer. The
+                # consumers' positions are locked first, as the consumer does,
+                # so a batch in progress finishes first; writers wait to update
+                # the counts until the recount commits, so none are lost
+                if outermost:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute(f'LOCK TABLE {ConsumerPosition._meta.db_table} IN EXCLUSIVE MODE')
+                cursor.execute(f'LOCK TABLE {CountyStats._meta.db_table} IN EXCLUSIVE MODE')
+        # Delete before counting: on SQLite the write lock is then held
+        # throughout, so no event or row commits during the recount
+        CountyStats.objects.all().delete()
+
+        rows = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+        for metric, queryset in sources():
+            for (county_id, day), count in count_rows(queryset, chunk_size).items():
+                rows[county_id, day][metric] += count
+                rows[county_id, None][metric] += count
+        CountyStats.objects.bulk_create(
+            [CountyStats(county_id=county_id, day=day, **counts) for (county_id, day), counts in rows.items()],
+            batch_size=1000,
+        )
+        outbox.catch_up('core.dashboard')
+    return len(rows)
+
+
+# API
+
+def registration_rate(row):
+    return round(row['registered'] / row['members'], 4) if row['members'] else 0.0
+
+
+class CountyDashboardView(APIView):
+    """Registration drive progress per county (see core.dashboard)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        today = local_day(timezone.now())
+        upcoming = Counter()
+        for county_id, events in CountyStats.objects.filter(day__gte=today).values_list('county', 'events').order_by():
+            upcoming[county_id] += events
+        counties = []
+        rows = CountyStats.objects.filter(day=None).values('county', 'county__name', *METRICS).order_by('county__name')
+        for row in rows:
+            del row['events']  # All time; the dashboard shows upcoming ones
+            row['upcoming_events'] = upcoming.get(row.pop('county'), 0)
+            row['registration_rate'] = registration_rate(row)
+            counties.append({'county': row.pop('county__name'), **row})
+        totals = {name: sum(row[name] for row in counties) for name in COLUMNS}
+        totals['registration_rate'] = registration_rate(totals)
+        data = {'counties': counties, 'totals': totals}
+
+        county = request.query_params.get('county')
+        if county:
+            data['daily'] = self.daily(county, request.query_params.get('days', '30'), today)
+        return Response(data)
+
+    def daily(self, county, days, today):
+        """The county's counts for each of the last ``days`` days, oldest first"""
+        try:
+            days = int(days)
+        except ValueError:
+            days = 0
+        if not 1 <= days <= MAX_DAYS:
+            raise exceptions.ValidationError({'days': [f'Expected a number of days from 1 to {MAX_DAYS}.']})
+        first = today - timedelta(days=days - 1)
+        stored = {
+            row['day']: row for row in CountyStats.objects.filter(
+                county=regions.resolver().county(county), day__gte=first, day__lte=today).values('day', *METRICS)
+        }
+        return [
+            stored.get(day, {'day': day, **dict.fromkeys(METRICS, 0)})
+            for day in (first + timedelta(days=offset) for offset in range(days))
+        ]
@@ -0,0 +1,170 @@
+"""
+Helpers for reading the bundled Kenyan boundary files, and for serving
+them precompressed.
+
+``manage.py build_geodata`` writes every ``.geojson`` file of GEODATA_DIR
+to GEODATA_BUILD_DIR minified, under a name containing a hash of its
+content, with ``.gz`` and ``.br`` variants compressed at the highest
+settings. ``/geodata/<hashed name>`` serves the smallest variant the client
+accepts and may be cached forever; ``/geodata/<name>`` redirects to the
+current hashed name, and ``/api/geodata/`` lists them.
+"""
+import gzip
+import hashlib
+import json
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+
+from .compression import brotli
+
+COUNTIES_FILE = 'kenya_counties.geojson'
+CONSTITUENCIES_FILE = 'kenya_constituencies.geojson'
+
+
+@lru_cache(maxsize=None)
+def load_geojson(filename):
+    """Load and cache a GeoJSON FeatureCollection from GEODATA_DIR"""
+    with open(settings.GEODATA_DIR / filename, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def _iter_points(geometry):
+    """Yield every (lng, lat) vertex of a Polygon or MultiPolygon"""
+    polygons = geometry['coordinates']
+    if geometry['type'] == 'Polygon':
+        polygons = [polygons]
+    for polygon in polygons:
+        for ring in polygon:
+            for lng, lat in ring:
+                yield lng, lat
+
+
+def feature_bbox(feature):
+    """Return (min_lat, min_lng, max_lat, max_lng) for a feature"""
+    lngs, lats = zip(*_iter_points(feature['geometry']))
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+
+@lru_cache(maxsize=None)
+def county_names():
+    """Map county code to its canonical name as spelled in the counties file"""
+    return {
+        int(feature['properties']['COUNTY_COD']): feature['properties']['COUNTY_NAM']
+        for feature in load_geojson(COUNTIES_FILE)['features']
+        if feature['properties'].get('COUNTY_NAM')
+    }
+
+
+@lru_cache(maxsize=None)
+def constituencies():
+    """
+    Return one dict per constituency with its county, code and bounding box.
+
+    County names are taken from the counties file because the constituencies
+    file spells some of them inconsistently. Features without a county
+    (slivers of lake or border) are skipped.
+    """
+    names = county_names()
+    result = []
+    for feature in load_geojson(CONSTITUENCIES_FILE)['features']:
+        props = feature['properties']
+        if not props.get('COUNTY_NAM') or not props.get('CONSTITUEN'):
+            continue
+        result.append({
+            'county': names.get(int(props['COUNTY_COD']), props['COUNTY_NAM']),
+            'county_code': int(props['COUNTY_COD']),
+            'name': props['CONSTITUEN'],
+            'code': int(props['CONST_CODE']),
+            'bbox': feature_bbox(feature),
+        })
+    return tuple(result)
+
+
+def county_weights():
+    """
+    Return (county, weight) pairs for the 47 counties, ordered by county code.
+
+    The number of constituencies is used as the weight: constituencies are
+    drawn to roughly equal population, so it is a reasonable proxy for how
+    many users, squads and centers a county should hold.
+    """
+    counts = Counter(constituency['county_code'] for constituency in constituencies())
+    return [(name, counts[code]) for code, name in sorted(county_names().items()) if counts[code]]
+
+
+def _in_ring(lat, lng, ring):
+    """Ray casting: whether (lat, lng) is inside a ring of (lng, lat) vertices"""
+    inside = False
+    previous_lng, previous_lat = ring[-1]
+    for vertex_lng, vertex_lat in ring:
+        if (vertex_lat > lat) != (previous_lat > lat) and \
+                lng < (previous_lng - vertex_lng) * (lat - vertex_lat) / (previous_lat - vertex_lat) + vertex_lng:
+            inside = not inside
+        previous_lng, previous_lat = vertex_lng, vertex_lat
+    return inside
+
+
+def geometry_contains(geometry, lat, lng):
+    """Whether a Polygon or MultiPolygon contains (lat, lng), holes excluded"""
+    polygons = geometry['coordinates']
+    if geometry['type'] == 'Polygon':
+        polygons = [polygons]
+    return any(_in_ring(lat, lng, outer) and not any(_in_ring(lat, lng, hole) for hole in holes)
+               for outer, *holes in polygons)
+
+
+@lru_cache(maxsize=None)
+def _constituency_shapes():
+    """``(constituencies() entry, geometry)`` pairs"""
+    geometries = [feature['geometry'] for feature in load_geojson(CONSTITUENCIES_FILE)['features']
+                  if feature['properties'].get('COUNTY_NAM') and feature['properties'].get('CONSTITUEN')]
+    return tuple(zip(constituencies(), geometries))
+
+
+def constituency_at(lat, lng):
+    """The ``constituencies()`` entry containing (lat, lng), or None"""
+    for constituency, geometry in _constituency_shapes():
+        min_lat, min_lng, max_lat, max_lng = constituency['bbox']
+        if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng and geometry_contains(geometry, lat, lng):
+            return constituency
+    return None
+
+
+# Precompressed files
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def build_geodata(source_dir=None, output_dir=None):
+    """Write the hashed, minified and compressed files; returns the manifest"""
+    source_dir = source_dir or settings.GEODATA_DIR
+    output_dir = output_dir or settings.GEODATA_BUILD_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for path in sorted(source_dir.glob('*.geojson')):
+        with open(path, encoding='utf-8') as fh:
+            data = json.dumps(json.load(fh), separators=(',', ':'), ensure_ascii=False).encode()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed = f'{path.stem}.{digest}{path.suffix}'
+        manifest[path.name] = hashed
+        target = output_dir / hashed
+        if target.exists():
+            continue  # Same content as an earlier build
+        (output_dir / f'{hashed}.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            (output_dir / f'{hashed}.br').write_bytes(brotli.compress(data, quality=11))
+        target.write_bytes(data)  # Last, so an interrupted build is redone
+    (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    geodata_manifest.cache_clear()
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def geodata_manifest():
+    """``{name: hashed name}`` of the last build, or {} when there has been none"""
+    try:
+        return json.loads((settings.GEODATA_BUILD_DIR / MANIFEST_FILE).read_text())
+    except FileNotFoundError:
+        return {}
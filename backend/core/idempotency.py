@@ -0,0 +1,221 @@
+"""
+``Idempotency-Key`` support for POST requests.
+
+Mobile clients retry writes that timed out, and the first attempt may well
+have succeeded: the user joins twice, invites go out twice, a squad is
+created twice. A client that sends a unique key with each write
+
+    POST /api/squads/<id>/join/
+    Idempotency-Key: 4f8c1d0e-...
+
+and the same key with each retry of it gets the first attempt's response
+back, with ``Idempotent-Replayed: true``, and the view does not run again.
+Keys are per user and kept for ``IDEMPOTENCY_TTL_HOURS``.
+
+* The same key with a different method, path or body answers 422.
+* A retry that arrives while the first attempt is still running answers 409
+  with ``Retry-After``. An attempt that has not finished after
+  ``IDEMPOTENCY_LOCK_SECONDS`` is presumed lost and the retry runs instead.
+* Server errors, throttling and authentication failures are not stored, so
+  a retry runs again.
+
+Only requests with a valid access token are covered; the user comes from the
+token itself, without a database query. A replay costs one SELECT and no
+writes, so a retry storm during an outage does not multiply writes.
+"""
+import hashlib
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import metrics
+from .async_views import render
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+NOT_STORED = {401, 403, 408, 409, 425, 429}  # Worth retrying: the outcome may differ next time
+UNSTORED_HEADERS = {'content-length', 'set-cookie'}
+
+authentication = JWTAuthentication()
+
+
+def token_user_id(request):
+    """The user id claim of a valid access token, or None"""
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        return str(authentication.get_validated_token(raw_token)[jwt_settings.USER_ID_CLAIM])
+    except (InvalidToken, KeyError):
+        # The view rejects the request when it authenticates
+        return None
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.get_full_path()}\n'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim(user_id, key, request_fingerprint):
+    """
+    ``(outcome, record)``: ``'execute'`` once the key is reserved for this
+    request, or ``'replayed'``, ``'in_progress'`` or ``'mismatch'`` with the
+    stored record.
+    """
+    now = timezone.now()
+    keys = IdempotencyKey.objects.filter(user_id=user_id, key=key)
+    record = keys.first()
+    if record is not None and record.expires_at <= now:
+        keys.filter(pk=record.pk).delete()
+        record = None
+    if record is None:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    user_id=user_id, key=key, fingerprint=request_fingerprint, created_at=now,
+                    expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS))
+            return 'execute', None
+        except IntegrityError:
+            # A concurrent attempt reserved it first
+            record = keys.first()
+            if record is None:
+                return 'in_progress', None
+
+    if record.fingerprint != request_fingerprint:
+        return 'mismatch', record
+    if record.status_code is not None:
+        return 'replayed', record
+    if record.created_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS):
+        # The first attempt died without a response; let this one take over
+        if keys.filter(pk=record.pk, status_code=None, created_at=record.created_at).update(created_at=now):
+            return 'execute', None
+    return 'in_progress', record
+
+
+def store(user_id, key, response):
+    keys = IdempotencyKey.objects.filter(user_id=user_id, key=key, status_code=None)
+    if response.streaming or response.status_code >= 500 or response.status_code in NOT_STORED:
+        keys.delete()
+        return
+    headers = {name: value for name, value in response.items() if name.lower() not in UNSTORED_HEADERS}
+    keys.update(status_code=response.status_code, headers=headers, body=response.content)
+
+
+def release(user_id, key):
+    """Free a key whose request raised, so a retry runs again"""
+    IdempotencyKey.objects.filter(user_id=user_id, key=key, status_code=None).delete()
+
+
+def prune_keys(batch_size=5000):
+    """Delete expired keys; returns how many"""
+    deleted = 0
+    expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+def replay(record):
+    response = HttpResponse(bytes(record.body), status=record.status_code)
+    for name, value in record.headers.items():
+        response.headers[name] = value
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def refusal(outcome):
+    if outcome == 'mismatch':
+        return render({'detail': 'This Idempotency-Key was used with a different request.'}, status=422)
+    return render({'detail': 'A request with this Idempotency-Key is still being processed.'}, status=409,
+                  headers={'Retry-After': '1'})
+
+
+def scope(request):
+    """``(user id, key)`` for a covered request, an error response, or None to pass it through"""
+    key = request.META.get(HEADER)
+    if request.method != 'POST' or key is None:
+        return None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return render({'detail': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters.'}, status=400)
+    user_id = token_user_id(request)
+    if user_id is None:
+        # Anonymous requests (sign-in, OTP) are never replayed to someone else
+        return None
+    return user_id, key
+
+
+def handle(request, get_response):
+    """``get_response(request)``, or the stored response when ``request`` is a retry"""
+    covered = scope(request)
+    if not isinstance(covered, tuple):
+        return covered or get_response(request)
+    user_id, key = covered
+    outcome, record = claim(user_id, key, fingerprint(request))
+    metrics.IDEMPOTENT_REQUESTS.inc(outcome=outcome)
+    if outcome != 'execute':
+        return replay(record) if outcome == 'replayed' else refusal(outcome)
+    try:
+        response = get_response(request)
+    except BaseException:
+        release(user_id, key)
+        raise
+    store(user_id, key, response)
+    return response
+
+
+async def ahandle(request, get_response):
+    """Async ``handle``, for an async ``get_response``"""
+    covered = scope(request)
+    if not isinstance(covered, tuple):
+        return covered or await get_response(request)
+    user_id, key = covered
+    outcome, record = await sync_to_async(claim)(user_id, key, fingerprint(request))
+    metrics.IDEMPOTENT_REQUESTS.inc(outcome=outcome)
+    if outcome != 'execute':
+        return replay(record) if outcome == 'replayed' else refusal(outcome)
+    try:
+        response = await get_response(request)
+    except BaseException:
+        await sync_to_async(release)(user_id, key)
+        raise
+    await sync_to_async(store)(user_id, key, response)
+    return response
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response to a POST retried with the same
+    ``Idempotency-Key``.
+
+    Place it last in MIDDLEWARE, so replayed responses are still measured
+    and compressed like any other. Works in both sync and async stacks.
+    Batched sub-requests skip the middleware; core.batch calls ``ahandle``
+    for each of them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return ahandle(request, self.get_response)
+        return handle(request, self.get_response)
@@ -0,0 +1,28 @@
+"""
+Clients for outbound services, created on first use.
+
+``twilio`` and ``googlemaps`` each take around 100ms to import, so they are
+imported here, inside the functions, rather than at module level in the
+views that use them.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_twilio_client():
+    """Twilio REST client, or None when Twilio is not configured"""
+    if not (settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN):
+        return None
+    from twilio.rest import Client
+    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+
+@lru_cache(maxsize=None)
+def get_maps_client():
+    """Google Maps client, or None when no API key is configured"""
+    if not settings.GOOGLE_MAPS_API_KEY:
+        return None
+    import googlemaps
+    return googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
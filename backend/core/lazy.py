@@ -0,0 +1,31 @@
+"""
+Deferred imports for code that API workers rarely need.
+
+Workers are started and stopped often, so every module imported at startup
+slows down a cold start. Views that are seldom hit (schema generation, docs)
+and clients of outbound services (SMS, geocoding) are only imported on first
+use. Run ``python manage.py startup_profile`` to see what a worker imports.
+"""
+from django.utils.module_loading import import_string
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """
+    URLconf entry for a class-based DRF view that is imported on its first request.
+
+    ``path('api/docs/', lazy_view('drf_spectacular.views.SpectacularAPIView'))``
+    behaves like ``SpectacularAPIView.as_view()`` without importing the module
+    when the URLconf loads.
+    """
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    # DRF views are csrf_exempt; CsrfViewMiddleware checks this before the view is loaded
+    wrapper.csrf_exempt = True
+    wrapper.lazy_view_path = dotted_path
+    return wrapper
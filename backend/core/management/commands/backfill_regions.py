@@ -0,0 +1,32 @@
+"""
+Seed the county and constituency tables and link rows to them.
+
+    python manage.py backfill_regions
+    python manage.py backfill_regions --chunk-size 20000
+
+Inserts or renames the counties and constituencies of the bundled boundary
+files, then sets ``county_ref`` (and on centers ``constituency_ref`` and
+``ward_ref``) from the names of every user, squad and center whose keys
+are out of date. Rows saved through the ORM are kept linked as they are
+written; run this after bulk loads or other writes that bypass ``save()``.
+See ``core.regions``.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import regions
+
+
+class Command(BaseCommand):
+    help = 'Seed counties and constituencies and link users, squads and centers to them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows read and updated per transaction')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counties, constituencies = regions.seed()
+        updated = regions.backfill(chunk_size=options['chunk_size'])
+        self.stdout.write(f'Seeded {counties} counties and {constituencies} constituencies; '
+                          f'linked {updated} rows in {time.monotonic() - started:.1f}s')
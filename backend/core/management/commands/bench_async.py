@@ -0,0 +1,44 @@
+"""
+Compare per-process read throughput of a WSGI and an ASGI deployment.
+
+Start one single-worker server of each kind against the same database, the
+ASGI one with the async read endpoints enabled, for example::
+
+    gunicorn pamoja_vote.wsgi -w 1 --threads 8 -b 127.0.0.1:8001
+    ASYNC_READ_ENDPOINTS=true uvicorn pamoja_vote.asgi:application --workers 1 --port 8002
+
+then run ``python manage.py bench_async --wsgi-url http://127.0.0.1:8001
+--asgi-url http://127.0.0.1:8002``. Both servers get the same ``reads`` load
+test flow (see ``core.benchmarks.loadtest``), one after the other.
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Compare read endpoint throughput per process between WSGI and ASGI servers'
+
+    def add_arguments(self, parser):
+        loadtest.add_arguments(parser)
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8001', help='Single-worker WSGI server')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8002', help='Single-worker ASGI server')
+        parser.set_defaults(flows='reads', duration=30)
+
+    def handle(self, *args, **options):
+        summaries = {}
+        for label in ('wsgi', 'asgi'):
+            run_options = loadtest.build_options(dict(options, base_url=options[f'{label}_url']))
+            self.stdout.write(f"\n{label.upper()} ({options[f'{label}_url']})")
+            summaries[label] = asyncio.run(loadtest.run(run_options))
+            self.stdout.write(loadtest.format_report(summaries[label]))
+
+        self.stdout.write(f"\n{'endpoint':<36} {'wsgi req/s':>11} {'asgi req/s':>11} {'ratio':>7}")
+        for endpoint, stats in summaries['wsgi'].items():
+            asgi = summaries['asgi'].get(endpoint)
+            if not asgi:
+                continue
+            ratio = asgi['rps'] / stats['rps'] if stats['rps'] else 0
+            self.stdout.write(f"{endpoint:<36} {stats['rps']:>11.1f} {asgi['rps']:>11.1f} {ratio:>6.2f}x")
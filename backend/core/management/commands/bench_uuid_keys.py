@@ -0,0 +1,34 @@
+"""
+Compare bulk insert throughput and primary key index size with random
+(version 4) and time-ordered (version 7) UUID primary keys.
+
+    python manage.py bench_uuid_keys                      # 10M rows of each
+    python manage.py bench_uuid_keys --rows 1000000
+    python manage.py bench_uuid_keys --database benchmark --kinds v7
+
+The scratch tables are created in and dropped from ``--database``, so run
+it against a benchmark database rather than production. See
+``core.benchmarks.uuid_keys`` for what is measured.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import uuid_keys
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk inserts and primary key index size with UUIDv4 vs UUIDv7 ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help='Rows inserted for each kind of id')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per transaction')
+        parser.add_argument('--database', default='default', help='Database alias to create the scratch tables in')
+        parser.add_argument('--kinds', nargs='+', choices=list(uuid_keys.KINDS), default=list(uuid_keys.KINDS),
+                            help='Kinds of id to compare')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        results = uuid_keys.run(options['database'], options['rows'], options['batch_size'], options['kinds'])
+        self.stdout.write(uuid_keys.format_report(results))
+        self.stdout.write(f'Done in {time.monotonic() - started:.1f}s')
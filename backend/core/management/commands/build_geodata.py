@@ -0,0 +1,26 @@
+"""
+Precompress the bundled boundary files.
+
+Run on deploy, next to ``build_schema``. Writes each ``.geojson`` file of
+GEODATA_DIR to GEODATA_BUILD_DIR under a content-hashed name, with gzip and
+(if the ``brotli`` package is installed) Brotli variants. See ``core.geodata``.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.compression import brotli
+from core.geodata import build_geodata
+
+
+class Command(BaseCommand):
+    help = 'Write hashed, precompressed copies of the GeoJSON boundary files served at /geodata/'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        manifest = build_geodata()
+        for name, hashed in manifest.items():
+            self.stdout.write(f'{name} -> {hashed}')
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; only .gz variants were written'))
+        self.stdout.write(f'Built {len(manifest)} files in {time.perf_counter() - started:.1f}s')
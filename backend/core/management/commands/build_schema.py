@@ -0,0 +1,37 @@
+"""
+Generate the OpenAPI schema for the current code version.
+
+Run on deploy, after ``collectstatic``, so no API process has to generate
+the schema itself. See ``core.schema``.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    help = 'Generate and store the OpenAPI schema served at /api/docs/ for the current code version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lang', action='append', default=[],
+                            help='Also build the schema for this language (repeatable)')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete schemas stored for other code versions')
+
+    def handle(self, *args, **options):
+        version = schema.code_version()
+        for language in [None] + options['lang']:
+            started = time.perf_counter()
+            path = schema.schema_path(language=language)
+            schema.write_schema(schema.generate_schema(language=language), path)
+            self.stdout.write(f'Wrote {path} in {(time.perf_counter() - started) * 1000:.0f}ms')
+
+        if options['prune']:
+            for path in settings.OPENAPI_SCHEMA_DIR.glob('openapi-*.json'):
+                if not path.name.startswith(f'openapi-{version}'):
+                    path.unlink()
+                    self.stdout.write(f'Removed {path}')
+        self.stdout.write(self.style.SUCCESS(f'Schema built for code version {version}'))
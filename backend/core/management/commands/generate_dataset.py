@@ -0,0 +1,331 @@
+"""
+Generate a deterministic synthetic dataset for performance work.
+
+The full shape mirrors a national registration drive:
+
+    1M users, 100k squads, 5M memberships, 50k centers,
+    500k events, 10M RSVPs and 20M invites
+
+spread over the 47 counties of the bundled boundary files. ``--scale``
+shrinks every table proportionally so the same shape can be produced on a
+laptop (``--scale 0.01``) or a benchmark box (``--scale 1``). The same seed
+and scale always yield the same rows and primary keys, so loading into a
+database that already has data needs ``--flush``.
+
+Rows go through ``bulk_create`` at roughly 5-10k rows/s, bound by building
+model instances rather than by the database: ``--scale 0.01`` (370k rows)
+takes about a minute, the full shape (37M rows) one to two hours.
+"""
+import hashlib
+import random
+import time
+from bisect import bisect
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from centers.models import Center, CenterRecommendation
+from core import dashboard, regions
+from core.geodata import constituencies, county_weights
+from core.ids import uuid7_at
+from core.models import Change
+from core.sync import backfill_changes
+from events.models import Event, EventReminder, EventRSVP
+from invites.models import Invite
+from squads import discovery
+from squads.models import OpenSquad, Squad, SquadMember
+from users.models import User
+
+FULL_SHAPE = {
+    'users': 1_000_000,
+    'squads': 100_000,
+    'memberships': 5_000_000,
+    'centers': 50_000,
+    'events': 500_000,
+    'rsvps': 10_000_000,
+    'invites': 20_000_000,
+}
+
+SQUAD_SIZES = [None, 30, 50, 80, 100, 150]
+CENTER_KINDS = ['Primary School', 'Secondary School', 'Social Hall', 'Chief\'s Office', 'Polytechnic']
+RSVP_STATUSES = ['yes', 'yes', 'maybe', 'no']
+INVITE_STATUSES = ['sent', 'sent', 'delivered', 'delivered', 'delivered', 'failed']
+PHONE_PREFIX = '+2547'
+ID_EPOCH_MS = 1_767_225_600_000  # 2026-01-01, so primary keys do not depend on --anchor
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset for scale and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=0.01,
+                            help='Fraction of the full dataset shape to generate (1.0 = 1M users, 37M rows in all; '
+                                 'at 5-10k rows/s 0.01 takes about a minute and 1.0 one to two hours)')
+        for table in FULL_SHAPE:
+            parser.add_argument(f'--{table}', type=int, default=None,
+                                help=f'Override the number of {table} (full shape: {FULL_SHAPE[table]:,})')
+        parser.add_argument('--seed', type=int, default=2027, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--anchor', default=None,
+                            help='Reference date (YYYY-MM-DD) event and registration dates are spread around; defaults to today')
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete all existing squads, centers, events, invites and non-staff users first')
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.shape = {
+            table: options[table] if options[table] is not None else max(1, int(full * options['scale']))
+            for table, full in FULL_SHAPE.items()
+        }
+        if options['anchor']:
+            anchor = datetime.strptime(options['anchor'], '%Y-%m-%d').date()
+        else:
+            anchor = timezone.localdate()
+        self.anchor = timezone.make_aware(datetime.combine(anchor, dt_time(9, 0)))
+
+        shape = self.shape
+        if shape['memberships'] > shape['users'] * shape['squads']:
+            raise CommandError('More memberships requested than distinct (user, squad) pairs.')
+        if shape['rsvps'] > shape['events'] * shape['users']:
+            raise CommandError('More RSVPs requested than distinct (event, user) pairs.')
+
+        counties = county_weights()
+        self.counties = [county for county, _ in counties]
+        self.county_cum_weights = list(accumulate(weight for _, weight in counties))
+
+        if options['flush']:
+            self.flush()
+        elif self.has_data():
+            raise CommandError('The database already has squads, centers, events, invites or non-staff users. '
+                               'Pass --flush to delete them first.')
+
+        if connection.vendor == 'sqlite':
+            self.tune_sqlite()
+
+        self.stdout.write('Generating dataset: ' + ', '.join(f'{k}={v:,}' for k, v in shape.items()))
+        started = time.monotonic()
+        self.insert(User, self.generate_users())
+        self.insert(Center, self.generate_centers())
+        self.insert(Squad, self.generate_squads())
+        self.insert(SquadMember, self.generate_memberships())
+        self.insert(Event, self.generate_events())
+        self.insert(EventRSVP, self.generate_rsvps())
+        self.insert(Invite, self.generate_invites())
+        with transaction.atomic():
+            # bulk_create sends no signals, so log the rows for /api/sync/ here
+            backfill_changes(apps.get_model, batch_size=self.batch_size)
+        # ... link them to their counties, count them for the county
+        # dashboard, and index the open squads
+        regions.backfill()
+        dashboard.rebuild()
+        discovery.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
+
+    # Helpers
+
+    def uuid_for(self, kind, index):
+        """
+        Deterministic UUIDv7 for the index-th row of a table: a millisecond
+        after ID_EPOCH per row, so ids ascend in insertion order as
+        ``core.ids.uuid7()`` ids do
+        """
+        digest = hashlib.blake2b(f'{self.seed}:{kind}:{index}'.encode(), digest_size=10).digest()
+        rand = int.from_bytes(digest, 'big')
+        return uuid7_at(ID_EPOCH_MS + index, rand >> 62, rand)
+
+    def rng(self, kind):
+        return random.Random(f'{self.seed}:{kind}')
+
+    def pick_county(self, rng):
+        """Weighted county choice; returns the county index"""
+        return bisect(self.county_cum_weights, rng.random() * self.county_cum_weights[-1])
+
+    def phone(self, index):
+        return f'{PHONE_PREFIX}{index:08d}'
+
+    def tune_sqlite(self):
+        """Trade durability for load speed; the dataset can always be regenerated"""
+        if not connection.in_atomic_block:
+            # Pragmas cannot change inside a transaction, e.g. when called from a TestCase
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+                cursor.execute('PRAGMA journal_mode = MEMORY')
+        # SQLite >= 3.32 accepts 32766 bound parameters, but Django assumes
+        # 999, which caps multi-row INSERTs at ~100 rows.
+        connection.features.max_query_params = 32766
+
+    def has_data(self):
+        """Whether rows the generated ones could collide with (same ids and phone numbers) exist"""
+        return (User.objects.filter(is_staff=False, is_superuser=False).exists()
+                or any(model.objects.exists() for model in (Center, Squad, Event, Invite)))
+
+    def flush(self):
+        self.stdout.write('Flushing existing data...')
+        # Plain DELETEs: through the ORM every row would send delete signals
+        # and log a sync change one at a time
+        with connection.cursor() as cursor:
+            for model in (Change, Invite, EventReminder, EventRSVP, Event, CenterRecommendation, OpenSquad,
+                          SquadMember, Squad, Center):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        with dashboard.paused():  # Recounted by dashboard.rebuild() once the data is in
+            User.objects.filter(is_staff=False, is_superuser=False).delete()
+
+    def insert(self, model, rows):
+        """bulk_create rows in batches, one transaction per batch"""
+        label = model._meta.verbose_name_plural
+        started = time.monotonic()
+        total = 0
+        batch = []
+        for obj in rows:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                total += self.flush_batch(model, batch)
+                batch = []
+        if batch:
+            total += self.flush_batch(model, batch)
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(f'  {label}: {total:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+
+    def flush_batch(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+        return len(batch)
+
+    # Generators
+
+    def generate_users(self):
+        rng = self.rng('users')
+        # Users sign in with OTP, so every synthetic account shares one unusable password
+        password = make_password(None)
+        for i in range(self.shape['users']):
+            yield User(
+                id=self.uuid_for('user', i),
+                phone_number=self.phone(i),
+                email=f'user{i}@synthetic.local',
+                first_name=f'User{i}',
+                last_name='Synthetic',
+                county=self.counties[self.pick_county(rng)],
+                password=password,
+            )
+
+    def generate_centers(self):
+        rng = self.rng('centers')
+        by_county = {}
+        for constituency in constituencies():
+            by_county.setdefault(constituency['county'], []).append(constituency)
+
+        # Remember which centers belong to each county so squads pick a local one
+        self.center_county = []
+        self.centers_by_county = {}
+        for i in range(self.shape['centers']):
+            county_index = self.pick_county(rng)
+            county = self.counties[county_index]
+            constituency = rng.choice(by_county[county])
+            min_lat, min_lng, max_lat, max_lng = constituency['bbox']
+            ward = f"{constituency['name'].title()} Ward {rng.randint(1, 6)}"
+            name = f"{constituency['name'].title()} {rng.choice(CENTER_KINDS)} {i}"
+            self.center_county.append(county_index)
+            self.centers_by_county.setdefault(county_index, []).append(i)
+            yield Center(
+                id=self.uuid_for('center', i),
+                name=name,
+                county=county,
+                constituency=constituency['name'],
+                ward=ward,
+                polling_station_name=name,
+                address=f'{name}, {ward}, {county.title()}',
+                lat=Decimal(f'{rng.uniform(min_lat, max_lat):.6f}'),
+                lng=Decimal(f'{rng.uniform(min_lng, max_lng):.6f}'),
+                opening_hours={'mon-fri': '08:00-17:00', 'sat': '09:00-13:00'},
+            )
+
+    def generate_squads(self):
+        rng = self.rng('squads')
+        users = self.shape['users']
+        anchor_date = self.anchor.date()
+        self.squad_center = []
+        for i in range(self.shape['squads']):
+            county_index = self.pick_county(rng)
+            local_centers = self.centers_by_county.get(county_index)
+            if local_centers:
+                center_index = rng.choice(local_centers)
+            else:
+                center_index = rng.randrange(self.shape['centers'])
+                county_index = self.center_county[center_index]
+            self.squad_center.append(center_index)
+            yield Squad(
+                id=self.uuid_for('squad', i),
+                name=f'{self.counties[county_index].title()} Squad {i}',
+                description='Synthetic squad',
+                max_members=rng.choice(SQUAD_SIZES),
+                county=self.counties[county_index],
+                is_public=rng.random() < 0.85,
+                voter_registration_date=anchor_date + timedelta(days=rng.randint(-30, 90)),
+                registration_center_id=self.uuid_for('center', center_index),
+                owner_id=self.uuid_for('user', rng.randrange(users)),
+            )
+
+    def generate_memberships(self):
+        # Membership i belongs to user i % U and, on the r-th pass over the
+        # users, to squad (base(user) + r) % S; r < S keeps (user, squad) unique.
+        rng = self.rng('memberships')
+        users, squads = self.shape['users'], self.shape['squads']
+        for i in range(self.shape['memberships']):
+            user, r = i % users, i // users
+            squad = (user * 2654435761 + r) % squads
+            yield SquadMember(
+                id=self.uuid_for('membership', i),
+                user_id=self.uuid_for('user', user),
+                squad_id=self.uuid_for('squad', squad),
+                role='leader' if rng.random() < 0.02 else 'member',
+                has_registered=rng.random() < 0.35,
+            )
+
+    def generate_events(self):
+        rng = self.rng('events')
+        for i in range(self.shape['events']):
+            squad = rng.randrange(self.shape['squads'])
+            yield Event(
+                id=self.uuid_for('event', i),
+                squad_id=self.uuid_for('squad', squad),
+                center_id=self.uuid_for('center', self.squad_center[squad]),
+                datetime=self.anchor + timedelta(minutes=rng.randint(-60 * 24 * 60, 120 * 24 * 60)),
+                meeting_point='Main gate',
+            )
+
+    def generate_rsvps(self):
+        # Same trick as memberships: distinct users per event while r < U
+        rng = self.rng('rsvps')
+        events, users = self.shape['events'], self.shape['users']
+        for i in range(self.shape['rsvps']):
+            event, r = i % events, i // events
+            user = (event * 40503 + r) % users
+            yield EventRSVP(
+                id=self.uuid_for('rsvp', i),
+                event_id=self.uuid_for('event', event),
+                user_id=self.uuid_for('user', user),
+                status=rng.choice(RSVP_STATUSES),
+            )
+
+    def generate_invites(self):
+        rng = self.rng('invites')
+        users, squads, events = self.shape['users'], self.shape['squads'], self.shape['events']
+        for i in range(self.shape['invites']):
+            for_squad = rng.random() < 0.6
+            yield Invite(
+                id=self.uuid_for('invite', i),
+                squad_id=self.uuid_for('squad', rng.randrange(squads)) if for_squad else None,
+                event_id=None if for_squad else self.uuid_for('event', rng.randrange(events)),
+                inviter_id=self.uuid_for('user', rng.randrange(users)),
+                invitee_contact=f'{PHONE_PREFIX}{rng.randrange(10 ** 8):08d}',
+                channel='whatsapp' if rng.random() < 0.8 else 'sms',
+                status=rng.choice(INVITE_STATUSES),
+            )
@@ -0,0 +1,55 @@
+"""
+Check the query plans of the hot read paths for full scans and sorts.
+
+    python manage.py generate_dataset --scale 0.001
+    python manage.py index_advisor            # report
+    python manage.py index_advisor --strict   # fail on unexpected findings (CI)
+    python manage.py index_advisor --plans squads.public events.upcoming
+
+See ``core.benchmarks.query_plans`` for the checks and what is reported.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.query_plans import CHECKS, Sample, run_check
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot queries and flag full table scans and sorts that no index avoids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('checks', nargs='*', help='Only run these checks (e.g. squads.public)')
+        parser.add_argument('--plans', action='store_true', help='Print the full query plan of each check')
+        parser.add_argument('--strict', action='store_true',
+                            help='Exit with an error when a check has findings that are not allowed')
+
+    def handle(self, *args, **options):
+        checks = [check for check in CHECKS if not options['checks'] or check.name in options['checks']]
+        unknown = set(options['checks']) - {check.name for check in checks}
+        if unknown:
+            raise CommandError(f"Unknown checks: {', '.join(sorted(unknown))}")
+        try:
+            sample = Sample()
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        failed = []
+        for check in checks:
+            plan, results = run_check(check, sample)
+            unexpected = [line for _, line, reason in results if reason is None]
+            if unexpected:
+                failed.append(check.name)
+                self.stdout.write(self.style.ERROR(f'FAIL {check.name}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok   {check.name}'))
+            for key, line, reason in results:
+                if reason is None:
+                    self.stdout.write(f'       {line}')
+                else:
+                    self.stdout.write(f'       {line}  (allowed: {reason})')
+            if options['plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'         | {line}')
+
+        self.stdout.write(f'{len(checks) - len(failed)}/{len(checks)} checks without unexpected scans or sorts')
+        if failed and options['strict']:
+            raise CommandError(f"Unexpected scans or sorts in: {', '.join(failed)}")
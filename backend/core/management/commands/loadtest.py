@@ -0,0 +1,35 @@
+"""
+Run the end-to-end API load test against a running server.
+
+See ``core.benchmarks.loadtest`` for the flows and the report format.
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import loadtest
+
+DEFAULT_BASELINE = Path(loadtest.__file__).resolve().parent / 'baselines' / 'loadtest.json'
+
+
+class Command(BaseCommand):
+    help = 'Load test the API with concurrent asyncio clients and compare against a stored baseline'
+
+    def add_arguments(self, parser):
+        loadtest.add_arguments(parser)
+        parser.set_defaults(baseline=str(DEFAULT_BASELINE))
+
+    def handle(self, *args, **options):
+        try:
+            options = loadtest.build_options(options)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        has_baseline = bool(options['baseline']) and Path(options['baseline']).exists() and not options['save_baseline']
+        regressions = loadtest.execute(options, write=self.stdout.write)
+        if regressions:
+            raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+        if has_baseline:
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
+        elif not options['save_baseline']:
+            self.stdout.write(f"No baseline at {options['baseline']}; rerun with --save-baseline to record one.")
@@ -0,0 +1,29 @@
+"""
+Run the serializer and queryset microbenchmarks.
+
+See ``core.benchmarks.microbench`` for what is measured and how the stored
+baseline is used.
+"""
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run serializer/queryset microbenchmarks with query-count and timing checks against the baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--save-baseline', action='store_true', help='Record this run as the new baseline')
+        parser.add_argument('--no-timing', action='store_true',
+                            help='Only enforce query counts, e.g. on CI machines slower than the baseline machine')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed relative slowdown of the median time (0.5 = 50%%)')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed rounds per benchmark')
+
+    def handle(self, *args, **options):
+        os.environ['MICROBENCH_SAVE_BASELINE'] = '1' if options['save_baseline'] else '0'
+        os.environ['MICROBENCH_CHECK_TIMING'] = '0' if options['no_timing'] else '1'
+        os.environ['MICROBENCH_TOLERANCE'] = str(options['tolerance'])
+        os.environ['MICROBENCH_ROUNDS'] = str(options['rounds'])
+        call_command('test', 'core.benchmarks.microbench', verbosity=options['verbosity'])
@@ -0,0 +1,24 @@
+"""
+Compact the sync change log.
+
+    python manage.py prune_changes
+
+Run daily (e.g. from cron). Deletes changes superseded by a later change of
+the same row, and tombstones older than ``SYNC_RETENTION_DAYS``. See
+``core.sync``.
+"""
+from django.core.management.base import BaseCommand
+
+from core.sync import prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete superseded sync changes and expired tombstones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Keep tombstones this many days (default: SYNC_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['retention_days'])
+        self.stdout.write(f'Deleted {deleted} changes')
@@ -0,0 +1,20 @@
+"""
+Delete expired idempotency keys.
+
+    python manage.py prune_idempotency_keys
+
+Run daily (e.g. from cron). Responses stored for ``Idempotency-Key``
+requests are replayed for ``IDEMPOTENCY_TTL_HOURS``; expired keys are
+ignored, and this removes them. See ``core.idempotency``.
+"""
+from django.core.management.base import BaseCommand
+
+from core.idempotency import prune_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys'
+
+    def handle(self, *args, **options):
+        deleted = prune_keys()
+        self.stdout.write(f'Deleted {deleted} idempotency keys')
@@ -0,0 +1,33 @@
+"""
+Apply outbox events to the projections that consume them.
+
+    python manage.py run_consumers                          # long-running
+    python manage.py run_consumers --burst                  # apply what is recorded and exit
+    python manage.py run_consumers --consumer core.dashboard
+
+See ``core.outbox``. Consumers keep their own positions, so a restarted
+runner carries on where it stopped.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = 'Apply outbox domain events to their consumers (dashboard counts, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', dest='consumers', default=None,
+                            help='Run only this consumer (repeatable; default: all)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when no event is ready (default: 1)')
+        parser.add_argument('--burst', action='store_true', help='Exit once every recorded event is applied')
+
+    def handle(self, *args, **options):
+        names = options['consumers'] or list(outbox.CONSUMERS)
+        unknown = sorted(set(names) - set(outbox.CONSUMERS))
+        if unknown:
+            raise CommandError(f"Unknown consumers: {', '.join(unknown)} (known: {', '.join(outbox.CONSUMERS)})")
+        runner = outbox.Runner([outbox.CONSUMERS[name] for name in names], poll_interval=options['poll_interval'])
+        self.stdout.write(f"Running consumers: {', '.join(names)}")
+        runner.run(burst=options['burst'])
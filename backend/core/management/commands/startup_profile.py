@@ -0,0 +1,146 @@
+"""
+Profile the cold start of an API worker with ``python -X importtime``.
+
+A fresh interpreter loads the WSGI (or ASGI) application and the URLconf,
+which is what a worker does before serving its first request. The command
+reports the wall-clock start time over several runs, the packages and
+modules that cost the most to import, and whether any module that should
+be imported lazily (see ``core.lazy`` and ``core.integrations``) was loaded
+at startup, together with the chain of imports that pulled it in.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that a worker must not import before they are needed
+DEFERRED_MODULES = (
+    'drf_spectacular.generators',
+    'drf_spectacular.views',
+    'twilio',
+    'googlemaps',
+)
+
+STARTUP_SCRIPT = """
+import os, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+from pamoja_vote.{target} import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def parse_importtime(output):
+    """
+    Parse ``-X importtime`` output into ``(name, self_us, cumulative_us, parent)`` rows.
+
+    Modules are reported after everything they import, indented one level per
+    nesting, so a module's importer is the next row with a smaller indent.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append([name.strip(), int(self_us), int(cumulative_us), depth, None])
+
+    pending = defaultdict(list)  # depth -> indexes of rows waiting for their importer
+    for index, row in enumerate(rows):
+        depth = row[3]
+        for child_depth in [d for d in pending if d > depth]:
+            for child in pending.pop(child_depth):
+                rows[child][4] = row[0]
+        pending[depth].append(index)
+    return [(name, self_us, cumulative_us, parent) for name, self_us, cumulative_us, _, parent in rows]
+
+
+def import_chain(rows, module):
+    parents = {name: parent for name, _, _, parent in rows}
+    chain = [module]
+    while parents.get(chain[-1]):
+        chain.append(parents[chain[-1]])
+    return chain
+
+
+class Command(BaseCommand):
+    help = 'Report what an API worker imports at startup and how long its cold start takes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='Application module to load (default: wsgi)')
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to time (default: 5)')
+        parser.add_argument('--top', type=int, default=20, help='Number of packages and modules to list')
+        parser.add_argument('--max-ms', type=float, default=None,
+                            help='Fail if the median cold start takes longer than this')
+        parser.add_argument('--strict', action='store_true',
+                            help='Fail if a module in DEFERRED_MODULES is imported at startup')
+        parser.add_argument('--output', default=None, help='Write the profile as JSON to this file')
+
+    def start_worker(self, target, importtime=False):
+        script = STARTUP_SCRIPT.format(settings_module=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                      'pamoja_vote.settings'), target=target)
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', script]
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f'Worker failed to start:\n{result.stderr[-2000:]}')
+        return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        # The first run warms the bytecode and filesystem caches
+        self.start_worker(options['target'])
+        timings = [self.start_worker(options['target'])[0] for _ in range(options['runs'])]
+        _, importtime = self.start_worker(options['target'], importtime=True)
+        rows = parse_importtime(importtime)
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in rows:
+            packages[name.split('.')[0]] += self_us
+        top_packages = sorted(packages.items(), key=lambda item: -item[1])[:options['top']]
+        top_modules = sorted(rows, key=lambda row: -row[1])[:options['top']]
+        loaded = {name for name, _, _, _ in rows}
+        eager = [module for module in DEFERRED_MODULES if module in loaded]
+
+        median = statistics.median(timings)
+        self.stdout.write(
+            f"Cold start ({options['target']}): median {median:.1f}ms, "
+            f"min {min(timings):.1f}ms over {len(timings)} runs; {len(rows)} modules imported, "
+            f"{sum(row[1] for row in rows) / 1000:.1f}ms in imports"
+        )
+        self.stdout.write('\nPackages by self time:')
+        for package, self_us in top_packages:
+            self.stdout.write(f'  {self_us / 1000:>8.1f}ms  {package}')
+        self.stdout.write('\nModules by self time:')
+        for name, self_us, cumulative_us, _ in top_modules:
+            self.stdout.write(f'  {self_us / 1000:>8.1f}ms  (cumulative {cumulative_us / 1000:.1f}ms)  {name}')
+
+        self.stdout.write('\nDeferred modules:')
+        for module in DEFERRED_MODULES:
+            if module in eager:
+                chain = import_chain(rows, module)[1:]
+                via = f" via {' <- '.join(chain)}" if chain else ''
+                self.stdout.write(self.style.WARNING(f'  {module}: imported at startup{via}'))
+            else:
+                self.stdout.write(f'  {module}: not imported')
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({
+                    'target': options['target'],
+                    'timings_ms': timings,
+                    'median_ms': median,
+                    'packages_ms': {package: self_us / 1000 for package, self_us in top_packages},
+                    'eager_modules': eager,
+                }, fh, indent=2)
+
+        if options['strict'] and eager:
+            raise CommandError(f"Imported at startup: {', '.join(eager)}")
+        if options['max_ms'] is not None and median > options['max_ms']:
+            raise CommandError(f"Median cold start {median:.1f}ms exceeds {options['max_ms']:.1f}ms")
@@ -0,0 +1,57 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and query count for every request.
+
+    Keep this first in MIDDLEWARE so the measured time covers the whole stack.
+    Requests are labelled with the resolved URL name rather than the path, so
+    ``/api/squads/<uuid>/`` does not create one time series per squad. Works
+    in both sync and async stacks so it never forces async views onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counter = [0]
+        token = metrics.REQUEST_QUERIES.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.REQUEST_QUERIES.reset(token)
+        self.record(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = metrics.REQUEST_QUERIES.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.REQUEST_QUERIES.reset(token)
+        self.record(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        metrics.HTTP_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.HTTP_QUERIES.observe(queries, view=view)
+        metrics.REGISTRY.maybe_flush()
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "model",
+                    models.CharField(
+                        help_text="Sync name of the model, e.g. 'squads'", max_length=20
+                    ),
+                ),
+                ("object_id", models.UUIDField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("deleted", "Deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("squad_id", models.UUIDField(blank=True, null=True)),
+                ("user_id", models.UUIDField(blank=True, null=True)),
+                ("changed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["model", "object_id", "id"],
+                        name="core_change_object_idx",
+                    ),
+                    models.Index(
+                        fields=["squad_id", "id"], name="core_change_squad_idx"
+                    ),
+                    models.Index(fields=["user_id", "id"], name="core_change_user_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    from core.sync import backfill_changes
+    backfill_changes(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+        ("centers", "0003_center_updated_at"),
+        ("events", "0005_event_updated_at"),
+        ("squads", "0007_squad_updated_at_squadmember_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_backfill_changes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CountyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("county", models.CharField(max_length=50)),
+                (
+                    "day",
+                    models.DateField(
+                        blank=True, help_text="Empty for the county's totals", null=True
+                    ),
+                ),
+                ("users", models.IntegerField(default=0)),
+                ("squads", models.IntegerField(default=0)),
+                ("members", models.IntegerField(default=0)),
+                (
+                    "registered",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Members who have registered to vote, by the day they joined",
+                    ),
+                ),
+                ("events", models.IntegerField(default=0)),
+                ("invites", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "county stats",
+                "ordering": ["county", "day"],
+                "indexes": [
+                    models.Index(
+                        fields=["day", "county"], name="core_countystats_upcoming_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("county", "day"), name="core_countystats_day_uniq"
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("day", None)),
+                        fields=("county",),
+                        name="core_countystats_total_uniq",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from core.regions import seed
+    try:
+        seed(apps.get_model)
+    except FileNotFoundError:
+        # GEODATA_DIR is not deployed here; run manage.py backfill_regions once it is
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="County",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        help_text="COUNTY_COD", primary_key=True, serialize=False
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                "verbose_name_plural": "counties",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Constituency",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        help_text="CONST_CODE", primary_key=True, serialize=False
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "county",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="constituencies",
+                        to="core.county",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "constituencies",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Ward",
+            fields=[
+                ("id", models.SmallAutoField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="Name normalized for matching", max_length=100
+                    ),
+                ),
+                (
+                    "constituency",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="wards",
+                        to="core.constituency",
+                    ),
+                ),
+                (
+                    "county",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="wards",
+                        to="core.county",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("county", "key"), name="core_ward_county_key_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
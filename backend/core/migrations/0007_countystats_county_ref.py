@@ -0,0 +1,102 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:44
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+METRICS = ('users', 'squads', 'members', 'registered', 'events', 'invites')
+
+
+def rekey(apps, schema_editor):
+    """Merge the rows of each county's spellings under its County; rows of unknown counties are dropped"""
+    from core.regions import Resolver
+    CountyStats = apps.get_model('core', 'CountyStats')
+    resolver = Resolver(apps.get_model)
+    names = dict(apps.get_model('core', 'County').objects.values_list('pk', 'name'))
+    merged = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for row in CountyStats.objects.values('county', 'day', *METRICS):
+        county_id = resolver.county(row['county'])
+        if county_id is not None:
+            for metric in METRICS:
+                merged[county_id, row['day']][metric] += row[metric]
+    CountyStats.objects.all().delete()
+    CountyStats.objects.bulk_create([
+        CountyStats(county=names[county_id], county_ref_id=county_id, day=day, **counts)
+        for (county_id, day), counts in merged.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="countystats",
+            name="county_ref",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="core.county",
+            ),
+        ),
+        migrations.RunPython(rekey, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="countystats",
+            name="core_countystats_day_uniq",
+        ),
+        migrations.RemoveConstraint(
+            model_name="countystats",
+            name="core_countystats_total_uniq",
+        ),
+        migrations.RemoveIndex(
+            model_name="countystats",
+            name="core_countystats_upcoming_idx",
+        ),
+        migrations.RemoveField(
+            model_name="countystats",
+            name="county",
+        ),
+        migrations.RenameField(
+            model_name="countystats",
+            old_name="county_ref",
+            new_name="county",
+        ),
+        migrations.AlterField(
+            model_name="countystats",
+            name="county",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stats",
+                to="core.county",
+            ),
+        ),
+        migrations.AlterModelOptions(
+            name="countystats",
+            options={"ordering": ["county_id", "day"], "verbose_name_plural": "county stats"},
+        ),
+        migrations.AddConstraint(
+            model_name="countystats",
+            constraint=models.UniqueConstraint(
+                fields=("county", "day"), name="core_countystats_day_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="countystats",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("day", None)),
+                fields=("county",),
+                name="core_countystats_total_uniq",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="countystats",
+            index=models.Index(
+                fields=["day", "county"], name="core_countystats_upcoming_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_countystats_county_ref"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="consumerposition",
+            name="applied",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Events applied past a missing id: {id: created_at as Unix time}",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="consumerposition",
+            name="position",
+            field=models.BigIntegerField(
+                default=0, help_text="Every OutboxEvent up to this id is applied"
+            ),
+        ),
+    ]
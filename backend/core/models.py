@@ -1,3 +1,188 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+
+class Change(models.Model):
+    """
+    One insert, update or delete of a row that clients sync (see core.sync).
+
+    The auto-increment id is the change log's sequence: a client's sync token
+    is the last id it has seen. ``squad_id`` and ``user_id`` copy the row's
+    scope, so the log can be filtered by visibility and tombstones outlive
+    the rows they stand for.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20, help_text="Sync name of the model, e.g. 'squads'")
+    object_id = models.UUIDField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    squad_id = models.UUIDField(null=True, blank=True)
+    user_id = models.UUIDField(null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.model} {self.object_id} {self.action}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Whether a change has been superseded by a later one for the same row
+            models.Index(fields=['model', 'object_id', 'id'], name='core_change_object_idx'),
+            models.Index(fields=['squad_id', 'id'], name='core_change_squad_idx'),
+            models.Index(fields=['user_id', 'id'], name='core_change_user_idx'),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event, recorded in the transaction of the write it describes
+    (see core.outbox).
+
+    The auto-increment id orders the events; each consumer's
+    ``ConsumerPosition`` records which it has applied. Ids are taken at
+    insert, so a transaction still open may commit an id below ones already
+    read.
+    """
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=40, help_text="e.g. 'squad.member_joined'")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.name}"
+
+    class Meta:
+        ordering = ['id']
+
+
+class ConsumerPosition(models.Model):
+    """The outbox events a consumer has applied (see core.outbox)"""
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0, help_text="Every OutboxEvent up to this id is applied")
+    applied = models.JSONField(default=dict, blank=True,
+                               help_text="Events applied past a missing id: {id: created_at as Unix time}")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} at #{self.position}"
+
+
+class CountyStats(models.Model):
+    """
+    Registration drive counts for one county and day (see core.dashboard).
+
+    ``day`` is the local date a user, squad, membership or invite was
+    created, or the date an event takes place. The row without a day holds
+    the county's running totals, so the dashboard reads one row per county.
+    Rows are keyed by ``County``, so spellings of a county's name share them.
+    """
+    county = models.ForeignKey('County', on_delete=models.CASCADE, related_name='stats')
+    day = models.DateField(null=True, blank=True, help_text="Empty for the county's totals")
+    users = models.IntegerField(default=0)
+    squads = models.IntegerField(default=0)
+    members = models.IntegerField(default=0)
+    registered = models.IntegerField(default=0, help_text="Members who have registered to vote, by the day they joined")
+    events = models.IntegerField(default=0)
+    invites = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.county_id} {self.day or 'total'}"
+
+    class Meta:
+        ordering = ['county_id', 'day']
+        verbose_name_plural = 'county stats'
+        constraints = [
+            models.UniqueConstraint(fields=['county', 'day'], name='core_countystats_day_uniq'),
+            # NULLs are distinct in a unique index, so the totals rows need their own
+            models.UniqueConstraint(fields=['county'], condition=models.Q(day=None), name='core_countystats_total_uniq'),
+        ]
+        indexes = [
+            # Upcoming events: the rows dated today or later
+            models.Index(fields=['day', 'county'], name='core_countystats_upcoming_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a POST sent with an ``Idempotency-Key`` header (see
+    core.idempotency), replayed when the same user retries with the same key.
+
+    ``status_code`` is empty while the first request is still running.
+    """
+    user_id = models.UUIDField()
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text='SHA-256 of the method, path and body')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField(default=b'')
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} {self.key}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'key'], name='core_idempotencykey_uniq'),
+        ]
+        indexes = [
+            # Pruning expired keys
+            models.Index(fields=['expires_at'], name='core_idempotencykey_expiry_idx'),
+        ]
+
+
+class County(models.Model):
+    """One of the 47 counties, keyed by its code in the bundled boundary files (see core.regions)"""
+    id = models.PositiveSmallIntegerField(primary_key=True, help_text="COUNTY_COD")
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'counties'
+
+
+class Constituency(models.Model):
+    """A constituency, keyed by its code in the bundled boundary files (see core.regions)"""
+    id = models.PositiveSmallIntegerField(primary_key=True, help_text="CONST_CODE")
+    county = models.ForeignKey(County, on_delete=models.PROTECT, related_name='constituencies')
+    name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'constituencies'
+
+
+class Ward(models.Model):
+    """
+    A ward, added as centers name them: the boundary files stop at
+    constituencies (see core.regions).
+    """
+    id = models.SmallAutoField(primary_key=True)
+    county = models.ForeignKey(County, on_delete=models.PROTECT, related_name='wards')
+    constituency = models.ForeignKey(Constituency, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='wards')
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, help_text="Name normalized for matching")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['county', 'key'], name='core_ward_county_key_uniq'),
+        ]
@@ -0,0 +1,265 @@
+"""
+Transactional outbox of domain events, and the consumers that apply them.
+
+A write that other parts of the system react to records a compact event in
+the same transaction (``OutboxEvent``), so the event exists exactly when the
+write does:
+
+    squad.member_joined   {"member", "squad", "user", "county", "joined_at", "registered"}
+    squad.member_left     the same, for a deleted membership
+    member.registered     the same, when has_registered becomes true
+    member.unregistered   the same, when it is undone
+    rsvp.changed          {"rsvp", "event", "user", "status", "previous"}
+    invite.created        {"invite", "squad", "event", "inviter", "county", "channel", "sent_at"}
+    squad.moved           {"squad", "from", "to"}, when a squad's county changes
+
+``county``, ``from`` and ``to`` are ``core.County`` ids, as of the write.
+
+Models record them with the ``DomainEvents`` mixin. Projections register a
+function with ``@consumer``; ``manage.py run_consumers`` gives it batches of
+the events it subscribes to, in id order, off the request path. A
+consumer's ``ConsumerPosition`` moves past each batch in the same
+transaction as the consumer's own writes, so a projection kept in the
+database applies every event exactly once, even when the process dies
+mid-batch. Side effects outside the database happen at least once. A batch
+that raises is retried until the consumer is fixed; the events after it
+wait.
+
+Ids are taken at insert but become visible at commit, so an id missing
+below ones already read may belong to a transaction that is still open. The
+position is the id up to which every event is applied; events applied past
+a missing id are kept in ``applied`` and skipped, and the missing id is read
+as soon as it commits. Once the event after it is ``OUTBOX_GAP_SECONDS``
+old, a missing id is taken to be rolled back and the position moves past
+it, with a warning. On SQLite writes are serialized and no id goes missing.
+Events every consumer has applied are deleted after
+``OUTBOX_RETENTION_DAYS``.
+
+Writes that send no signals (``bulk_create``, ``QuerySet.update``) record
+no events. Projections catch up on them with their rebuild, which marks the
+events its counts include as applied (``catch_up()``).
+"""
+import logging
+import signal
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, router, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import ConsumerPosition, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+MEMBER_JOINED = 'squad.member_joined'
+MEMBER_LEFT = 'squad.member_left'
+MEMBER_REGISTERED = 'member.registered'
+MEMBER_UNREGISTERED = 'member.unregistered'
+RSVP_CHANGED = 'rsvp.changed'
+INVITE_CREATED = 'invite.created'
+SQUAD_MOVED = 'squad.moved'
+
+CONSUMERS = {}
+
+
+def record(events, using='default'):
+    """Insert ``(name, payload)`` events in the current transaction"""
+    if events:
+        OutboxEvent.objects.using(using).bulk_create([OutboxEvent(name=name, payload=payload)
+                                                      for name, payload in events])
+
+
+class DomainEvents:
+    """
+    Model mixin that records the model's domain events in the transaction of
+    each save and delete.
+
+    ``saved_events(created)`` and ``deleted_events()`` return ``[(name,
+    payload), ...]``; ``changed(field)`` compares one of ``tracked_fields``
+    with its value when loaded or last saved. ``post_save`` runs after an
+    autocommit save has committed, so this overrides ``save()`` to record in
+    the same transaction; deletes record from ``post_delete`` (connected in
+    CoreConfig.ready), which runs inside the delete's transaction.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._outbox_loaded = {name: value for name, value in zip(field_names, values)
+                                   if name in cls.tracked_fields}
+        return instance
+
+    def changed(self, name):
+        """``(changed, previous value)`` of a tracked field; unchanged when it was deferred"""
+        loaded = getattr(self, '_outbox_loaded', {})
+        if name not in loaded:
+            return False, None
+        field = self._meta.get_field(name)
+        previous = field.to_python(loaded[name])
+        return previous != field.to_python(getattr(self, name)), previous
+
+    def saved_events(self, created):
+        return []
+
+    def deleted_events(self):
+        return []
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            record(self.saved_events(created), using)
+        self._outbox_loaded = {name: getattr(self, name) for name in self.tracked_fields}
+
+
+def instance_deleted(sender, instance, using, **kwargs):
+    record(instance.deleted_events(), using)
+
+
+# Consumers
+
+class Consumer:
+    def __init__(self, func, name, events, batch_size):
+        self.func = func
+        self.name = name
+        self.events = frozenset(events)
+        self.batch_size = batch_size
+
+    def __call__(self, events):
+        return self.func(events)
+
+    def __repr__(self):
+        return f'<Consumer {self.name}>'
+
+
+def consumer(name, events, batch_size=500):
+    """Register a function that applies a list of ``OutboxEvent`` with one of the ``events`` names"""
+    def decorator(func):
+        if name in CONSUMERS and CONSUMERS[name].func is not func:
+            raise ValueError(f'Consumer {name} is already registered')
+        registered = CONSUMERS[name] = Consumer(func, name, events, batch_size)
+        return registered
+    return decorator
+
+
+def unapplied(position):
+    """A consumer's events that are not applied yet, in id order"""
+    return OutboxEvent.objects.filter(id__gt=position.position).exclude(id__in=[int(pk) for pk in position.applied])
+
+
+def advance(position, events, now=None):
+    """Mark ``events`` applied, and move the position up to the first missing id that may still commit"""
+    applied = {int(pk): created for pk, created in position.applied.items()}
+    applied.update((event.id, event.created_at.timestamp()) for event in events)
+    cutoff = (now or timezone.now()).timestamp() - settings.OUTBOX_GAP_SECONDS
+    for following in sorted(applied):
+        if following > position.position + 1:
+            if applied[following] > cutoff:
+                break  # The missing ids wait
+            logger.warning('Outbox events %s-%s never committed; %s skips them',
+                           position.position + 1, following - 1, position.consumer)
+        position.position = following
+        del applied[following]
+    position.applied = {str(pk): created for pk, created in applied.items()}
+
+
+def process(consumer, now=None):
+    """
+    Apply the consumer's next batch of events and mark them applied, in one
+    transaction. Returns the number of events read.
+    """
+    with transaction.atomic():
+        position, _ = ConsumerPosition.objects.select_for_update().get_or_create(consumer=consumer.name)
+        batch = list(unapplied(position).order_by('id')[:consumer.batch_size])
+        if not batch and not position.applied:
+            return 0
+        wanted = [event for event in batch if event.name in consumer.events]
+        if wanted:
+            consumer(wanted)
+        before = position.position, position.applied
+        advance(position, batch, now)
+        if (position.position, position.applied) != before:
+            position.save(update_fields=['position', 'applied', 'updated_at'])
+    metrics.OUTBOX_EVENTS_APPLIED.inc(len(wanted), consumer=consumer.name)
+    return len(batch)
+
+
+def catch_up(name):
+    """
+    Mark every event the current transaction can see applied, once a
+    projection has been rebuilt from the source tables in that transaction.
+    On PostgreSQL its counts and this must share one snapshot (REPEATABLE
+    READ), so that events committed meanwhile are applied, not counted twice.
+    """
+    position, _ = ConsumerPosition.objects.select_for_update().get_or_create(consumer=name)
+    advance(position, unapplied(position).only('id', 'created_at').iterator(5000))
+    position.save(update_fields=['position', 'applied', 'updated_at'])
+
+
+def applied_position():
+    """Id of the last event every registered consumer has applied"""
+    positions = dict(ConsumerPosition.objects.filter(consumer__in=CONSUMERS).values_list('consumer', 'position'))
+    return min(positions.get(name, 0) for name in CONSUMERS) if CONSUMERS else 0
+
+
+def pending():
+    """Events the consumer furthest behind has yet to apply"""
+    return OutboxEvent.objects.filter(id__gt=applied_position()).count()
+
+
+def prune(now=None):
+    """Delete events every consumer has applied once older than OUTBOX_RETENTION_DAYS; returns how many"""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    return OutboxEvent.objects.filter(id__lte=applied_position(), created_at__lt=cutoff).delete()[0]
+
+
+class Runner:
+    """Gives each consumer batches until it has caught up, then polls for new events"""
+
+    def __init__(self, consumers=None, poll_interval=1.0):
+        self.consumers = list(CONSUMERS.values()) if consumers is None else consumers
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.last_maintenance = 0.0
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def run_once(self):
+        """One batch for each consumer; returns the number of events read"""
+        read = 0
+        for consumer in self.consumers:
+            try:
+                read += process(consumer)
+            except OperationalError as exc:
+                # SQLite: another process holds the write lock for longer than the timeout
+                logger.warning('Consumer %s could not run: %s', consumer.name, exc)
+            except Exception:
+                logger.exception('Consumer %s failed; retrying its batch', consumer.name)
+        return read
+
+    def run(self, burst=False):
+        """Run until stopped (SIGTERM/SIGINT) or, with ``burst``, until every recorded event is applied"""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        logger.info('Running consumers: %s', ', '.join(consumer.name for consumer in self.consumers))
+
+        while not self.stop_event.is_set():
+            close_old_connections()
+            if time.monotonic() - self.last_maintenance >= settings.OUTBOX_MAINTENANCE_INTERVAL:
+                self.last_maintenance = time.monotonic()
+                pruned = prune()
+                if pruned:
+                    logger.info('Pruned %s applied outbox events', pruned)
+            read = self.run_once()
+            metrics.REGISTRY.maybe_flush()
+            if not read:
+                if burst:
+                    break
+                self.stop_event.wait(self.poll_interval)
@@ -0,0 +1,204 @@
+"""
+Publish/subscribe for realtime updates.
+
+Model signal handlers ``publish`` small events to named channels
+(``squad:<id>``, ``user:<id>``) and the Server-Sent Events stream in
+``core.realtime`` subscribes to them. Each event is rendered into its SSE
+frame once, when it is published, however many streams receive it.
+
+Subscriptions live on the ASGI event loop. Each has a bounded queue; a
+client that falls more than ``REALTIME_QUEUE_SIZE`` events behind is told to
+resync instead of buffering without limit.
+
+Events reach other processes through the backend named by
+``REALTIME_BACKEND``:
+
+* ``core.pubsub.LocalBackend`` delivers events within the publishing process
+  only. It needs no infrastructure and suits development and single-process
+  deployments.
+* ``core.pubsub.RedisBackend`` relays every event through Redis pub/sub
+  (``REALTIME_REDIS_URL``), so a write handled by any web or job worker
+  reaches the streams held by every ASGI worker. Requires the ``redis``
+  package.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def encode(event, data):
+    """SSE frame (without the blank line that ends it) for ``event`` carrying ``data``"""
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))}\n'
+
+
+def decode(message):
+    """``(event, data)`` from a frame built by ``encode``"""
+    event_line, data_line = message.rstrip('\n').split('\n', 1)
+    return event_line[len('event: '):], json.loads(data_line[len('data: '):])
+
+
+class Subscription:
+    """A set of channels and a bounded queue of the events published to them"""
+
+    def __init__(self, broker, maxsize):
+        self.broker = broker
+        self.channels = set()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            if channel not in self.channels:
+                self.channels.add(channel)
+                self.broker.subscribers[channel].add(self)
+
+    def unsubscribe(self, *channels):
+        for channel in channels:
+            if channel in self.channels:
+                self.channels.discard(channel)
+                self.broker.remove(channel, self)
+
+    def close(self):
+        self.unsubscribe(*list(self.channels))
+
+    def deliver(self, channel, message):
+        try:
+            self.queue.put_nowait((channel, message))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def reset(self):
+        """Drop queued events after an overflow"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+    async def get(self, timeout=None):
+        """Next ``(channel, message)``, or None if nothing arrives within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """Routes messages from the backend to the subscriptions of this process"""
+
+    def __init__(self, backend_class):
+        self.backend = backend_class(self)
+        self.subscribers = defaultdict(set)  # channel -> subscriptions
+        self.loop = None
+
+    def subscription(self, *channels):
+        """New subscription, delivered on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.backend.start()
+        subscription = Subscription(self, settings.REALTIME_QUEUE_SIZE)
+        subscription.subscribe(*channels)
+        return subscription
+
+    def remove(self, channel, subscription):
+        subscribers = self.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[channel]
+
+    def publish(self, channel, message):
+        try:
+            self.backend.publish(channel, message)
+        except Exception:
+            # Realtime updates are best effort; never fail the write that produced them
+            logger.warning('Publishing to %s failed', channel, exc_info=True)
+            return
+        metrics.REALTIME_EVENTS.inc()
+
+    def dispatch(self, channel, message):
+        """Called by the backend, from any thread, for each message published to ``channel``"""
+        loop = self.loop
+        if loop is None or loop.is_closed() or channel not in self.subscribers:
+            return
+        loop.call_soon_threadsafe(self.deliver, channel, message)
+
+    def deliver(self, channel, message):
+        for subscription in list(self.subscribers.get(channel, ())):
+            subscription.deliver(channel, message)
+
+
+class LocalBackend:
+    """Delivers messages to subscribers in the publishing process only"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def publish(self, channel, message):
+        self.broker.dispatch(channel, message)
+
+
+class RedisBackend:
+    """
+    Relays messages through Redis pub/sub.
+
+    Each process pattern-subscribes to all realtime channels once and drops
+    messages for channels none of its streams follow, so connecting and
+    disconnecting clients costs no Redis round trips.
+    """
+
+    prefix = 'pamoja:realtime:'
+
+    def __init__(self, broker):
+        import redis
+
+        self.broker = broker
+        self.client = redis.Redis.from_url(settings.REALTIME_REDIS_URL)
+        self.listener = None
+
+    def start(self):
+        self.listener = asyncio.get_running_loop().create_task(self.listen())
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, message)
+
+    async def listen(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(settings.REALTIME_REDIS_URL, decode_responses=True)
+        while True:
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(self.prefix + '*')
+                    async for item in pubsub.listen():
+                        if item['type'] == 'pmessage':
+                            self.broker.dispatch(item['channel'][len(self.prefix):], item['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Realtime Redis subscription failed; reconnecting')
+                await asyncio.sleep(1)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return Broker(import_string(settings.REALTIME_BACKEND))
+
+
+def publish(channel, event, data):
+    """Publish ``event`` with JSON-serializable ``data`` to ``channel`` once the current transaction commits"""
+    message = encode(event, data)
+    transaction.on_commit(lambda: get_broker().publish(channel, message))
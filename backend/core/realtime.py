@@ -0,0 +1,121 @@
+"""
+Server-Sent Events stream of squad and membership updates.
+
+    GET /api/realtime/?token=<access token>[&squads=<id>,<id>]
+
+A stream follows the user's own channel (``user:<id>``: their membership
+joined, updated or left) and the channels of their squads (``squad:<id>``:
+members joining, leaving or registering, and event RSVPs). Only a squad's
+members (and its owner, through ``squads``) may follow its channel. When the
+user joins or leaves a squad the stream follows them without reconnecting.
+Member events carry ids, role and registration only.
+Browsers' EventSource cannot send headers, so the access token may be passed
+as ``token`` instead of an Authorization header.
+
+Events are increments; clients load the current state from the REST
+endpoints when the stream opens, and again on a ``resync`` event. Each
+connection is a coroutine waiting on its queue, so an idle stream holds no
+thread or database connection. It is only served under ASGI.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework_simplejwt.exceptions import TokenError
+
+from squads.models import Squad, SquadMember
+from . import metrics
+from .async_views import aauthenticate, error_response, render
+from .pubsub import decode, encode, get_broker
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def squad_channel(squad_id):
+    return f'squad:{squad_id}'
+
+
+def parse_squad_ids(value):
+    ids = [part for part in value.split(',') if part]
+    if len(ids) > settings.REALTIME_MAX_SQUADS:
+        raise exceptions.ValidationError({'squads': f'At most {settings.REALTIME_MAX_SQUADS} squads.'})
+    try:
+        return {uuid.UUID(part) for part in ids}
+    except ValueError:
+        raise exceptions.ValidationError({'squads': 'Expected comma-separated squad ids.'})
+
+
+async def owned_squads(user, requested):
+    """Ids of ``requested`` squads that ``user`` owns"""
+    if not requested:
+        return set()
+    squads = Squad.objects.filter(owner=user, id__in=requested).values_list('id', flat=True)
+    return {squad_id async for squad_id in squads}
+
+
+async def event_stream(user, channels, owned):
+    own_channel = user_channel(user.pk)
+    subscription = get_broker().subscription(own_channel, *channels)
+    metrics.REALTIME_CONNECTIONS.inc()
+    try:
+        yield f'retry: {settings.REALTIME_RETRY_MS}\n\n'
+        yield encode('ready', {'channels': sorted(subscription.channels)}) + '\n'
+        while True:
+            item = await subscription.get(timeout=settings.REALTIME_HEARTBEAT)
+            if subscription.overflowed:
+                subscription.reset()
+                yield encode('resync', {}) + '\n'
+                continue
+            if item is None:
+                yield ': keep-alive\n\n'
+                continue
+
+            channel, message = item
+            if channel == own_channel and message.startswith('event: membership.'):
+                # Follow the user into (or out of) the squad
+                event, data = decode(message)
+                squad = squad_channel(data['squad'])
+                if event == 'membership.left':
+                    if uuid.UUID(str(data['squad'])) not in owned:
+                        subscription.unsubscribe(squad)
+                else:
+                    subscription.subscribe(squad)
+            yield message + '\n'
+    finally:
+        # Also runs when the client disconnects and the server cancels the stream
+        subscription.close()
+        metrics.REALTIME_CONNECTIONS.dec()
+
+
+async def realtime_stream(request):
+    if request.method != 'GET':
+        return render({'detail': f'Method "{request.method}" not allowed.'}, status=405, headers={'Allow': 'GET'})
+    if not isinstance(request, ASGIRequest):
+        return render({'detail': 'The realtime stream is only served by the ASGI application.'}, status=501)
+
+    token = request.GET.get('token')
+    if token and 'HTTP_AUTHORIZATION' not in request.META:
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    try:
+        user = await aauthenticate(request)
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        requested = parse_squad_ids(request.GET.get('squads', ''))
+        member_of = SquadMember.objects.filter(user=user).values_list('squad_id', flat=True)
+        member_of = {squad_id async for squad_id in member_of}
+        owned = await owned_squads(user, requested)
+    except (TokenError, exceptions.APIException) as exc:
+        return error_response(exc)
+
+    channels = [squad_channel(squad_id) for squad_id in member_of | owned]
+    response = StreamingHttpResponse(event_stream(user, channels, owned), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Tell nginx not to buffer the stream
+    return response
+
+
+realtime_stream.csrf_exempt = True
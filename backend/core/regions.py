@@ -0,0 +1,218 @@
+"""
+County, constituency and ward reference tables, and the integer keys that
+point at them.
+
+``county`` (and on centers ``constituency`` and ``ward``) are free text in
+whatever case and spelling the client sent: "Nairobi", "NAIROBI",
+"Murang'a", "Muranga". Each model with them also has ``county_ref`` (and
+``constituency_ref``, ``ward_ref``), a small-integer foreign key to
+``County``, ``Constituency`` or ``Ward``, so filtering and grouping by
+region compare integers through an index. The text is kept as entered and
+is what the API returns.
+
+* Counties and constituencies are seeded from ``COUNTY_COD`` and
+  ``CONST_CODE`` of the bundled boundary files, which stay their primary
+  keys. The files stop at constituencies, so wards are added as centers
+  name them; a user's ward only links to a ward some center has named.
+* Names are matched by ``region_key``: upper case, letters and digits only,
+  without a trailing "County", and a few other spellings mapped.
+* ``RegionFields.save()`` sets the keys whenever the text is saved, and
+  ``backfill()`` for rows written without ``save()`` (``bulk_create``,
+  ``QuerySet.update``), a chunk of rows at a time: ``manage.py
+  backfill_regions``.
+* ``in_county(queryset, name)`` filters by county key, or by the text when
+  the name is not a known county.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.apps import apps
+from django.db import transaction
+
+from .geodata import constituencies, county_names
+
+# Other spellings, by region_key, of names in the boundary files
+ALIASES = {
+    'ELGEYOMARAKWET': 'ELEGEYOMARAKWET',
+    'NAIROBICITY': 'NAIROBI',
+    'MOUNTELGON': 'MTELGON',
+}
+
+# Models with region names: (app label, model, names, whether new wards are added)
+# Centers come first, since users' wards only link to wards centers have named
+SOURCES = (
+    ('centers', 'Center', ('county', 'constituency', 'ward'), True),
+    ('squads', 'Squad', ('county',), False),
+    ('squads', 'OpenSquad', ('county',), False),
+    ('users', 'User', ('county', 'ward'), False),
+)
+
+
+def region_key(name):
+    """"Murang'a County" -> 'MURANGA'"""
+    key = re.sub(r'[^A-Z0-9]', '', (name or '').upper())
+    if key.endswith('COUNTY') and key != 'COUNTY':
+        key = key[:-len('COUNTY')]
+    return ALIASES.get(key, key)
+
+
+def seed(get_model=apps.get_model):
+    """
+    Insert, or rename, the counties and constituencies of the boundary
+    files. ``get_model`` is ``apps.get_model`` in a migration. Returns how
+    many of each.
+    """
+    County = get_model('core', 'County')
+    Constituency = get_model('core', 'Constituency')
+    counties = [County(id=code, name=name) for code, name in county_names().items()]
+    County.objects.bulk_create(counties, update_conflicts=True, unique_fields=['id'], update_fields=['name'])
+    seats = [Constituency(id=constituency['code'], county_id=constituency['county_code'], name=constituency['name'])
+             for constituency in constituencies()]
+    Constituency.objects.bulk_create(seats, update_conflicts=True, unique_fields=['id'],
+                                     update_fields=['county', 'name'])
+    resolver.cache_clear()
+    return len(counties), len(seats)
+
+
+class Resolver:
+    """
+    Region keys for names, matched in memory against the counties and
+    constituencies; wards are looked up (and with ``create``, added) in the
+    database, and remembered with ``cache_wards``.
+    """
+
+    def __init__(self, get_model=apps.get_model, cache_wards=False):
+        self.Ward = get_model('core', 'Ward')
+        counties = get_model('core', 'County').objects.values_list('pk', 'name')
+        self.counties = {region_key(name): pk for pk, name in counties}
+        self.constituencies = {}
+        national = defaultdict(list)
+        for pk, county_id, name in get_model('core', 'Constituency').objects.values_list('pk', 'county_id', 'name'):
+            self.constituencies[county_id, region_key(name)] = pk
+            national[region_key(name)].append((county_id, pk))
+        # Names used by a single constituency also tell its county
+        self.national = {key: seats[0] for key, seats in national.items() if len(seats) == 1}
+        self.wards = {} if cache_wards else None
+
+    def county(self, name):
+        return self.counties.get(region_key(name)) if name else None
+
+    def constituency(self, county_id, name):
+        """``(county id, constituency id)``; a constituency known nationwide supplies a missing county"""
+        key = region_key(name)
+        if not key:
+            return county_id, None
+        if county_id is not None:
+            return county_id, self.constituencies.get((county_id, key))
+        return self.national.get(key, (None, None))
+
+    def ward(self, county_id, name, constituency_id=None, create=False):
+        key = region_key(name)
+        if county_id is None or not key:
+            return None
+        if self.wards is not None and (county_id, key) in self.wards:
+            return self.wards[county_id, key]
+        ward_id = self.Ward.objects.filter(county_id=county_id, key=key).values_list('pk', flat=True).first()
+        if ward_id is None and create:
+            ward_id = self.Ward.objects.get_or_create(county_id=county_id, key=key, defaults={
+                'name': name.strip(), 'constituency_id': constituency_id})[0].pk
+        if self.wards is not None and ward_id is not None:
+            self.wards[county_id, key] = ward_id
+        return ward_id
+
+    def resolve(self, names, create_wards=False):
+        """``{name field: key}`` for a dict of ``county`` and optionally ``constituency`` and ``ward``"""
+        refs = {'county': self.county(names.get('county'))}
+        if 'constituency' in names:
+            refs['county'], refs['constituency'] = self.constituency(refs['county'], names['constituency'])
+        if 'ward' in names:
+            refs['ward'] = self.ward(refs['county'], names['ward'], refs.get('constituency'), create=create_wards)
+        return refs
+
+
+@lru_cache(maxsize=None)
+def resolver():
+    """The process's Resolver; counties and constituencies only change with ``seed()``"""
+    return Resolver()
+
+
+def assign(instance):
+    """Set an instance's region keys from its names; returns the key fields"""
+    refs = resolver().resolve({field: getattr(instance, field) for field in instance.region_fields},
+                              create_wards=instance.creates_wards)
+    for field, ref in refs.items():
+        setattr(instance, f'{field}_ref_id', ref)
+    return [f'{field}_ref' for field in refs]
+
+
+class RegionFields:
+    """
+    Model mixin that sets the ``<name>_ref`` key of each of
+    ``region_fields`` when the model is saved. ``creates_wards`` adds wards
+    not seen before.
+
+    A ``pre_save`` handler could not add the keys to a save's
+    ``update_fields``, so this overrides ``save()``.
+    """
+    region_fields = ('county',)
+    creates_wards = False
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.region_fields):
+            refs = assign(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *refs}
+        super().save(*args, **kwargs)
+
+
+def backfill(get_model=apps.get_model, chunk_size=5000, models=None):
+    """
+    Set the region keys of every row from its names. Each table is read
+    once in primary key order, ``chunk_size`` rows per transaction, and
+    only rows whose keys change are written. ``models`` limits it to some
+    ``(app label, model)`` pairs. Returns the number of rows updated.
+    """
+    resolver = Resolver(get_model, cache_wards=True)
+    updated = 0
+    for app_label, model_name, fields, creates_wards in SOURCES:
+        if models is not None and (app_label, model_name) not in models:
+            continue
+        model = get_model(app_label, model_name)
+        refs = [f'{field}_ref_id' for field in fields]
+        resolved = {}
+        last = None
+        while True:
+            rows = model.objects.order_by('pk')
+            if last is not None:
+                rows = rows.filter(pk__gt=last)
+            rows = list(rows.values_list('pk', *fields, *refs)[:chunk_size])
+            if not rows:
+                break
+            last = rows[-1][0]
+            changes = defaultdict(list)
+            for pk, *values in rows:
+                names, current = tuple(values[:len(fields)]), tuple(values[len(fields):])
+                if names not in resolved:
+                    found = resolver.resolve(dict(zip(fields, names)), create_wards=creates_wards)
+                    resolved[names] = tuple(found[field] for field in fields)
+                if resolved[names] != current:
+                    changes[resolved[names]].append(pk)
+            with transaction.atomic():
+                for target, pks in changes.items():
+                    model.objects.filter(pk__in=pks).update(**dict(zip(refs, target)))
+            updated += sum(len(pks) for pks in changes.values())
+    return updated
+
+
+def county_filter(county, prefix=''):
+    """Filter for a county: by key, or by name when it is not a known county"""
+    county_id = resolver().county(county)
+    if county_id is None:
+        return {f'{prefix}county__iexact': county}
+    return {f'{prefix}county_ref': county_id}
+
+
+def in_county(queryset, county, prefix=''):
+    return queryset.filter(**county_filter(county, prefix))
@@ -0,0 +1,132 @@
+"""
+OpenAPI schema generated once per code version instead of once per request.
+
+Introspecting every viewset and serializer takes hundreds of milliseconds,
+so the schema is generated by ``python manage.py build_schema`` at deploy
+time (or by the first request of a process when that was skipped) and
+stored in ``OPENAPI_SCHEMA_DIR`` under the current code version. Each
+process keeps the rendered YAML and JSON in memory and serves them with an
+ETag, so repeated requests from crawlers and dev tooling are answered with
+304 Not Modified.
+
+The code version is ``settings.CODE_VERSION`` (set it to the release or
+commit hash when deploying) or, when unset, a fingerprint of the project's
+Python sources and the versions of the packages that shape the schema.
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import translation
+from django.utils.cache import patch_cache_control
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework.settings import api_settings
+
+SCHEMA_PACKAGES = ('Django', 'djangorestframework', 'djangorestframework-simplejwt', 'drf-spectacular')
+
+lock = threading.Lock()
+rendered = {}  # (code version, api version, language, format) -> (content, etag)
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha256()
+    for package in SCHEMA_PACKAGES:
+        try:
+            digest.update(f'{package}=={metadata.version(package)}\n'.encode())
+        except metadata.PackageNotFoundError:
+            pass
+    base_dir = Path(settings.BASE_DIR)
+    for path in sorted(base_dir.rglob('*.py')):
+        relative = path.relative_to(base_dir)
+        if relative.parts[0] in ('venv', '.venv') or 'migrations' in relative.parts:
+            continue
+        digest.update(str(relative).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_path(api_version=None, language=None):
+    parts = [code_version(), api_version, language]
+    name = '-'.join(part for part in parts if part)
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'openapi-{name}.json'
+
+
+def generate_schema(api_version=None, language=None, generator_class=None):
+    """Generate the public schema the way SpectacularAPIView does, without a request"""
+    generator_class = generator_class or SpectacularAPIView.generator_class
+    generator = generator_class(api_version=api_version)
+    with translation.override(language or settings.LANGUAGE_CODE):
+        return generator.get_schema(request=None, public=True)
+
+
+def write_schema(schema, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as fh:
+        json.dump(schema, fh)
+    os.replace(tmp, path)
+
+
+def load_schema(api_version=None, language=None):
+    """Read the stored schema for the current code version, generating it if missing"""
+    path = schema_path(api_version, language)
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        schema = generate_schema(api_version, language)
+        write_schema(schema, path)
+        return schema
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    SpectacularAPIView serving the schema stored for the current code version.
+
+    Content negotiation, ``?format=``, ``?lang=`` and ``?version=`` work as
+    in SpectacularAPIView, except that only configured languages and
+    ``ALLOWED_VERSIONS`` are honoured so clients cannot make the server
+    generate and store a schema for arbitrary values.
+    """
+
+    def get(self, request, *args, **kwargs):
+        api_version = self.api_version or request.version
+        if api_version is None and api_settings.ALLOWED_VERSIONS:
+            api_version = self._get_version_parameter(request)
+        language = request.GET.get('lang') if settings.USE_I18N else None
+        if language not in dict(settings.LANGUAGES):
+            language = None
+        renderer = request.accepted_renderer
+        key = (code_version(), api_version, language, renderer.media_type)
+
+        entry = rendered.get(key)
+        if entry is None:
+            with lock:
+                entry = rendered.get(key)
+                if entry is None:
+                    schema = load_schema(api_version, language)
+                    content = renderer.render(schema, renderer.media_type, {'request': request})
+                    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+                    entry = rendered[key] = (content, etag)
+        content, etag = entry
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            content_type = request.accepted_media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            response = HttpResponse(content, content_type=content_type)
+            response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, api_version)}"'
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+        return response
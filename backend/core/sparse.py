@@ -0,0 +1,203 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?expand=`` on read endpoints.
+
+    GET /api/centers/?fields=id,name
+    GET /api/public/squads/?fields=id,name,registration_center.name
+    GET /api/public/squads/?expand=members
+
+``fields`` keeps only the listed fields; dotted names select fields of a
+nested object. ``expand`` adds fields that a serializer leaves out unless
+asked for (``Meta.expandable_fields``), such as a squad's member list.
+
+Serializers opt in with ``SparseFieldsetMixin``. ``sparse_queryset`` then
+narrows the view's queryset to what the remaining fields read: unread columns
+are deferred with ``.only()``, and ``select_related``/``prefetch_related``
+lookups that no remaining field uses are dropped. Columns and relations are
+worked out from the model fields behind each serializer field. Fields that
+are computed (properties, ``SerializerMethodField``) must list the
+attributes they read in ``Meta.sparse_sources``: columns, relations,
+annotations or prefetch ``to_attr`` names. A computed field without an entry
+leaves the queryset as it is.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_fields(value):
+    """``'id,center.name'`` -> ``{'id': {}, 'center': {'name': {}}}``"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class Fieldset:
+    """The fields (None for all) and expansions requested for one serializer level"""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand or {}
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params if hasattr(request, 'query_params') else request.GET
+        fields = params.get('fields')
+        return cls(parse_fields(fields) if fields else None, parse_fields(params.get('expand', '')))
+
+    def includes(self, *names):
+        """Whether any of ``names`` (regular fields) is kept"""
+        return self.fields is None or any(name in self.fields for name in names)
+
+    def expands(self, name):
+        """Whether the expandable field ``name`` was asked for"""
+        return name in self.expand or (self.fields is not None and name in self.fields)
+
+    def nested(self, name):
+        fields = self.fields.get(name) if self.fields is not None else None
+        return Fieldset(fields or None, self.expand.get(name))
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that drops the fields a GET request did not ask for.
+
+    The fieldset is read from the request in the serializer context, or
+    passed as ``fieldset=``. Without one every field except the expandable
+    ones is kept. Nested serializers using the mixin are narrowed to the
+    matching part of their parent's fieldset.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fieldset = fieldset
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset
+        if fieldset is None:
+            request = self.context.get('request')
+            if request is not None and request.method in SAFE_METHODS:
+                fieldset = Fieldset.from_request(request)
+            else:
+                fieldset = Fieldset()
+
+        unknown = (set(fieldset.fields or ()) | set(fieldset.expand)) - set(fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': [f'Unknown field: {name}' for name in sorted(unknown)]})
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        fields = {
+            name: field for name, field in fields.items()
+            if (fieldset.expands(name) if name in expandable else fieldset.includes(name))
+        }
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested.fieldset = fieldset.nested(name)
+        return fields
+
+
+def plan(serializer, model, prefix=''):
+    """
+    ``(columns, relations)`` read by ``serializer``'s fields, as lookups from
+    the outermost model, or None if some field's reads are unknown.
+    """
+    columns, relations = set(), set()
+    sources = getattr(getattr(serializer, 'Meta', None), 'sparse_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in sources:
+            for attr in sources[name]:
+                try:
+                    model_field = model._meta.get_field(attr)
+                except FieldDoesNotExist:
+                    relations.add(prefix + attr)  # Annotation or prefetch to_attr
+                    continue
+                if model_field.concrete:
+                    columns.add(prefix + attr)
+                if model_field.is_relation:
+                    relations.add(prefix + attr)
+            continue
+        if field.source == '*':
+            return None
+        root = field.source_attrs[0]
+        try:
+            model_field = model._meta.get_field(root)
+        except FieldDoesNotExist:
+            return None
+
+        if not model_field.is_relation:
+            columns.add(prefix + root)
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            columns.add(prefix + root)
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, serializers.BaseSerializer):
+                relations.add(prefix + root)
+                nested_plan = plan(nested, model_field.related_model, f'{prefix}{root}__')
+                if nested_plan is not None:
+                    columns |= nested_plan[0]
+                    relations |= nested_plan[1]
+            elif not isinstance(field, serializers.PrimaryKeyRelatedField):
+                # Reads the related object (e.g. its __str__): load all of it
+                relations.add(prefix + root)
+        else:
+            relations.add(prefix + root)
+    return columns, relations
+
+
+def select_related_paths(select, prefix=''):
+    paths = []
+    for name, nested in select.items():
+        paths.append(prefix + name)
+        paths.extend(select_related_paths(nested, f'{prefix}{name}__'))
+    return paths
+
+
+def prefetch_name(lookup):
+    """Attribute a prefetch lookup fills: its relation, or its ``to_attr``"""
+    path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+    return path.split('__')[0]
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Defer the columns and drop the related lookups that ``serializer`` (a
+    serializer instance, already narrowed by its fieldset) does not read.
+    """
+    serializer = getattr(serializer, 'child', serializer)
+    needed = plan(serializer, queryset.model)
+    if needed is None:
+        return queryset
+    columns, relations = needed
+
+    select = queryset.query.select_related
+    if isinstance(select, dict):
+        paths = [path for path in select_related_paths(select) if path in relations]
+        queryset = queryset.select_related(None)
+        if paths:  # select_related() without arguments would follow every foreign key
+            queryset = queryset.select_related(*paths)
+    lookups = queryset._prefetch_related_lookups
+    if lookups:
+        kept = [lookup for lookup in lookups if prefetch_name(lookup) in relations]
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+    return queryset.only(*columns) if columns else queryset
+
+
+class SparseFieldsetViewMixin:
+    """GenericAPIView mixin that applies ``sparse_queryset`` to read requests"""
+
+    @cached_property
+    def fieldset(self):
+        return Fieldset.from_request(self.request)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            queryset = sparse_queryset(queryset, self.get_serializer())
+        return queryset
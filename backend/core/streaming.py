@@ -0,0 +1,34 @@
+"""
+Streaming responses that hold memory constant under both WSGI and ASGI.
+
+Under ASGI Django reads a synchronous iterator to the end before sending
+anything. ``streaming_response`` instead hands ASGI an async iterator that
+pulls one chunk at a time from the synchronous one. Each ``next()`` runs on
+the thread that runs sync views (``thread_sensitive``), so a database cursor
+opened by the iterator is only ever used from that thread.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_done = object()
+
+
+async def aiterate(iterator):
+    """Async iterator over a synchronous iterator, one item per thread hop"""
+    iterator = iter(iterator)
+    while True:
+        item = await sync_to_async(next)(iterator, _done)
+        if item is _done:
+            return
+        yield item
+
+
+def streaming_response(request, chunks, content_type, filename=None):
+    """StreamingHttpResponse of ``chunks``; ``request`` may be Django's or DRF's"""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,299 @@
+"""
+Delta sync for offline-capable clients.
+
+    GET /api/sync/                      # first sync: everything visible
+    GET /api/sync/?since=<token>        # what changed since the last sync
+    GET /api/sync/?squad=<id>           # everything in one squad (after joining it)
+
+    {
+        "changes": {"squads": [...], "members": [...], "events": [...], "rsvps": [...], "centers": [...]},
+        "deleted": {"events": ["<id>", ...], ...},
+        "next": "<token>",
+        "has_more": false
+    }
+
+Every save and delete of a synced model appends a row to the change log
+(``core.models.Change``), whose auto-increment id orders all changes. A sync
+returns the latest change of each row after the token's position, for the
+rows the user can see:
+
+* ``centers``: every center.
+* ``squads``: public squads, and squads the user owns or belongs to.
+* ``members``, ``events``, ``rsvps``: those of squads the user belongs to.
+* The user's own memberships and RSVPs, and deleted squads (as tombstones).
+
+Clients upsert ``changes``, remove ``deleted`` ids and store ``next``, and
+request again while ``has_more`` is true. Deleting a squad or event deletes
+its members, events and RSVPs; clients mirror that instead of receiving a
+tombstone for each. When the user's own membership arrives for a squad the
+client did not have, it loads the squad with ``?squad=<id>``; when it is
+deleted, the client drops that squad's members, events and RSVPs.
+
+Membership and RSVP changes also log a change of their squad or event, so
+counts such as ``member_count`` stay current. Ids are taken at insert, so a
+transaction still open when a later one commits leaves a missing id behind
+the token; the token carries those ids (``<position>.<issued>.<from>-<to>,...``)
+and the next sync reads them again, until they commit or the change after
+them is ``SYNC_GAP_SECONDS`` old (a rollback). ``manage.py prune_changes``
+deletes superseded changes and tombstones older than ``SYNC_RETENTION_DAYS``;
+tokens older than that answer 410 and the client syncs from scratch.
+"""
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from centers.models import Center
+from centers.serializers import CenterSyncSerializer
+from events.models import Event, EventRSVP
+from events.serializers import EventRSVPSyncSerializer, EventSyncSerializer
+from squads.models import Squad, SquadMember
+from squads.serializers import SquadMemberSyncSerializer, SquadSyncSerializer
+from .models import Change
+
+SQUAD_SCOPED = ('members', 'events', 'rsvps')  # Visible to members of the squad
+
+
+def event_squad_id(rsvp):
+    if EventRSVP.event.is_cached(rsvp):
+        return rsvp.event.squad_id
+    return Event.objects.filter(pk=rsvp.event_id).values_list('squad_id', flat=True).first()
+
+
+class SyncedModel:
+    """
+    A model delivered by /api/sync/.
+
+    ``scope(obj)`` returns the ``(squad_id, user_id)`` a change is filed
+    under; ``parent(obj)`` the ``(name, id)`` of a row whose serialized form
+    includes ``obj`` (e.g. a squad's member count), which changes with it.
+    """
+
+    def __init__(self, name, model, serializer_class, queryset, scope, parent=None):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        self.queryset = queryset
+        self.scope = scope
+        self.parent = parent
+
+
+SYNCED = {
+    synced.name: synced for synced in (
+        SyncedModel('centers', Center, CenterSyncSerializer,
+                    lambda: Center.objects.all(),
+                    lambda center: (None, None)),
+        SyncedModel('squads', Squad, SquadSyncSerializer,
+                    lambda: Squad.objects.with_stats(),
+                    lambda squad: (squad.pk, None)),
+        SyncedModel('members', SquadMember, SquadMemberSyncSerializer,
+                    lambda: SquadMember.objects.select_related('user'),
+                    lambda member: (member.squad_id, member.user_id),
+                    parent=lambda member: ('squads', member.squad_id)),
+        SyncedModel('events', Event, EventSyncSerializer,
+                    lambda: Event.objects.annotate(_rsvp_count=Count('rsvps')),
+                    lambda event: (event.squad_id, None)),
+        SyncedModel('rsvps', EventRSVP, EventRSVPSyncSerializer,
+                    lambda: EventRSVP.objects.select_related('user'),
+                    lambda rsvp: (event_squad_id(rsvp), rsvp.user_id),
+                    parent=lambda rsvp: ('events', rsvp.event_id)),
+    )
+}
+SYNCED_BY_MODEL = {synced.model: synced for synced in SYNCED.values()}
+
+
+def record_change(synced, obj, action):
+    squad_id, user_id = synced.scope(obj)
+    changes = [Change(model=synced.name, object_id=obj.pk, action=action, squad_id=squad_id, user_id=user_id)]
+    if synced.parent is not None:
+        # The parent squad or event is filed under the same squad
+        name, parent_id = synced.parent(obj)
+        changes.append(Change(model=name, object_id=parent_id, action=Change.UPDATED, squad_id=squad_id))
+    Change.objects.bulk_create(changes)
+
+
+def row_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_change(SYNCED_BY_MODEL[sender], instance, Change.CREATED if created else Change.UPDATED)
+
+
+def row_deleted(sender, instance, **kwargs):
+    record_change(SYNCED_BY_MODEL[sender], instance, Change.DELETED)
+
+
+def backfill_changes(get_model, batch_size=5000):
+    """
+    Log a ``created`` change for every existing row that has none, so a
+    first sync returns them. ``get_model(app_label, model_name)`` is ``apps.get_model``
+    in a migration.
+    """
+    Change = get_model('core', 'Change')
+    sources = [
+        ('centers', get_model('centers', 'Center'), None, None),
+        ('squads', get_model('squads', 'Squad'), 'id', None),
+        ('members', get_model('squads', 'SquadMember'), 'squad_id', 'user_id'),
+        ('events', get_model('events', 'Event'), 'squad_id', None),
+        ('rsvps', get_model('events', 'EventRSVP'), 'event__squad_id', 'user_id'),
+    ]
+    for name, model, squad_field, user_field in sources:
+        fields = list(dict.fromkeys(field for field in ('id', squad_field, user_field) if field))
+        batch = []
+        logged = Change.objects.filter(model=name, object_id=OuterRef('id'))
+        rows = model.objects.filter(~Exists(logged)).values(*fields).order_by()
+        for row in rows.iterator(batch_size):
+            batch.append(Change(model=name, object_id=row['id'], action='created',
+                                squad_id=row.get(squad_field), user_id=row.get(user_field)))
+            if len(batch) >= batch_size:
+                Change.objects.bulk_create(batch)
+                batch = []
+        Change.objects.bulk_create(batch)
+
+
+def superseded(before=None):
+    """Filter for changes followed by a later change of the same row (logged before ``before``)"""
+    later = Change.objects.filter(model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+    if before is not None:
+        later = later.filter(changed_at__lt=before)
+    return Exists(later)
+
+
+def prune_changes(retention_days=None, batch_size=5000):
+    """Delete superseded changes, and tombstones older than the retention period"""
+    retention_days = settings.SYNC_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    # Only once the later change is past the gap window, so a pruned id is never taken for a pending one
+    settled = timezone.now() - timedelta(seconds=settings.SYNC_GAP_SECONDS)
+    deleted = 0
+    stale = Change.objects.filter(Q(superseded(settled)) | Q(action=Change.DELETED, changed_at__lt=cutoff))
+    while True:
+        ids = list(stale.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Change.objects.filter(id__in=ids).delete()[0]
+
+
+class SyncTokenExpired(exceptions.APIException):
+    status_code = 410
+    default_detail = 'Sync token expired; sync again without "since".'
+    default_code = 'sync_token_expired'
+
+
+MAX_GAPS = 100  # Missing id ranges a token carries; older ones are given up
+
+
+def make_token(position, missing=()):
+    token = f'{position}.{int(time.time())}'
+    if missing:
+        token += '.' + ','.join(f'{start}-{end}' for start, end in missing[-MAX_GAPS:])
+    return token
+
+
+def parse_token(token):
+    """The change log position of a sync token, and the id ranges missing below it"""
+    try:
+        position, issued, *gaps = token.split('.')
+        position, issued = int(position), int(issued)
+        missing = [tuple(int(pk) for pk in gap.split('-')) for gap in gaps[0].split(',')] if gaps else []
+        if len(gaps) > 1 or len(missing) > MAX_GAPS or any(len(gap) != 2 for gap in missing):
+            raise ValueError(token)
+    except ValueError:
+        raise exceptions.ValidationError({'since': ['Invalid sync token.']})
+    if issued < time.time() - settings.SYNC_RETENTION_DAYS * 86400:
+        # Tombstones the client has not seen may have been pruned
+        raise SyncTokenExpired()
+    return position, missing
+
+
+def pending_gaps(lowest, highest):
+    """
+    The ranges of ids in (``lowest``, ``highest``] with no change, whose
+    transaction may still commit: the change after them is younger than
+    ``SYNC_GAP_SECONDS``. Reads only the young end of the log.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SYNC_GAP_SECONDS)
+    recent = Change.objects.filter(id__gt=lowest, id__lte=highest).order_by('-id').values_list('id', 'changed_at')
+    gaps = []
+    following = None  # The young change above the current one
+    for pk, changed_at in recent.iterator(1000):
+        if following is not None and following > pk + 1:
+            gaps.append((pk + 1, following - 1))
+        if changed_at <= cutoff:
+            break
+        following = pk
+    else:
+        if following is not None and following > lowest + 1:
+            gaps.append((lowest + 1, following - 1))
+    return gaps[::-1]
+
+
+def clip(ranges, low, high):
+    """The parts of the id ranges between ``low`` and ``high``"""
+    return [(max(start, low), min(end, high)) for start, end in ranges if max(start, low) <= min(end, high)]
+
+
+def visible_changes(user):
+    member_of = SquadMember.objects.filter(user=user).values('squad_id')
+    visible_squads = Squad.objects.filter(Q(is_public=True) | Q(owner=user) | Q(members__user=user)).values('id')
+    return Change.objects.filter(
+        Q(model='centers')
+        | Q(model='squads', squad_id__in=visible_squads)
+        | Q(model='squads', action=Change.DELETED)
+        | Q(model__in=SQUAD_SCOPED, squad_id__in=member_of)
+        | Q(user_id=user.pk)
+    )
+
+
+class SyncView(APIView):
+    """Rows created, updated or deleted since a sync token (see core.sync)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        position, missing = parse_token(since) if since else (0, [])
+        # Missing ids are found before reading, so a change committing in between is read twice, not never
+        tip = max(Change.objects.order_by('-id').values_list('id', flat=True).first() or 0, position)
+        gaps = pending_gaps(missing[0][0] - 1 if missing else position, tip)
+
+        wanted = Q(id__gt=position, id__lte=tip)
+        for gap in missing:
+            wanted |= Q(id__range=gap)
+        scanned = Change.objects.filter(wanted)
+        squad = request.query_params.get('squad')
+        if squad:
+            # A separate feed, with its own tokens, of one squad's rows
+            try:
+                scanned = scanned.filter(squad_id=uuid.UUID(squad))
+            except ValueError:
+                raise exceptions.ValidationError({'squad': ['Expected a squad id.']})
+        changes = scanned & visible_changes(request.user)
+        page_size = settings.SYNC_PAGE_SIZE
+        rows = list(changes.filter(~superseded()).order_by('id').values_list(
+            'id', 'model', 'object_id', 'action')[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        # Past the changes of rows the user cannot see, too, unless the page is full
+        last = rows[-1][0] if has_more else tip
+        missing = clip(gaps, 0, last) + clip(missing, last + 1, position)
+        position = max(position, last)
+        updated = defaultdict(list)
+        deleted = defaultdict(list)
+        for _, name, object_id, action in rows:
+            (deleted if action == Change.DELETED else updated)[name].append(object_id)
+        return Response({
+            'changes': {
+                name: SYNCED[name].serializer_class(SYNCED[name].queryset().filter(pk__in=ids), many=True).data
+                for name, ids in updated.items()
+            },
+            'deleted': deleted,
+            'next': make_token(position, missing),
+            'has_more': has_more,
+        })
@@ -0,0 +1,9 @@
+from jobs.queue import task
+
+from . import dashboard
+
+
+@task(name='core.rebuild_dashboard', priority=-5, max_attempts=3)
+def rebuild_dashboard(payload):
+    """Recount the county dashboard in the background (see ``manage.py rebuild_dashboard``)"""
+    dashboard.rebuild()
@@ -1,3 +1,515 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+import zlib
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from centers.models import Center
+from squads.models import Squad, SquadMember
+from users.models import User
+from . import compression, dashboard, idempotency, metrics, outbox, regions, sync
+from .async_views import async_api_view
+from .geodata import build_geodata, geodata_manifest
+from .models import Change, ConsumerPosition, CountyStats, IdempotencyKey, OutboxEvent, Ward
+from .throttling import InviteRateThrottle, PhoneRateThrottle
+
+
+def drain(name):
+    """Apply every recorded event"""
+    while outbox.process(outbox.CONSUMERS[name]):
+        pass
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        if regions.resolver().county('Nairobi') is None:
+            regions.seed()
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com', county='Nairobi')
+        cls.member = User.objects.create_user('+254700000002', 'member@example.com', county='Nairobi')
+
+    def create_squad(self, county):
+        return Squad.objects.create(name='Kilimani', county=county, owner=self.owner,
+                                    voter_registration_date=datetime.date(2027, 1, 15))
+
+    def totals(self):
+        return {row['county']: row for row in CountyStats.objects.filter(day=None).values(
+            'county', *dashboard.METRICS)}
+
+    def test_spellings_share_a_county(self):
+        self.create_squad('Nairobi')
+        self.create_squad('NAIROBI County')
+        nairobi = regions.resolver().county('Nairobi')
+        self.assertEqual(self.totals()[nairobi]['squads'], 2)
+
+    def test_rebuild_marks_counted_events_applied(self):
+        squad = self.create_squad('Nairobi')
+        SquadMember.objects.create(squad=squad, user=self.member)
+        dashboard.rebuild()
+        drain('core.dashboard')
+        self.assertEqual(self.totals()[regions.resolver().county('Nairobi')]['members'], 1)
+
+    def test_moving_a_squad_moves_its_counts(self):
+        squad = self.create_squad('Nairobi')
+        SquadMember.objects.create(squad=squad, user=self.member, has_registered=True)
+        squad.county = 'Mombasa'
+        squad.save()  # Before the join is applied: the counts are additions either way
+        drain('core.dashboard')
+
+        nairobi, mombasa = regions.resolver().county('Nairobi'), regions.resolver().county('Mombasa')
+        totals = self.totals()
+        self.assertEqual((totals[nairobi]['squads'], totals[nairobi]['members']), (0, 0))
+        self.assertEqual((totals[mombasa]['squads'], totals[mombasa]['members'], totals[mombasa]['registered']),
+                         (1, 1, 1))
+        dashboard.rebuild()
+        rebuilt = self.totals()
+        self.assertEqual({county: row for county, row in totals.items() if any(row[m] for m in dashboard.METRICS)},
+                         rebuilt)
+
+
+class RegionTests(TestCase):
+    NAIROBI, MOMBASA, MURANGA, ELGEYO_MARAKWET, WESTLANDS = 47, 1, 21, 28, 274
+
+    @classmethod
+    def setUpTestData(cls):
+        if regions.resolver().county('Nairobi') is None:
+            regions.seed()
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com')
+
+    def test_county_spellings(self):
+        self.assertEqual(regions.region_key("Murang'a County"), 'MURANGA')
+        resolver = regions.resolver()
+        for name, county_id in [('NAIROBI', self.NAIROBI), ('nairobi city county', self.NAIROBI),
+                                ('Muranga', self.MURANGA), ('Elgeyo Marakwet', self.ELGEYO_MARAKWET),
+                                ('Elgeyo-Marakwet County', self.ELGEYO_MARAKWET), ('Atlantis', None), ('', None)]:
+            with self.subTest(name=name):
+                self.assertEqual(resolver.county(name), county_id)
+
+    def test_constituency(self):
+        resolver = regions.resolver()
+        self.assertEqual(resolver.constituency(self.NAIROBI, 'westlands'), (self.NAIROBI, self.WESTLANDS))
+        # A national constituency name tells the county that is missing, but not one that is wrong
+        self.assertEqual(resolver.constituency(None, 'Westlands'), (self.NAIROBI, self.WESTLANDS))
+        self.assertEqual(resolver.constituency(self.MOMBASA, 'Westlands'), (self.MOMBASA, None))
+        self.assertEqual(resolver.constituency(None, 'Atlantis'), (None, None))
+        center = Center.objects.create(name='Westlands Primary School', county='', constituency='WESTLANDS',
+                                       address='Westlands')
+        self.assertEqual((center.county_ref_id, center.constituency_ref_id), (self.NAIROBI, self.WESTLANDS))
+
+    def test_wards(self):
+        center = Center.objects.create(name='Highridge Primary School', county='Nairobi', constituency='Westlands',
+                                       ward='Parklands/Highridge', address='Highridge')
+        ward = Ward.objects.get()
+        self.assertEqual((center.ward_ref_id, ward.county_id, ward.constituency_id, ward.name),
+                         (ward.pk, self.NAIROBI, self.WESTLANDS, 'Parklands/Highridge'))
+        other = Center.objects.create(name='Parklands School', county='NAIROBI', ward='parklands highridge',
+                                      address='Parklands')
+        self.assertEqual((other.ward_ref_id, Ward.objects.count()), (ward.pk, 1))
+
+        # Users only link to wards centers have named
+        user = User.objects.create_user('+254700000002', 'user@example.com', county='Nairobi',
+                                        ward='Parklands Highridge')
+        stranger = User.objects.create_user('+254700000003', 'stranger@example.com', county='Nairobi',
+                                            ward='Karura')
+        self.assertEqual((user.ward_ref_id, stranger.ward_ref_id, Ward.objects.count()), (ward.pk, None, 1))
+
+    def test_backfill(self):
+        # bulk_create does not call save(), so the keys are missing until backfilled
+        Squad.objects.bulk_create([
+            Squad(name=f'Squad {n}', county=county, owner=self.owner,
+                  voter_registration_date=datetime.date(2027, 1, 15))
+            for n, county in enumerate(['nairobi', 'Mombasa County', 'Atlantis', 'NAIROBI CITY', 'Nairobi'])])
+        self.assertEqual(Squad.objects.exclude(county_ref=None).count(), 0)
+
+        self.assertEqual(regions.backfill(chunk_size=2, models=[('squads', 'Squad')]), 4)
+        self.assertEqual(dict(Squad.objects.values_list('county', 'county_ref')), {
+            'nairobi': self.NAIROBI, 'Mombasa County': self.MOMBASA, 'Atlantis': None,
+            'NAIROBI CITY': self.NAIROBI, 'Nairobi': self.NAIROBI})
+        self.assertEqual(regions.backfill(chunk_size=2, models=[('squads', 'Squad')]), 0)
+
+    def test_in_county(self):
+        for county in ('Nairobi', 'atlantis'):
+            Squad.objects.create(name=county, county=county, owner=self.owner,
+                                 voter_registration_date=datetime.date(2027, 1, 15))
+        squads = Squad.objects.all()
+        self.assertEqual(regions.county_filter('nairobi city', prefix='squad__'), {'squad__county_ref': self.NAIROBI})
+        self.assertEqual([squad.name for squad in regions.in_county(squads, 'NAIROBI CITY')], ['Nairobi'])
+        # Not a known county: matched by its text, in any case
+        self.assertEqual(regions.county_filter('Atlantis'), {'county__iexact': 'Atlantis'})
+        self.assertEqual([squad.name for squad in regions.in_county(squads, 'ATLANTIS')], ['atlantis'])
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.applied = []
+        self.consumer = outbox.Consumer(self.applied.extend, 'test', ['test.event'], batch_size=10)
+        ConsumerPosition.objects.create(consumer='test', position=1000)
+
+    def record(self, *ids):
+        OutboxEvent.objects.bulk_create([OutboxEvent(id=pk, name='test.event') for pk in ids])
+
+    def position(self):
+        return ConsumerPosition.objects.get(consumer='test')
+
+    def test_missing_id_is_read_once_committed(self):
+        self.record(1001, 1003)
+        self.assertEqual(outbox.process(self.consumer), 2)
+        position = self.position()
+        self.assertEqual((position.position, list(position.applied)), (1001, ['1003']))
+
+        self.record(1002)  # A transaction that was still open commits
+        self.assertEqual(outbox.process(self.consumer), 1)
+        self.assertEqual([event.id for event in self.applied], [1001, 1003, 1002])
+        self.assertEqual((self.position().position, self.position().applied), (1003, {}))
+
+    def test_missing_id_is_given_up(self):
+        self.record(1001, 1003)
+        outbox.process(self.consumer)
+        later = timezone.now() + timedelta(seconds=settings.OUTBOX_GAP_SECONDS + 1)
+        with self.assertLogs('core.outbox', 'WARNING'):
+            outbox.process(self.consumer, now=later)
+        self.assertEqual((self.position().position, self.position().applied), (1003, {}))
+
+
+class SyncGapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('+254700000001', 'user@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def log(self, *ids, age=0):
+        changed_at = timezone.now() - timedelta(seconds=age)
+        Change.objects.bulk_create([Change(id=pk, model='centers', object_id=uuid.uuid4(), action=Change.DELETED)
+                                    for pk in ids])
+        Change.objects.filter(id__in=ids).update(changed_at=changed_at)
+
+    def sync(self, token):
+        response = self.client.get('/api/sync/', {'since': token})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return len(data['deleted'].get('centers', [])), sync.parse_token(data['next'])
+
+    def test_missing_change_is_read_once_committed(self):
+        self.log(1001, 1003)
+        delivered, (position, missing) = self.sync(sync.make_token(1000))
+        self.assertEqual((delivered, position, missing), (2, 1003, [(1002, 1002)]))
+
+        self.log(1002)  # A transaction that was still open commits
+        delivered, (position, missing) = self.sync(sync.make_token(position, missing))
+        self.assertEqual((delivered, position, missing), (1, 1003, []))
+
+    def test_missing_change_is_given_up(self):
+        self.log(1001, 1003, age=settings.SYNC_GAP_SECONDS + 1)
+        delivered, (position, missing) = self.sync(sync.make_token(1000))
+        self.assertEqual((delivered, position, missing), (2, 1003, []))
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        cls.joiner = User.objects.create_user('+254700000002', 'joiner@example.com')
+        cls.squads = [Squad.objects.create(name=name, county='Nairobi', owner=cls.owner,
+                                           voter_registration_date=datetime.date(2027, 1, 15))
+                      for name in ('Kilimani', 'Lavington')]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.joiner).access_token}')
+
+    def join(self, squad, key):
+        return self.client.post(f'/api/squads/{squad.pk}/join/', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_is_replayed(self):
+        first = self.join(self.squads[0], 'key-1')
+        retry = self.join(self.squads[0], 'key-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual((first.get('Idempotent-Replayed'), retry['Idempotent-Replayed']), (None, 'true'))
+        self.assertEqual(SquadMember.objects.filter(user=self.joiner).count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.join(self.squads[0], 'key-1')
+        self.assertEqual(self.join(self.squads[1], 'key-1').status_code, 422)
+
+    def test_client_error_is_replayed(self):
+        Squad.objects.filter(pk=self.squads[0].pk).update(owner=self.joiner)
+        self.assertEqual(self.join(self.squads[0], 'key-1').status_code, 400)
+        retry = self.join(self.squads[0], 'key-1')
+        self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (400, 'true'))
+
+    def batch(self, squad, headers):
+        response = self.client.post('/api/batch/', {'requests': [
+            {'method': 'POST', 'path': f'/api/squads/{squad.pk}/join/', 'headers': headers},
+        ]}, format='json', HTTP_IDEMPOTENCY_KEY=str(uuid.uuid4()))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['responses'][0]
+
+    def test_batched_retry_is_replayed(self):
+        first = self.batch(self.squads[0], {'Idempotency-Key': 'key-1'})
+        retry = self.batch(self.squads[0], {'idempotency-key': 'key-1'})
+        self.assertEqual((first['status'], retry['status']), (201, 201))
+        self.assertEqual(retry['body'], first['body'])
+        self.assertEqual((first.get('headers', {}).get('Idempotent-Replayed'), retry['headers']['Idempotent-Replayed']),
+                         (None, 'true'))
+        # The same key outside a batch is the same write
+        self.assertEqual(self.join(self.squads[0], 'key-1')['Idempotent-Replayed'], 'true')
+        self.assertEqual(SquadMember.objects.filter(user=self.joiner).count(), 1)
+        self.assertEqual(self.batch(self.squads[1], {'Idempotency-Key': 'key-1'})['status'], 422)
+
+    def test_batched_headers(self):
+        refused = self.batch(self.squads[0], {'Authorization': 'Bearer x'})
+        self.assertEqual((refused['status'], SquadMember.objects.filter(user=self.joiner).count()), (400, 0))
+        # Without a key of its own the sub-request runs again, whatever the batch's key
+        self.assertEqual(self.batch(self.squads[0], {})['status'], 201)
+        self.assertEqual(self.batch(self.squads[0], {})['status'], 400)
+
+    def test_in_progress(self):
+        self.assertEqual(idempotency.claim(self.joiner.pk, 'key-1', 'fingerprint'), ('execute', None))
+        outcome, record = idempotency.claim(self.joiner.pk, 'key-1', 'fingerprint')
+        self.assertEqual(outcome, 'in_progress')
+        response = idempotency.refusal(outcome)
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+
+    def test_lost_attempt_is_taken_over(self):
+        idempotency.claim(self.joiner.pk, 'key-1', 'fingerprint')
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS + 1))
+        self.assertEqual(idempotency.claim(self.joiner.pk, 'key-1', 'fingerprint'), ('execute', None))
+        self.assertEqual(idempotency.claim(self.joiner.pk, 'key-1', 'fingerprint')[0], 'in_progress')
+
+
+class ThrottledView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle]
+    throttle_scope = 'otp_send'
+
+    def post(self, request):
+        return Response(status=204)
+
+
+class InvitesView(ThrottledView):
+    throttle_classes = [InviteRateThrottle]
+
+
+@async_api_view(allow_anonymous=True)
+async def async_ping(request):
+    return {}
+
+
+@mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'otp_send_phone': '3/minute', 'invites': '5/day'})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user('+254700000001', 'user@example.com')
+
+    def send(self, view, data, at=None):
+        request = self.factory.post('/', data, format='json')
+        force_authenticate(request, self.user)
+        with mock.patch('core.throttling.time.time', return_value=at or 60_000):
+            return view.as_view()(request)
+
+    def test_rate_per_phone_number(self):
+        statuses = [self.send(ThrottledView, {'phone_number': number}).status_code
+                    for number in ('+254 712 345678', '254712345678', '254-712-345-678', '254712345678')]
+        self.assertEqual(statuses, [204, 204, 204, 429])
+        self.assertEqual(self.send(ThrottledView, {'phone_number': '254700000009'}).status_code, 204)
+
+    def test_sliding_window(self):
+        for _ in range(3):
+            self.send(ThrottledView, {'phone_number': '254712345678'})
+        refused = self.send(ThrottledView, {'phone_number': '254712345678'}, at=60_040)
+        self.assertEqual(refused.status_code, 429)
+        self.assertGreater(int(refused['Retry-After']), 0)
+        # Two thirds through the next window a third of the previous one still counts, and refusals did not
+        statuses = [self.send(ThrottledView, {'phone_number': '254712345678'}, at=60_100).status_code
+                    for _ in range(3)]
+        self.assertEqual(statuses, [204, 204, 429])
+
+    def test_invites_count_each_recipient(self):
+        self.assertEqual(self.send(InvitesView, {'phone_numbers': ['1', '2', '3']}).status_code, 204)
+        self.assertEqual(self.send(InvitesView, {'phone_numbers': ['4', '5', '6']}).status_code, 429)
+        self.assertEqual(self.send(InvitesView, {'phone_numbers': ['4', '5']}).status_code, 204)
+
+
+    @mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'user': '3/minute', 'anon': '2/minute'})
+    def test_async_views(self):
+        def statuses(count, user=None):
+            responses = []
+            for _ in range(count):
+                request = AsyncRequestFactory().get('/')
+                if user is not None:
+                    request._force_auth_user = user
+                with mock.patch('core.throttling.time.time', return_value=60_000):
+                    responses.append(async_to_sync(async_ping)(request))
+            return [response.status_code for response in responses], responses[-1]
+
+        codes, refused = statuses(3)
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertGreater(int(refused['Retry-After']), 0)
+        self.assertEqual(statuses(4, self.user)[0], [200, 200, 200, 429])
+
+
+class MetricsTests(TestCase):
+    @override_settings(METRICS_TOKEN=None)
+    def test_local_scrapes_only_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='10.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1',
+                                         HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_exited_processes_are_folded(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True).stdout.strip()
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            with open(os.path.join(directory, f'metrics_{exited}.json'), 'w') as fh:
+                json.dump({'otp_sent_total': [[['login'], 3]], 'realtime_connections': [[[], 2]]}, fh)
+
+            for _ in range(2):
+                totals = metrics.REGISTRY.aggregate()
+                self.assertEqual(totals['otp_sent_total'][('login',)] - metrics.OTP_SENT.values.get(('login',), 0), 3)
+                self.assertEqual(totals.get('realtime_connections', {}).get(()),
+                                 metrics.REALTIME_CONNECTIONS.values.get(()))
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['metrics.lock', f'metrics_{os.getpid()}.json', 'metrics_dead.json'])
+
+
+class CompressionTests(TestCase):
+    BODY = json.dumps([{'id': n, 'name': f'Squad {n}'} for n in range(200)]).encode()
+
+    def respond(self, response, accept_encoding='gzip, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return compression.CompressionMiddleware(lambda request: response)(request)
+
+    def test_choose_encoding(self):
+        for accept_encoding, chosen in [('gzip, br', 'br'), ('br;q=0, gzip', 'gzip'), ('GZIP;q=0.5', 'gzip'),
+                                        ('*', 'br'), ('identity', None), ('', None), ('gzip;q=0', None)]:
+            with self.subTest(accept_encoding=accept_encoding):
+                request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(compression.choose_encoding(request, ('br', 'gzip')), chosen)
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_gzip(self):
+        response = HttpResponse(self.BODY, content_type='application/json', headers={'ETag': '"v1"'})
+        response = self.respond(response)
+        self.assertEqual((response['Content-Encoding'], response['Vary'], response['ETag']),
+                         ('gzip', 'Accept-Encoding', 'W/"v1"'))
+        self.assertEqual(gzip.decompress(response.content), self.BODY)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli(self):
+        response = self.respond(HttpResponse(self.BODY, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), self.BODY)
+
+    def test_sent_as_is(self):
+        small = self.respond(HttpResponse(b'{"id": 1}', content_type='application/json'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertEqual(small['Vary'], 'Accept-Encoding')  # Larger responses from the same URL are compressed
+        self.assertFalse(self.respond(HttpResponse(self.BODY, content_type='application/json'), '').has_header(
+            'Content-Encoding'))
+        self.assertFalse(self.respond(HttpResponse(self.BODY, content_type='image/png')).has_header('Vary'))
+        events = self.respond(StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream'))
+        self.assertFalse(events.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(events.streaming_content), b'data: 1\n\n')
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_streaming(self):
+        rows = [json.dumps({'id': n}).encode() + b'\n' for n in range(3)]
+        response = self.respond(StreamingHttpResponse(iter(rows), content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        chunks = list(response.streaming_content)
+        # Each row is flushed as it is produced
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual([decompressor.decompress(chunk) for chunk in chunks[:3]], rows)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b''.join(rows))
+
+
+class GeodataTests(TestCase):
+    def setUp(self):
+        self.source = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.build = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(GEODATA_DIR=self.source, GEODATA_BUILD_DIR=self.build))
+        self.addCleanup(geodata_manifest.cache_clear)
+        geodata_manifest.cache_clear()
+        self.write({'type': 'FeatureCollection', 'features': []})
+
+    def write(self, data):
+        (self.source / 'counties.geojson').write_text(json.dumps(data, indent=2))
+
+    def test_build(self):
+        manifest = build_geodata()
+        hashed = manifest['counties.geojson']
+        self.assertRegex(hashed, r'^counties\.[0-9a-f]{12}\.geojson$')
+        self.assertEqual((self.build / hashed).read_bytes(), b'{"type":"FeatureCollection","features":[]}')
+        minified = (self.build / hashed).read_bytes()
+        self.assertEqual(gzip.decompress((self.build / f'{hashed}.gz').read_bytes()), minified)
+        self.assertEqual(geodata_manifest(), manifest)
+        self.assertEqual(build_geodata(), manifest)  # Same content, same name
+
+        self.write({'type': 'FeatureCollection', 'features': [{'type': 'Feature'}]})
+        self.assertNotEqual(build_geodata()['counties.geojson'], hashed)
+
+    def test_before_a_build(self):
+        response = self.client.get('/geodata/counties.geojson')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Cache-Control'))
+        self.assertEqual(self.client.get('/geodata/other.geojson').status_code, 404)
+
+    def test_served_precompressed(self):
+        hashed = build_geodata()['counties.geojson']
+        digest = hashed.split('.')[1]
+        redirect = self.client.get('/geodata/counties.geojson')
+        self.assertEqual((redirect.status_code, redirect['Location']), (302, f'/geodata/{hashed}'))
+        self.assertEqual(redirect['Cache-Control'], 'public, max-age=300')
+        self.assertEqual(self.client.get('/api/geodata/').json(),
+                         {'counties.geojson': f'http://testserver/geodata/{hashed}'})
+
+        response = self.client.get(f'/geodata/{hashed}', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((response['Content-Encoding'], response['ETag']), ('gzip', f'"{digest}-gzip"'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'public', 'max-age=31536000', 'immutable'})
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)),
+                         (self.build / hashed).read_bytes())
+
+        plain = self.client.get(f'/geodata/{hashed}')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain['ETag'], f'"{digest}"')
+        self.assertEqual(b''.join(plain.streaming_content), (self.build / hashed).read_bytes())
+
+        cached = self.client.get(f'/geodata/{hashed}', HTTP_ACCEPT_ENCODING='gzip',
+                                 HTTP_IF_NONE_MATCH=f'"{digest}-gzip"')
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get('/geodata/counties.000000000000.geojson').status_code, 404)
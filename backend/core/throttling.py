@@ -0,0 +1,189 @@
+"""
+Rate limits kept as counters in the shared cache.
+
+DRF's own throttles store a list of request timestamps per client, read and
+rewrite it on every request, and lose updates when two workers do that at
+once. These use a sliding window counter instead: one integer per client and
+window, bumped with the cache's atomic ``incr``, so every worker sees the
+same count. The count of the previous window is weighted by how much of it
+still overlaps the sliding window:
+
+    estimate = previous * (1 - elapsed / duration) + current
+
+That is two cache round trips per throttle and no read-modify-write. Set
+``CACHE_REDIS_URL`` so all workers share the counters; with the default
+local-memory cache each process counts on its own.
+
+Rates are ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` entries, keyed by
+scope (``'otp_send_phone': '5/hour'``). A rate of None turns a throttle off.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from . import metrics
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    A throttle that counts into the shared cache.
+
+    Subclasses set ``scope`` and implement ``get_cache_key`` (None leaves the
+    request unthrottled); ``cost`` is how much one request counts.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[settings.THROTTLE_CACHE]
+        self.wait_seconds = None
+
+    def cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        cost = self.cost(request, view)
+        if cost <= 0:
+            return True
+
+        now = time.time()
+        window, elapsed = divmod(now, self.duration)
+        current_key, previous_key = f'{key}:{int(window)}', f'{key}:{int(window) - 1}'
+        current = self.count(current_key, cost)
+        previous = self.cache.get(previous_key, 0)
+        weight = 1 - elapsed / self.duration
+        if previous * weight + current <= self.num_requests:
+            return True
+
+        try:
+            # Refused requests do not count against the client
+            self.cache.decr(current_key, cost)
+        except ValueError:
+            pass
+        if current > self.num_requests:
+            self.wait_seconds = self.duration - elapsed
+        else:
+            # When the previous window's weighted share has shrunk enough
+            self.wait_seconds = self.duration * (1 - (self.num_requests - current) / previous) - elapsed
+        metrics.THROTTLED_REQUESTS.inc(scope=self.scope)
+        return False
+
+    def count(self, key, cost):
+        """Add ``cost`` to a window's counter; returns the new total"""
+        # The counter outlives its window, since the next one reads it
+        self.cache.add(key, 0, timeout=self.duration * 2)
+        try:
+            return self.cache.incr(key, cost)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(key, cost, timeout=self.duration * 2)
+            return cost
+
+    def wait(self):
+        if self.wait_seconds is None:
+            return None
+        return max(math.ceil(self.wait_seconds), 1)
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Requests per signed-in user"""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class AnonRateThrottle(SlidingWindowThrottle):
+    """
+    Requests per client IP from anonymous clients.
+
+    Mobile carriers put many subscribers behind one address, so keep IP
+    rates well above what one person could send. Set ``NUM_PROXIES`` when
+    behind a load balancer so the client's address is read from
+    X-Forwarded-For.
+    """
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class ScopedThrottle(SlidingWindowThrottle):
+    """
+    A throttle whose rate depends on the view: ``<view.throttle_scope>_<suffix>``.
+
+    Views without a ``throttle_scope`` are not throttled by it.
+    """
+    suffix = None
+
+    def __init__(self):
+        # The rate is looked up once the view is known
+        self.rate = None
+        self.cache = caches[settings.THROTTLE_CACHE]
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        view_scope = getattr(view, 'throttle_scope', None)
+        if not view_scope:
+            return True
+        self.scope = f'{view_scope}_{self.suffix}'
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        ident = self.get_scope_ident(request, view)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class PhoneRateThrottle(ScopedThrottle):
+    """
+    Requests per phone number in the body, e.g. OTPs sent to or checked
+    for one number, however many addresses they come from.
+    """
+    suffix = 'phone'
+
+    def get_scope_ident(self, request, view):
+        phone_number = request.data.get('phone_number') if hasattr(request.data, 'get') else None
+        if not isinstance(phone_number, str):
+            return None
+        # '+254 712 345678' and '254712345678' are the same number
+        digits = ''.join(ch for ch in phone_number if ch.isdigit())[:20]
+        return digits or None
+
+
+class IPRateThrottle(ScopedThrottle):
+    """Requests per client IP to one scope, e.g. OTPs requested for any number"""
+    suffix = 'ip'
+
+    def get_scope_ident(self, request, view):
+        return self.get_ident(request)
+
+
+class InviteRateThrottle(SlidingWindowThrottle):
+    """Invites created per user per day; a bulk request counts each recipient"""
+    scope = 'invites'
+
+    def get_cache_key(self, request, view):
+        if request.method != 'POST' or not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+    def cost(self, request, view):
+        phone_numbers = request.data.get('phone_numbers') if hasattr(request.data, 'get') else None
+        if isinstance(phone_numbers, list):
+            return len(phone_numbers)
+        return 1
@@ -1,3 +1,77 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .compression import choose_encoding
+from .geodata import geodata_manifest
+from .metrics import REGISTRY
+
+GEODATA_CONTENT_TYPE = 'application/geo+json'
+LOOPBACK = {'127.0.0.1', '::1'}
+
+
+def metrics_view(request):
+    """
+    Expose metrics in the Prometheus text format: to scrapers sending
+    ``METRICS_TOKEN``, or without one set, to the local host only.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden()
+    elif request.META.get('REMOTE_ADDR') not in LOOPBACK or 'X-Forwarded-For' in request.headers:
+        # A request relayed by a proxy on this host comes from loopback too
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_safe
+def geodata_manifest_view(request):
+    """URLs of the current precompressed boundary files, by file name"""
+    response = JsonResponse({
+        name: request.build_absolute_uri(reverse('geodata', args=[hashed]))
+        for name, hashed in geodata_manifest().items()
+    })
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+@require_safe
+def geodata_view(request, name):
+    """
+    Serve a boundary file built by ``manage.py build_geodata``: by its
+    hashed name, precompressed and cacheable forever; by its plain name, as
+    a redirect to the hashed one.
+    """
+    manifest = geodata_manifest()
+    if name in manifest:
+        response = HttpResponseRedirect(reverse('geodata', args=[manifest[name]]))
+        patch_cache_control(response, public=True, max_age=300)
+        return response
+    if name not in manifest.values():
+        if manifest or not name.endswith('.geojson') or not (settings.GEODATA_DIR / name).is_file():
+            raise Http404()
+        # Not built yet: the plain file, compressed on the fly by CompressionMiddleware
+        return FileResponse(open(settings.GEODATA_DIR / name, 'rb'), content_type=GEODATA_CONTENT_TYPE)
+
+    path = settings.GEODATA_BUILD_DIR / name
+    available = [coding for coding, suffix in (('br', '.br'), ('gzip', '.gz'))
+                 if path.with_name(name + suffix).is_file()]
+    encoding = choose_encoding(request, available)
+    etag = f'"{name.split(".")[-2]}{"-" + encoding if encoding else ""}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        response = FileResponse(open(path.with_name(name + suffix), 'rb'), content_type=GEODATA_CONTENT_TYPE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Event, EventRSVP
+from .models import Event, EventReminder, EventRSVP
 
 
 @admin.register(Event)
@@ -24,3 +24,12 @@ class EventRSVPAdmin(admin.ModelAdmin):
     list_filter = ('status', 'responded_at')
     search_fields = ('event__squad__name', 'user__phone_number')
     readonly_fields = ('responded_at',)
+
+
+@admin.register(EventReminder)
+class EventReminderAdmin(admin.ModelAdmin):
+    """Admin for EventReminder model"""
+    list_display = ('event', 'offset', 'remind_at', 'status', 'recipient_count', 'sent_at')
+    list_filter = ('status', 'offset')
+    search_fields = ('event__squad__name',)
+    readonly_fields = ('sent_at', 'recipient_count')
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from .models import Event, EventRSVP
+        from .realtime import rsvp_saved
+        from .reminders import event_saved
+
+        post_save.connect(event_saved, sender=Event, dispatch_uid='events.reminders.event_saved')
+        post_save.connect(rsvp_saved, sender=EventRSVP, dispatch_uid='events.realtime.rsvp_saved')
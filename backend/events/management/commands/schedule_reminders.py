@@ -0,0 +1,41 @@
+"""
+Run the event reminder scheduler.
+
+    python manage.py schedule_reminders            # long-running
+    python manage.py schedule_reminders --once     # dispatch what is due and exit
+
+Reminders are fanned out to background jobs, so `run_jobs` workers must be
+running for them to be delivered. See ``events.reminders``.
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from events.reminders import ReminderScheduler, backfill_reminders
+
+
+class Command(BaseCommand):
+    help = 'Dispatch event reminders to "yes" and "maybe" RSVPs when they are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Dispatch due reminders once and exit')
+        parser.add_argument('--backfill', action='store_true',
+                            help='First create reminders for upcoming events that have none')
+        parser.add_argument('--horizon', type=int, default=600,
+                            help='Seconds ahead to load into the scheduler (default: 600)')
+        parser.add_argument('--refresh-interval', type=int, default=15,
+                            help='Seconds between reloads of the upcoming window (default: 15)')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f'Backfilled {backfill_reminders()} reminders')
+
+        scheduler = ReminderScheduler(horizon=options['horizon'], refresh_interval=options['refresh_interval'])
+        if options['once']:
+            scheduler.run_once()
+            return
+
+        signal.signal(signal.SIGTERM, scheduler.stop)
+        signal.signal(signal.SIGINT, scheduler.stop)
+        self.stdout.write('Reminder scheduler running')
+        scheduler.run()
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:58
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventReminder",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "offset",
+                    models.PositiveIntegerField(help_text="Minutes before the event"),
+                ),
+                (
+                    "scheduled_for",
+                    models.DateTimeField(
+                        help_text="Event.datetime this reminder was scheduled for"
+                    ),
+                ),
+                ("remind_at", models.DateTimeField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("sent", "Sent"),
+                            ("skipped", "Skipped"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("recipient_count", models.PositiveIntegerField(default=0)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminders",
+                        to="events.event",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["remind_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "remind_at"], name="events_reminder_due_idx"
+                    )
+                ],
+                "unique_together": {("event", "offset")},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0005_event_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["squad", "datetime"], name="events_event_squad_date_idx"
+            ),
+        ),
+    ]
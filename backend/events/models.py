@@ -1,13 +1,41 @@
 from django.db import models
-import uuid
+from django.db.models import Count, Prefetch
+from core import outbox
+from core.ids import uuid7
 from django.conf import settings
 
 
+class EventQuerySet(models.QuerySet):
+    def for_display(self, user=None, fieldset=None):
+        """
+        Everything EventSerializer reads: squad and center names, the RSVP
+        count and, for an authenticated user, their own RSVP. With a sparse
+        ``fieldset`` (see core.sparse) only what its fields need is loaded.
+        """
+        queryset = self.select_related('squad', 'center')
+        if fieldset is None or fieldset.includes('rsvp_count'):
+            queryset = queryset.annotate(_rsvp_count=Count('rsvps'))
+        if user is not None and user.is_authenticated and (fieldset is None or fieldset.includes('user_rsvp')):
+            queryset = queryset.prefetch_related(Prefetch(
+                'rsvps',
+                queryset=EventRSVP.objects.filter(user=user).select_related('user'),
+                to_attr='_user_rsvps',
+            ))
+        if fieldset is not None and fieldset.expands('rsvps'):
+            queryset = queryset.prefetch_related(Prefetch('rsvps', queryset=EventRSVP.objects.select_related('user')))
+        return queryset
+
+    def for_member(self, user):
+        """Events of squads the user belongs to, without a join that needs DISTINCT"""
+        from squads.models import SquadMember
+        return self.filter(squad__in=SquadMember.objects.filter(user=user).values('squad'))
+
+
 class Event(models.Model):
     """
     Voter registration event model
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     squad = models.ForeignKey(
         'squads.Squad',
         on_delete=models.CASCADE,
@@ -22,17 +50,27 @@ class Event(models.Model):
     meeting_point = models.TextField(blank=True, null=True)
     note = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.squad.name} - {self.center.name} ({self.datetime.strftime('%Y-%m-%d %H:%M')})"
 
     class Meta:
         ordering = ['datetime']
+        indexes = [
+            # A squad's events by date (events by squad, upcoming events)
+            models.Index(fields=['squad', 'datetime'], name='events_event_squad_date_idx'),
+        ]
 
 
-class EventRSVP(models.Model):
+class EventRSVP(outbox.DomainEvents, models.Model):
     """
     RSVP responses for events
+
+    A new or changed answer records an ``rsvp.changed`` outbox event (see
+    core.outbox).
     """
     RSVP_CHOICES = [
         ('yes', 'Yes'),
@@ -40,7 +78,7 @@ class EventRSVP(models.Model):
         ('maybe', 'Maybe'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     event = models.ForeignKey(
         Event,
         on_delete=models.CASCADE,
@@ -54,9 +92,55 @@ class EventRSVP(models.Model):
     status = models.CharField(max_length=10, choices=RSVP_CHOICES, default='maybe')
     responded_at = models.DateTimeField(auto_now=True)
 
+    tracked_fields = ('status',)
+
     def __str__(self):
         return f"{self.user.phone_number} - {self.event.squad.name} ({self.status})"
 
+    def saved_events(self, created):
+        changed, previous = self.changed('status')
+        if not (created or changed):
+            return []
+        return [(outbox.RSVP_CHANGED, {'rsvp': self.pk, 'event': self.event_id, 'user': self.user_id,
+                                       'status': self.status, 'previous': None if created else previous})]
+
     class Meta:
         unique_together = ['event', 'user']
         ordering = ['-responded_at']
+
+
+class EventReminder(models.Model):
+    """
+    A reminder sent to an event's "yes" and "maybe" RSVPs some minutes
+    before it starts. One row per event and offset (EVENT_REMINDER_OFFSETS),
+    kept in step with Event.datetime by events.reminders.sync_reminders.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('skipped', 'Skipped'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='reminders'
+    )
+    offset = models.PositiveIntegerField(help_text="Minutes before the event")
+    scheduled_for = models.DateTimeField(help_text="Event.datetime this reminder was scheduled for")
+    remind_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    recipient_count = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_id} - {self.offset} min before ({self.status})"
+
+    class Meta:
+        unique_together = ['event', 'offset']
+        ordering = ['remind_at']
+        indexes = [
+            # The scheduler's window query: status = 'pending' AND remind_at <= horizon
+            models.Index(fields=['status', 'remind_at'], name='events_reminder_due_idx'),
+        ]
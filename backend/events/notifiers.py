@@ -0,0 +1,64 @@
+"""
+Notifiers deliver event reminders to members.
+
+Select one with the ``REMINDER_NOTIFIER`` setting (a dotted path). A
+notifier's ``send(messages)`` receives a batch of ``(phone_number, text)``
+pairs and returns how many were delivered; raising makes the job that
+called it retry the whole batch.
+"""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.integrations import get_twilio_client
+
+logger = logging.getLogger(__name__)
+
+
+class BaseNotifier:
+    def send(self, messages):
+        raise NotImplementedError
+
+
+class LocalNotifier(BaseNotifier):
+    """Logs reminders instead of sending them; keeps the most recent ones in ``outbox``"""
+
+    max_outbox = 1000
+
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, messages):
+        for phone_number, text in messages:
+            logger.info('Reminder to %s: %s', phone_number, text)
+        self.outbox = (self.outbox + list(messages))[-self.max_outbox:]
+        return len(messages)
+
+
+class TwilioSMSNotifier(BaseNotifier):
+    """Sends each reminder as an SMS from TWILIO_FROM_NUMBER"""
+
+    def send(self, messages):
+        client = get_twilio_client()
+        if client is None:
+            raise RuntimeError('Twilio is not configured')
+        delivered = 0
+        error = None
+        for phone_number, text in messages:
+            try:
+                client.messages.create(to=phone_number, from_=settings.TWILIO_FROM_NUMBER, body=text)
+                delivered += 1
+            except Exception as exc:
+                # Retrying the batch would resend the delivered messages; drop this one instead
+                logger.warning('Reminder SMS to %s failed: %s', phone_number, exc)
+                error = exc
+        if messages and not delivered:
+            raise error
+        return delivered
+
+
+@lru_cache(maxsize=None)
+def get_notifier():
+    return import_string(settings.REMINDER_NOTIFIER)()
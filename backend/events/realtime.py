@@ -0,0 +1,14 @@
+"""Publish RSVP changes to the realtime stream (see ``core.realtime``)"""
+from core.pubsub import publish
+from core.realtime import squad_channel
+
+
+def rsvp_data(rsvp):
+    """Ids and the answer only: phone numbers and names are read from the REST API"""
+    return {'id': rsvp.id, 'event': rsvp.event_id, 'user': rsvp.user_id, 'status': rsvp.status,
+            'responded_at': rsvp.responded_at}
+
+
+def rsvp_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        publish(squad_channel(instance.event.squad_id), 'rsvp.updated', rsvp_data(instance))
@@ -0,0 +1,221 @@
+"""
+Event reminders.
+
+Every event gets one EventReminder row per offset in
+``EVENT_REMINDER_OFFSETS`` (minutes before the event). The rows are the
+durable index by reminder time: ``sync_reminders`` keeps them in step with
+``Event.datetime`` whenever an event is saved, and the ``(status,
+remind_at)`` index makes "what is due soon" a range scan instead of a scan
+over every event.
+
+``ReminderScheduler`` (run by ``manage.py schedule_reminders``) loads the
+pending reminders due within the next few minutes into a heap and sleeps
+until the earliest one is due. Due reminders are dispatched by fanning the
+event's "yes" and "maybe" RSVPs out to background jobs in batches of
+``EVENT_REMINDER_BATCH_SIZE``; job workers deliver them through the
+configured notifier (see ``events.notifiers``).
+
+The database stays the source of truth. A reminder is only dispatched if
+its row is still pending and due when the heap entry fires, so a
+rescheduled or deleted event is picked up at the next refresh, and running
+more than one scheduler is safe. Send jobs carry the ``sent_at`` of the
+dispatch that queued them and are dropped once the reminder has been
+rescheduled (and perhaps dispatched again) since.
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core import metrics
+from .models import Event, EventReminder, EventRSVP
+
+logger = logging.getLogger(__name__)
+
+REMIND_STATUSES = ('yes', 'maybe')
+
+
+def reminder_times(event_datetime, now=None):
+    """
+    ``{offset: (remind_at, status)}`` for an event starting at ``event_datetime``.
+
+    Reminders whose time has passed are skipped, except that the one closest
+    to the event is sent right away while the event is still ahead, so
+    members of an event created (or moved) at short notice still get one.
+    """
+    now = now or timezone.now()
+    times = {}
+    catch_up = None
+    for offset in sorted(settings.EVENT_REMINDER_OFFSETS):
+        remind_at = event_datetime - timedelta(minutes=offset)
+        if remind_at > now:
+            times[offset] = (remind_at, 'pending')
+        elif catch_up is None and event_datetime > now:
+            catch_up = offset
+            times[offset] = (now, 'pending')
+        else:
+            times[offset] = (remind_at, 'skipped')
+    return times
+
+
+def sync_reminders(event, now=None):
+    """Create the reminders of ``event``, or reschedule them if its datetime changed"""
+    existing = {reminder.offset: reminder for reminder in EventReminder.objects.filter(event=event)}
+    create = []
+    for offset, (remind_at, status) in reminder_times(event.datetime, now).items():
+        reminder = existing.get(offset)
+        if reminder is None:
+            create.append(EventReminder(event=event, offset=offset, scheduled_for=event.datetime,
+                                        remind_at=remind_at, status=status))
+        elif reminder.scheduled_for != event.datetime:
+            # The event moved: remind members again for the new time
+            reminder.scheduled_for = event.datetime
+            reminder.remind_at = remind_at
+            reminder.status = status
+            reminder.sent_at = None
+            reminder.recipient_count = 0
+            reminder.save(update_fields=['scheduled_for', 'remind_at', 'status', 'sent_at', 'recipient_count'])
+    if create:
+        EventReminder.objects.bulk_create(create, ignore_conflicts=True)
+
+
+def event_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_reminders(instance)
+
+
+def backfill_reminders(batch_size=1000):
+    """Create missing reminders for upcoming events (e.g. ones created with bulk_create)"""
+    now = timezone.now()
+    created = 0
+    upcoming = Event.objects.filter(datetime__gt=now).exclude(
+        reminders__offset__in=settings.EVENT_REMINDER_OFFSETS
+    ).values_list('id', 'datetime').order_by()
+    batch = []
+    for event_id, event_datetime in upcoming.iterator(chunk_size=batch_size):
+        for offset, (remind_at, status) in reminder_times(event_datetime, now).items():
+            batch.append(EventReminder(event_id=event_id, offset=offset, scheduled_for=event_datetime,
+                                       remind_at=remind_at, status=status))
+        if len(batch) >= batch_size:
+            created += len(EventReminder.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        created += len(EventReminder.objects.bulk_create(batch, ignore_conflicts=True))
+    logger.info('Backfilled %s reminders', created)
+    return created
+
+
+def dispatch_reminder(reminder_id, now=None):
+    """
+    Fan a due reminder out to send jobs. Returns the number of recipients, or
+    None when the reminder is no longer pending and due (sent, moved or
+    deleted since it was scheduled).
+    """
+    from .tasks import send_reminders
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        claimed = EventReminder.objects.filter(id=reminder_id, status='pending', remind_at__lte=now)
+        if not claimed.update(status='sent', sent_at=now):
+            return None
+        reminder = EventReminder.objects.select_related('event').get(id=reminder_id)
+        if reminder.event.datetime <= now:
+            # The scheduler was down until after the event started
+            EventReminder.objects.filter(id=reminder_id).update(status='skipped', sent_at=None)
+            return 0
+
+        user_ids = EventRSVP.objects.filter(
+            event_id=reminder.event_id, status__in=REMIND_STATUSES
+        ).values_list('user_id', flat=True).order_by('user_id')
+        batch_size = settings.EVENT_REMINDER_BATCH_SIZE
+        payloads = []
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(str(user_id))
+            if len(batch) == batch_size:
+                payloads.append({'reminder': str(reminder_id), 'sent_at': now.isoformat(), 'users': batch})
+                batch = []
+        if batch:
+            payloads.append({'reminder': str(reminder_id), 'sent_at': now.isoformat(), 'users': batch})
+        send_reminders.enqueue_many(payloads)
+
+        recipients = sum(len(payload['users']) for payload in payloads)
+        EventReminder.objects.filter(id=reminder_id).update(recipient_count=recipients)
+    metrics.REMINDERS_DISPATCHED.inc()
+    return recipients
+
+
+class ReminderScheduler:
+    """
+    Heap of pending reminders due within ``horizon`` seconds.
+
+    ``refresh`` reloads the window every ``refresh_interval`` seconds, which
+    also bounds how late a reminder moved earlier by an event update can be.
+    """
+
+    def __init__(self, horizon=600, refresh_interval=15):
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.heap = []  # (remind_at timestamp, reminder id)
+        self.scheduled = {}  # reminder id -> remind_at timestamp of its live heap entry
+        self.last_refresh = None
+        self.stop_event = threading.Event()
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def refresh(self, now=None):
+        now = now or timezone.now()
+        window = EventReminder.objects.filter(
+            status='pending', remind_at__lte=now + timedelta(seconds=self.horizon)
+        ).values_list('id', 'remind_at')
+        current = {}
+        for reminder_id, remind_at in window.iterator(chunk_size=5000):
+            timestamp = remind_at.timestamp()
+            current[reminder_id] = timestamp
+            if self.scheduled.get(reminder_id) != timestamp:
+                heapq.heappush(self.heap, (timestamp, reminder_id))
+        # Entries for reminders that left the window (moved later, sent, deleted) become stale
+        self.scheduled = current
+        if len(self.heap) > 2 * len(current) + 1000:
+            self.heap = [(timestamp, reminder_id) for reminder_id, timestamp in current.items()]
+            heapq.heapify(self.heap)
+        self.last_refresh = time.monotonic()
+        metrics.REMINDERS_SCHEDULED.set(len(current))
+
+    def pop_due(self, now_timestamp):
+        due = []
+        while self.heap and self.heap[0][0] <= now_timestamp:
+            timestamp, reminder_id = heapq.heappop(self.heap)
+            if self.scheduled.get(reminder_id) == timestamp:
+                del self.scheduled[reminder_id]
+                due.append(reminder_id)
+        return due
+
+    def run_once(self):
+        """Refresh if needed and dispatch everything due; returns seconds until the next wake-up"""
+        if self.last_refresh is None or time.monotonic() - self.last_refresh >= self.refresh_interval:
+            self.refresh()
+        now = timezone.now()
+        for reminder_id in self.pop_due(now.timestamp()):
+            try:
+                recipients = dispatch_reminder(reminder_id, now)
+            except Exception:
+                logger.exception('Dispatching reminder %s failed', reminder_id)
+                continue
+            if recipients is not None:
+                logger.info('Reminder %s dispatched to %s members', reminder_id, recipients)
+
+        until_refresh = self.refresh_interval - (time.monotonic() - self.last_refresh)
+        if self.heap:
+            return max(0.0, min(until_refresh, self.heap[0][0] - timezone.now().timestamp()))
+        return max(0.0, until_refresh)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.stop_event.wait(self.run_once())
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.conf import settings
+from core.sparse import SparseFieldsetMixin
 from .models import Event, EventRSVP
 
 
-class EventRSVPSerializer(serializers.ModelSerializer):
+class EventRSVPSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for EventRSVP model"""
     user = serializers.StringRelatedField(read_only=True)
 
@@ -13,11 +14,11 @@ class EventRSVPSerializer(serializers.ModelSerializer):
         read_only_fields = ('responded_at',)
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Event model"""
     squad = serializers.StringRelatedField(read_only=True)
     center = serializers.StringRelatedField(read_only=True)
-    rsvps = EventRSVPSerializer(source='event_rsvps', many=True, read_only=True)
+    rsvps = EventRSVPSerializer(many=True, read_only=True)
     rsvp_count = serializers.SerializerMethodField()
     user_rsvp = serializers.SerializerMethodField()
 
@@ -26,14 +27,25 @@ class EventSerializer(serializers.ModelSerializer):
         fields = ('id', 'squad', 'center', 'datetime', 'meeting_point',
                  'note', 'rsvps', 'rsvp_count', 'user_rsvp', 'created_at')
         read_only_fields = ('id', 'created_at')
+        expandable_fields = ('rsvps',)  # Only with ?expand=rsvps
+        # What the method fields read (see Event.objects.for_display)
+        sparse_sources = {
+            'rsvp_count': ('_rsvp_count', 'rsvps'),
+            'user_rsvp': ('_user_rsvps',),
+        }
 
     def get_rsvp_count(self, obj):
+        if hasattr(obj, '_rsvp_count'):
+            return obj._rsvp_count
         return obj.rsvps.count()
 
     def get_user_rsvp(self, obj):
         """Get current user's RSVP status for this event"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            if hasattr(obj, '_user_rsvps'):
+                # Prefetched by Event.objects.for_display(user)
+                return EventRSVPSerializer(obj._user_rsvps[0]).data if obj._user_rsvps else None
             try:
                 rsvp = obj.rsvps.get(user=request.user)
                 return EventRSVPSerializer(rsvp).data
@@ -42,6 +54,27 @@ class EventSerializer(serializers.ModelSerializer):
         return None
 
 
+class EventSyncSerializer(serializers.ModelSerializer):
+    """Event as delivered by /api/sync/: related rows by id"""
+    rsvp_count = serializers.IntegerField(source='_rsvp_count', read_only=True)
+
+    class Meta:
+        model = Event
+        fields = ('id', 'squad', 'center', 'datetime', 'meeting_point', 'note', 'rsvp_count',
+                 'created_at', 'updated_at')
+        read_only_fields = fields
+
+
+class EventRSVPSyncSerializer(serializers.ModelSerializer):
+    """EventRSVP as delivered by /api/sync/"""
+    user_display = serializers.StringRelatedField(source='user', read_only=True)
+
+    class Meta:
+        model = EventRSVP
+        fields = ('id', 'event', 'user', 'user_display', 'status', 'responded_at')
+        read_only_fields = fields
+
+
 class EventCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating events"""
 
@@ -0,0 +1,36 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import metrics
+from jobs.queue import task
+from users.models import User
+from .models import EventReminder
+from .notifiers import get_notifier
+
+
+@task(name='events.send_reminders', priority=5, max_attempts=3)
+def send_reminders(payload):
+    """Send one batch of an event reminder to the listed users"""
+    try:
+        reminder = EventReminder.objects.select_related('event__squad', 'event__center').get(id=payload['reminder'])
+    except EventReminder.DoesNotExist:
+        return  # The event was deleted
+    event = reminder.event
+    if reminder.status != 'sent' or reminder.sent_at != parse_datetime(payload['sent_at']):
+        return  # Rescheduled since the batch was queued: a later dispatch (if any) sends its own batches
+    if event.datetime <= timezone.now():
+        return  # Too late to be useful
+
+    local_time = timezone.localtime(event.datetime)
+    text = (
+        f"Reminder: {event.squad.name} meets at {event.center.name} on "
+        f"{local_time.strftime('%a %d %b at %H:%M')}."
+    )
+    if event.meeting_point:
+        text += f" Meeting point: {event.meeting_point}."
+    phone_numbers = User.objects.filter(id__in=payload['users'], is_active=True).values_list('phone_number', flat=True)
+    messages = [(phone_number, text) for phone_number in phone_numbers]
+    delivered = get_notifier().send(messages)
+    metrics.REMINDER_MESSAGES.inc(delivered, result='delivered')
+    if delivered < len(messages):
+        metrics.REMINDER_MESSAGES.inc(len(messages) - delivered, result='failed')
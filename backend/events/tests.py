@@ -1,3 +1,93 @@
+import datetime
+import json
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from centers.models import Center
+from jobs.worker import Worker
+from squads.models import Squad, SquadMember
+from users.models import User
+from .models import Event, EventReminder, EventRSVP
+from .notifiers import LocalNotifier
+from .reminders import dispatch_reminder
+
+
+class RSVPRealtimeTests(TestCase):
+    """Realtime RSVP events carry ids only, since squad owners who are not members follow the channel too"""
+
+    def test_rsvp_event(self):
+        owner = User.objects.create_user('+254700000001', 'owner@example.com', first_name='Owner')
+        squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=owner,
+                                     voter_registration_date=datetime.date(2027, 1, 15))
+        center = Center.objects.create(name='Kilimani Primary School', county='Nairobi', address='Kilimani')
+        event = Event.objects.create(squad=squad, center=center, datetime=timezone.now())
+        with mock.patch('events.realtime.publish') as publish:
+            rsvp = EventRSVP.objects.create(event=event, user=owner, status='yes')
+        channel, name, data = publish.call_args.args
+        self.assertEqual((channel, name), (f'squad:{squad.pk}', 'rsvp.updated'))
+        self.assertEqual(set(data), {'id', 'event', 'user', 'status', 'responded_at'})
+        self.assertEqual((data['user'], data['status']), (owner.pk, 'yes'))
+        self.assertNotIn('254700000001', json.dumps(data, default=str))
+        self.assertNotIn('Owner', json.dumps(data, default=str))
+
+
+class EventListQueriesTests(TestCase):
+    """Event lists read the RSVP counts and the user's RSVP from for_display(), not one query per event"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('+254700000001', 'owner@example.com')
+        self.client.force_authenticate(self.user)
+        self.squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=self.user,
+                                          voter_registration_date=datetime.date(2027, 1, 15))
+        SquadMember.objects.create(squad=self.squad, user=self.user)
+        self.center = Center.objects.create(name='Kilimani Primary School', county='Nairobi', address='Kilimani')
+
+    def add_events(self, count):
+        for _ in range(count):
+            event = Event.objects.create(squad=self.squad, center=self.center, datetime=timezone.now())
+            EventRSVP.objects.create(event=event, user=self.user, status='yes')
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_constant(self):
+        for url in ('/api/events/', '/api/events/?expand=rsvps'):
+            with self.subTest(url=url):
+                self.add_events(2)
+                few = self.queries(url)
+                self.add_events(4)
+                self.assertEqual(self.queries(url), few)
+
+    def test_counts(self):
+        self.add_events(1)
+        [event] = self.client.get('/api/events/').json()['results']
+        self.assertEqual((event['rsvp_count'], event['user_rsvp']['status']), (1, 'yes'))
+
+
+class ReminderTests(TestCase):
+    def test_rescheduled_reminder_is_sent_once(self):
+        owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=owner,
+                                     voter_registration_date=datetime.date(2027, 1, 15))
+        center = Center.objects.create(name='Kilimani Primary School', county='Nairobi', address='Kilimani')
+        event = Event.objects.create(squad=squad, center=center, datetime=timezone.now() + datetime.timedelta(hours=1))
+        EventRSVP.objects.create(event=event, user=owner, status='yes')
+        reminder = EventReminder.objects.get(event=event, status='pending')  # Due now: the event is close
+        self.assertEqual(dispatch_reminder(reminder.id), 1)
 
-# Create your tests here.
+        # Moved before the first dispatch's job ran: that job is dropped and the new dispatch sends
+        event.datetime += datetime.timedelta(minutes=30)
+        event.save()
+        self.assertEqual(dispatch_reminder(reminder.id), 1)
+        notifier = LocalNotifier()
+        with mock.patch('events.tasks.get_notifier', return_value=notifier):
+            Worker(name='test').run(burst=True)
+        self.assertEqual(notifier.outbox, [(owner.phone_number, mock.ANY)])
@@ -2,8 +2,9 @@ from rest_framework import status, generics, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
 from django.utils import timezone
+from core.async_views import apaginate, async_api_view
+from core.sparse import Fieldset, SparseFieldsetViewMixin, sparse_queryset
 from .models import Event, EventRSVP
 from .serializers import (
     EventSerializer, EventCreateSerializer,
@@ -11,17 +12,16 @@ from .serializers import (
 )
 
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for Event CRUD operations"""
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        # Users can see events from squads they're members of
-        return Event.objects.filter(
-            squad__members__user=user
-        ).distinct().prefetch_related('rsvps')
+        # Users can see events from squads they're members of (ordered explicitly: the RSVP
+        # count's GROUP BY drops Meta.ordering)
+        return Event.objects.for_member(user).order_by('datetime').for_display(user, self.fieldset)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -67,17 +67,30 @@ class EventRSVPViewSet(viewsets.ModelViewSet):
         return EventRSVPSerializer
 
 
-class UpcomingEventsView(generics.ListAPIView):
+class UpcomingEventsView(SparseFieldsetViewMixin, generics.ListAPIView):
     """Get upcoming events for user's squads"""
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        return Event.objects.filter(
-            squad__members__user=user,
+        return Event.objects.for_member(user).filter(
             datetime__gte=timezone.now()
-        ).distinct().order_by('datetime').prefetch_related('rsvps')
+        ).order_by('datetime').for_display(user, self.fieldset)
+
+
+@async_api_view()
+async def async_upcoming_events(request):
+    """Async UpcomingEventsView for ASGI deployments"""
+    user = request.user
+    context = {'request': request}
+    fieldset = Fieldset.from_request(request)
+    queryset = Event.objects.for_member(user).filter(
+        datetime__gte=timezone.now()
+    ).order_by('datetime').for_display(user, fieldset)
+    queryset = sparse_queryset(queryset, EventSerializer(many=True, context=context, fieldset=fieldset))
+    return await apaginate(request, queryset,
+                           lambda events: EventSerializer(events, many=True, context=context, fieldset=fieldset).data)
 
 
 class EventsBySquadView(generics.ListAPIView):
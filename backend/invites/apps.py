@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class InvitesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'invites'
+
+    def ready(self):
+        from core import metrics
+        from .models import Invite
+
+        metrics.INVITE_QUEUE_DEPTH.set_function(
+            lambda: Invite.objects.filter(status='sent', delivered_at__isnull=True).count()
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invites", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="invite",
+            index=models.Index(
+                fields=["inviter", "-sent_at"], name="invites_invite_inviter_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:06
+
+import core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invites", "0003_indexes"),
+    ]
+
+    # Only the Python-side default changes; on SQLite an AlterField of the
+    # primary key would copy the whole table
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name="invite",
+                name="id",
+                field=models.UUIDField(
+                    default=core.ids.uuid7,
+                    editable=False,
+                    primary_key=True,
+                    serialize=False,
+                ),
+            ),
+        ]),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invites", "0004_uuid7_ids"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="invite",
+            index=models.Index(
+                condition=models.Q(("delivered_at__isnull", True), ("status", "sent")),
+                fields=["sent_at"],
+                name="invites_invite_undelivered_idx",
+            ),
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.db import models
-import uuid
+from django.db.models import Q
+from core import outbox
+from core.ids import uuid7
 from django.conf import settings
 
 
-class Invite(models.Model):
+class Invite(outbox.DomainEvents, models.Model):
     """
     Invite model for tracking invitations sent via WhatsApp/SMS
+
+    Creating one records an ``invite.created`` outbox event (see core.outbox).
     """
     CHANNEL_CHOICES = [
         ('whatsapp', 'WhatsApp'),
@@ -18,7 +22,7 @@ class Invite(models.Model):
         ('failed', 'Failed'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     event = models.ForeignKey(
         'events.Event',
         on_delete=models.CASCADE,
@@ -46,5 +50,33 @@ class Invite(models.Model):
     def __str__(self):
         return f"Invite to {self.invitee_contact} via {self.channel}"
 
+    def county_key(self):
+        """``core.County`` id the invite counts under: its squad's, else its event's squad's, else the inviter's"""
+        if self.squad_id:
+            if Invite.squad.is_cached(self):
+                return self.squad.county_ref_id
+            rows, pk, path = Invite.squad.field.related_model.objects, self.squad_id, 'county_ref'
+        elif self.event_id:
+            rows, pk, path = Invite.event.field.related_model.objects, self.event_id, 'squad__county_ref'
+        else:
+            if Invite.inviter.is_cached(self):
+                return self.inviter.county_ref_id
+            rows, pk, path = Invite.inviter.field.related_model.objects, self.inviter_id, 'county_ref'
+        return rows.filter(pk=pk).values_list(path, flat=True).first()
+
+    def saved_events(self, created):
+        if not created:
+            return []
+        return [(outbox.INVITE_CREATED, {'invite': self.pk, 'squad': self.squad_id, 'event': self.event_id,
+                                         'inviter': self.inviter_id, 'county': self.county_key(),
+                                         'channel': self.channel, 'sent_at': self.sent_at})]
+
     class Meta:
         ordering = ['-sent_at']
+        indexes = [
+            # A user's sent invites, newest first
+            models.Index(fields=['inviter', '-sent_at'], name='invites_invite_inviter_idx'),
+            # Undelivered invites only: the invite_queue_depth gauge counts them on every scrape
+            models.Index(fields=['sent_at'], condition=Q(status='sent', delivered_at__isnull=True),
+                         name='invites_invite_undelivered_idx'),
+        ]
@@ -45,7 +45,8 @@ class WhatsAppInviteSerializer(serializers.Serializer):
     event_id = serializers.UUIDField(required=False)
     phone_numbers = serializers.ListField(
         child=serializers.CharField(max_length=15),
-        allow_empty=False
+        allow_empty=False,
+        max_length=settings.BULK_INVITE_MAX_RECIPIENTS
     )
 
     def validate(self, data):
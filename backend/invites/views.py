@@ -2,7 +2,9 @@ from rest_framework import status, generics, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.db.models import Q
+from core.throttling import InviteRateThrottle, UserRateThrottle
 from .models import Invite
 from .serializers import InviteSerializer, InviteCreateSerializer, WhatsAppInviteSerializer
 from squads.models import Squad
@@ -13,6 +15,7 @@ class InviteViewSet(viewsets.ModelViewSet):
     """ViewSet for Invite CRUD operations"""
     serializer_class = InviteSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserRateThrottle, InviteRateThrottle]
 
     def get_queryset(self):
         user = self.request.user
@@ -28,6 +31,7 @@ class WhatsAppInviteView(generics.CreateAPIView):
     """Generate and send WhatsApp invites"""
     serializer_class = WhatsAppInviteSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserRateThrottle, InviteRateThrottle]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -44,6 +48,7 @@ class WhatsAppInviteView(generics.CreateAPIView):
 class BulkInviteView(generics.CreateAPIView):
     """Send bulk invites via WhatsApp/SMS"""
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserRateThrottle, InviteRateThrottle]
 
     def create(self, request, *args, **kwargs):
         phone_numbers = request.data.get('phone_numbers', [])
@@ -57,6 +62,12 @@ class BulkInviteView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if not isinstance(phone_numbers, list) or len(phone_numbers) > settings.BULK_INVITE_MAX_RECIPIENTS:
+            return Response(
+                {'error': f'phone_numbers must be a list of at most {settings.BULK_INVITE_MAX_RECIPIENTS} numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         if not squad_id and not event_id:
             return Response(
                 {'error': 'Either squad_id or event_id is required'},
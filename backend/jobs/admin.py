@@ -0,0 +1,27 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin for Job model"""
+    list_display = ('task', 'status', 'priority', 'run_at', 'attempts', 'max_attempts', 'locked_by', 'created_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'last_error')
+    readonly_fields = ('created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error')
+    actions = ['requeue']
+
+    fieldsets = (
+        (None, {'fields': ('task', 'payload', 'status', 'priority', 'run_at')}),
+        ('Attempts', {'fields': ('attempts', 'max_attempts', 'last_error')}),
+        ('Worker', {'fields': ('locked_by', 'locked_at')}),
+        ('Timestamps', {'fields': ('created_at', 'finished_at')}),
+    )
+
+    @admin.action(description='Requeue selected jobs')
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), locked_by='', locked_at=None, finished_at=None
+        )
+        self.message_user(request, f'Requeued {count} jobs')
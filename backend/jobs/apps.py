@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+        from core import metrics
+        from .models import Job
+
+        # Register the @task functions in each app's tasks.py
+        autodiscover_modules('tasks')
+
+        metrics.JOBS_QUEUED.set_function(lambda: Job.objects.filter(status=Job.QUEUED).count())
@@ -0,0 +1,72 @@
+"""
+Run background job workers.
+
+    python manage.py run_jobs --processes 4
+
+Each process runs a ``jobs.worker.Worker``. The parent restarts workers that
+exit unexpectedly and forwards SIGTERM/SIGINT so every worker finishes its
+current job before exiting.
+"""
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import Worker
+
+
+def run_worker(options):
+    Worker(batch_size=options['batch_size'], poll_interval=options['poll_interval']).run(
+        burst=options['burst'], max_jobs=options['max_jobs']
+    )
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes (default: 1)')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per query (default: 10)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when no job is ready (default: 1)')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is ready')
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help='Exit after this many jobs (per process)')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            run_worker(options)
+            return
+
+        # Children are forked from this process; they must not share its connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stopping = False
+
+        def start(index):
+            process = context.Process(target=run_worker, args=(options,), name=f'jobs-worker-{index}')
+            process.start()
+            return process
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: finish the current job, then exit
+
+        workers = [start(index) for index in range(options['processes'])]
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f"Started {len(workers)} workers: {', '.join(str(p.pid) for p in workers)}")
+
+        while any(process.is_alive() for process in workers):
+            time.sleep(0.5)
+            for index, process in enumerate(workers):
+                finished = not process.is_alive()
+                if finished and not stopping and process.exitcode != 0 and not options['burst']:
+                    self.stderr.write(f'Worker {process.pid} exited with {process.exitcode}; restarting')
+                    workers[index] = start(index)
+        self.stdout.write('All workers stopped')
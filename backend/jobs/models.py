@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils import timezone
+from core.ids import uuid7
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by `manage.py run_jobs` workers.
+
+    Queued jobs run in order of priority (highest first), then run_at. A job
+    whose task raises is retried with exponential backoff until it has used
+    max_attempts, then it is dead-lettered (status "dead") for inspection and
+    can be requeued from the admin.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (DEAD, 'Dead'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    task = models.CharField(max_length=200, help_text="Registered task name")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not run before this time")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Claim query: status = 'queued' AND run_at <= now ORDER BY priority DESC, run_at
+            models.Index(fields=['status', '-priority', 'run_at'], name='jobs_job_claim_idx'),
+        ]
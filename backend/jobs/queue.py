@@ -0,0 +1,98 @@
+"""
+Task registry and enqueueing.
+
+Tasks are plain functions taking the job payload, registered with ``@task``
+in an app's ``tasks.py`` (discovered when the app registry is ready)::
+
+    from jobs.queue import task
+
+    @task(priority=5, max_attempts=3)
+    def send_invite(payload):
+        ...
+
+    send_invite.enqueue({'invite_id': str(invite.id)}, delay=60)
+
+Enqueueing inserts a row in the caller's transaction, so a job created
+inside ``transaction.atomic()`` only becomes visible to workers once the
+transaction commits, and disappears if it rolls back.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, payload):
+        return self.func(payload)
+
+    def enqueue(self, payload=None, **options):
+        return enqueue(self.name, payload, **options)
+
+    def enqueue_many(self, payloads, **options):
+        return enqueue_many(self.name, payloads, **options)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+
+def task(name=None, priority=0, max_attempts=None):
+    """Register a function as a task; it is called with the job payload"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        if task_name in TASKS and TASKS[task_name].func is not func:
+            raise ValueError(f'Task {task_name} is already registered')
+        registered = TASKS[task_name] = Task(func, task_name, priority, max_attempts)
+        return registered
+    return decorator
+
+
+def get_task(name):
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise LookupError(f'Unknown task {name}')
+
+
+def build_job(task_name, payload=None, *, run_at=None, delay=None, priority=None, max_attempts=None):
+    """
+    Unsaved Job for ``task_name``.
+
+    ``run_at`` (a datetime) or ``delay`` (seconds or a timedelta) schedule it
+    for later; ``priority`` and ``max_attempts`` default to the task's.
+    """
+    registered = get_task(task_name)
+    if run_at is None:
+        run_at = timezone.now()
+        if delay:
+            run_at += delay if isinstance(delay, timedelta) else timedelta(seconds=delay)
+    return Job(
+        task=task_name,
+        payload=payload or {},
+        run_at=run_at,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=max_attempts or registered.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def enqueue(task_name, payload=None, **options):
+    """Queue a job; see build_job for the options"""
+    job = build_job(task_name, payload, **options)
+    job.save(force_insert=True)
+    return job
+
+
+def enqueue_many(task_name, payloads, **options):
+    """Queue one job per payload with batched INSERTs"""
+    return Job.objects.bulk_create([build_job(task_name, payload, **options) for payload in payloads],
+                                   batch_size=1000)
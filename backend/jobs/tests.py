@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+from .worker import Worker
+
+calls = []
+
+
+@task(name='jobs.tests.record')
+def record(payload):
+    calls.append(payload)
+    if payload.get('fail'):
+        raise RuntimeError('failed')
+
+
+class WorkerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(name='test')
+
+    def reload(self, job):
+        job.refresh_from_db()
+        return job
+
+    def test_claim_in_priority_order(self):
+        low = record.enqueue({'n': 1})
+        high = record.enqueue({'n': 2}, priority=5)
+        record.enqueue({'n': 3}, delay=60)
+
+        claimed = self.worker.claim(10)
+        self.assertEqual([job.id for job in claimed], [high.id, low.id])
+        self.assertEqual({(job.status, job.attempts) for job in claimed}, {(Job.RUNNING, 1)})
+        self.assertEqual(Worker(name='other').claim(10), [])
+
+    def test_done(self):
+        job = record.enqueue({'n': 1})
+        self.worker.run(burst=True)
+        self.assertEqual(calls, [{'n': 1}])
+        self.assertEqual((self.reload(job).status, job.locked_at), (Job.DONE, None))
+
+    def test_retry_with_backoff(self):
+        job = record.enqueue({'fail': True}, max_attempts=2)
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.worker.run(burst=True)
+        job = self.reload(job)
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ''))
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+
+    def test_dead_letter(self):
+        job = record.enqueue({'fail': True}, max_attempts=2)
+        for _ in range(2):
+            Job.objects.filter(id=job.id).update(run_at=timezone.now())
+            with self.assertLogs('jobs.worker', 'WARNING'):
+                self.worker.run(burst=True)
+        job = self.reload(job)
+        self.assertEqual((job.status, job.attempts), (Job.DEAD, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_expired_lease_is_requeued(self):
+        job = record.enqueue({'n': 1})
+        [claimed] = self.worker.claim(1)
+        expired = timezone.now() - timedelta(seconds=settings.JOBS_LEASE_SECONDS + 1)
+        Job.objects.filter(id=job.id).update(locked_at=expired)
+
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.worker.maintain()
+            self.assertEqual((self.reload(job).status, job.locked_by), (Job.QUEUED, ''))
+            self.worker.run_job(claimed)  # The worker that lost the lease neither runs nor finishes it
+        self.assertEqual((calls, self.reload(job).status), ([], Job.QUEUED))
+
+    def test_lease_is_renewed_when_the_job_starts(self):
+        job = record.enqueue({'n': 1})
+        [claimed] = self.worker.claim(1)
+        waited = timezone.now() - timedelta(seconds=settings.JOBS_LEASE_SECONDS - 1)
+        Job.objects.filter(id=job.id).update(locked_at=waited)
+        self.assertTrue(self.worker.start(claimed))
+        self.assertGreater(self.reload(job).locked_at, waited)
+
+    def test_outcome_of_a_lost_lease_is_dropped(self):
+        job = record.enqueue({'n': 1}, max_attempts=1)
+        [claimed] = self.worker.claim(1)
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(seconds=settings.JOBS_LEASE_SECONDS + 1))
+        self.worker.maintain()  # Out of attempts: dead-lettered
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.worker.finish(claimed, status=Job.DONE, finished_at=timezone.now())
+        self.assertEqual(self.reload(job).status, Job.DEAD)
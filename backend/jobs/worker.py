@@ -0,0 +1,190 @@
+"""
+Job worker: claims queued jobs from the database and runs them.
+
+Claiming is safe with any number of worker processes:
+
+* on PostgreSQL (and other backends with ``SKIP LOCKED``) a batch of ready
+  rows is locked with ``SELECT ... FOR UPDATE SKIP LOCKED`` and marked
+  running in the same transaction, so concurrent workers never block on or
+  receive the same rows;
+* elsewhere (SQLite) a batch of candidate ids is read and marked running
+  with ``UPDATE ... WHERE status = 'queued'`` under a per-claim token.
+  Writes are serialized by the database, so each row is claimed by exactly
+  one worker, and the worker reads back the rows carrying its token.
+
+A claimed job holds a lease, renewed when the worker starts it, so jobs
+waiting behind a slow one in the batch keep theirs. Jobs whose worker died
+mid-run are requeued once the lease (``JOBS_LEASE_SECONDS``) expires; the
+interrupted attempt counts towards ``max_attempts``. A worker only records
+the outcome of a job it still holds, and skips a claimed job whose lease
+expired before it started.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import metrics
+from .models import Job
+from .queue import get_task
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds, after the given number of failed attempts"""
+    delay = min(settings.JOBS_RETRY_MAX_DELAY, settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    def __init__(self, name=None, batch_size=10, poll_interval=1.0):
+        self.name = (name or f'{socket.gethostname()}:{os.getpid()}')[:60]
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.last_maintenance = 0.0
+        self.processed = 0
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    # Claiming
+
+    def claim(self, limit):
+        now = timezone.now()
+        ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('-priority', 'run_at')
+        token = f'{self.name}:{uuid.uuid4().hex}'
+        claimed = {'status': Job.RUNNING, 'locked_by': token, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                ids = list(ready.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+                if not ids:
+                    return []
+                Job.objects.filter(id__in=ids).update(**claimed)
+        else:
+            ids = list(ready.values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            Job.objects.filter(id__in=ids, status=Job.QUEUED).update(**claimed)
+        return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('-priority', 'run_at'))
+
+    def release(self, jobs):
+        """Give claimed but unstarted jobs back to the queue without using up an attempt"""
+        for job in jobs:
+            Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+                status=Job.QUEUED, locked_by='', locked_at=None, attempts=F('attempts') - 1
+            )
+
+    # Running
+
+    def owned(self, job):
+        """The job's row, while this worker's claim on it is current"""
+        return Job.objects.filter(id=job.id, locked_by=job.locked_by, status=Job.RUNNING)
+
+    def start(self, job):
+        """Renew the job's lease; False when it expired and the job was requeued"""
+        if self.owned(job).update(locked_at=timezone.now()):
+            return True
+        logger.warning('Job %s (%s) lost its lease before it started', job.id, job.task)
+        return False
+
+    def finish(self, job, **fields):
+        if not self.owned(job).update(locked_at=None, **fields):
+            logger.warning('Job %s (%s) lost its lease while running; its outcome is dropped', job.id, job.task)
+
+    def run_job(self, job):
+        if not self.start(job):
+            return
+        started = time.perf_counter()
+        try:
+            get_task(job.task)(job.payload)
+        except Exception:
+            error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                logger.error('Job %s (%s) dead after %s attempts:\n%s', job.id, job.task, job.attempts, error)
+                self.finish(job, status=Job.DEAD, last_error=error, finished_at=timezone.now())
+                result = 'dead'
+            else:
+                delay = retry_delay(job.attempts)
+                logger.warning('Job %s (%s) failed, retrying in %.0fs:\n%s', job.id, job.task, delay, error)
+                self.finish(job, status=Job.QUEUED, last_error=error, locked_by='',
+                            run_at=timezone.now() + timedelta(seconds=delay))
+                result = 'retry'
+        else:
+            self.finish(job, status=Job.DONE, finished_at=timezone.now())
+            result = 'done'
+        metrics.JOB_DURATION.observe(time.perf_counter() - started, task=job.task)
+        metrics.JOBS_COMPLETED.inc(task=job.task, result=result)
+        self.processed += 1
+
+    # Housekeeping
+
+    def maintain(self):
+        """Requeue jobs whose lease expired and purge old finished jobs"""
+        now = timezone.now()
+        expired = Job.objects.filter(status=Job.RUNNING,
+                                     locked_at__lt=now - timedelta(seconds=settings.JOBS_LEASE_SECONDS))
+        expired.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.DEAD, last_error='Lease expired: the worker died or the job ran too long',
+            finished_at=now, locked_by='', locked_at=None
+        )
+        requeued = expired.update(status=Job.QUEUED, locked_by='', locked_at=None)
+        if requeued:
+            logger.warning('Requeued %s jobs with expired leases', requeued)
+
+        cutoff = now - timedelta(days=settings.JOBS_RETENTION_DAYS)
+        old = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).values_list('id', flat=True)[:5000]
+        Job.objects.filter(id__in=list(old)).delete()
+
+    def run(self, burst=False, max_jobs=None):
+        """
+        Process jobs until stopped (SIGTERM/SIGINT) or, with ``burst``, until
+        no job is ready. Stopping waits for the running job to finish.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        logger.info('Worker %s started', self.name)
+
+        while not self.stop_event.is_set():
+            close_old_connections()
+            try:
+                if time.monotonic() - self.last_maintenance >= settings.JOBS_MAINTENANCE_INTERVAL:
+                    self.last_maintenance = time.monotonic()
+                    self.maintain()
+                jobs = self.claim(self.batch_size)
+            except OperationalError as exc:
+                # SQLite: another worker holds the write lock for longer than the timeout
+                logger.warning('Could not claim jobs: %s', exc)
+                jobs = []
+
+            for index, job in enumerate(jobs):
+                if self.stop_event.is_set() or (max_jobs is not None and self.processed >= max_jobs):
+                    self.release(jobs[index:])
+                    break
+                self.run_job(job)
+            metrics.REGISTRY.maybe_flush()
+
+            if max_jobs is not None and self.processed >= max_jobs:
+                break
+            if not jobs:
+                # An empty claim can also mean another worker won the race for the ready rows
+                if burst and not Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now()).exists():
+                    break
+                self.stop_event.wait(self.poll_interval)
+
+        logger.info('Worker %s stopped after %s jobs', self.name, self.processed)
+        return self.processed
@@ -14,6 +14,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,9 +53,12 @@ INSTALLED_APPS = [
     'centers',
     'events',
     'invites',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -62,6 +67,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.idempotency.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'pamoja_vote.urls'
@@ -82,6 +88,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'pamoja_vote.wsgi.application'
+ASGI_APPLICATION = 'pamoja_vote.asgi.application'
+
+# Serve the hot read endpoints (public squads, upcoming events, centers by
+# county, my membership) from native async views. Enable under an ASGI server.
+ASYNC_READ_ENDPOINTS = os.getenv('ASYNC_READ_ENDPOINTS', 'False').lower() == 'true'
 
 
 # Database
@@ -126,8 +137,41 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserRateThrottle',
+        'core.throttling.AnonRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {},  # Set below
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
+}
+
+# Cache shared by all workers (throttle counters). Without CACHE_REDIS_URL
+# each process has its own local-memory cache.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+
+# Throttling (core.throttling): sliding windows counted in THROTTLE_CACHE.
+# Set THROTTLING=False to turn every limit off, e.g. for load tests from one address.
+THROTTLE_CACHE = 'default'
+THROTTLING = os.getenv('THROTTLING', 'True').lower() == 'true'
+THROTTLE_RATES = {
+    'user': '2000/hour',  # Any API request by a signed-in user
+    'anon': '600/hour',  # Any API request by an anonymous client IP (many users can share a carrier's IP)
+    'otp_send_phone': '5/hour',  # OTPs sent to one number (register, login)
+    'otp_send_ip': '60/hour',
+    'otp_verify_phone': '10/hour',  # OTP checks for one number (verify, password reset)
+    'otp_verify_ip': '120/hour',
+    'invites': '200/day',  # Invites per user; a bulk invite counts each recipient
 }
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = THROTTLE_RATES if THROTTLING else dict.fromkeys(THROTTLE_RATES)
+BULK_INVITE_MAX_RECIPIENTS = 100  # Phone numbers per bulk or WhatsApp invite request
 
 # Simple JWT settings
 SIMPLE_JWT = {
@@ -140,6 +184,8 @@ SIMPLE_JWT = {
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000,http://localhost:5173,http://127.0.0.1:5173,http://localhost:5174,http://127.0.0.1:5174').split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -167,10 +213,80 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Metrics (/metrics). Set METRICS_MULTIPROC_DIR to a directory shared by all
+# workers of a deployment so the endpoint reports totals across processes.
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # Required by scrapes; unset, only the local host may scrape
+
+# Release identifier (e.g. the commit hash); keys caches that only change on deploy
+CODE_VERSION = os.getenv('CODE_VERSION')
+
+# OpenAPI schema generated once per CODE_VERSION (`manage.py build_schema`)
+OPENAPI_SCHEMA_DIR = Path(os.getenv('OPENAPI_SCHEMA_DIR', BASE_DIR / 'openapi'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', '300'))
+
+# Background jobs (`manage.py run_jobs`)
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '5'))
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', '300'))  # Requeue running jobs after this
+JOBS_RETRY_BASE_DELAY = 10  # Seconds before the first retry, doubled for each further attempt
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_RETENTION_DAYS = 7  # Finished jobs are deleted after this; dead jobs are kept
+JOBS_MAINTENANCE_INTERVAL = 60
+
+# Domain event outbox (`manage.py run_consumers`, see core.outbox)
+OUTBOX_GAP_SECONDS = 600  # A missing event id is waited for until the event after it is this old
+OUTBOX_RETENTION_DAYS = 7  # Events every consumer has applied are deleted after this
+OUTBOX_MAINTENANCE_INTERVAL = 60
+
+# Event reminders (`manage.py schedule_reminders`): minutes before the event
+EVENT_REMINDER_OFFSETS = [24 * 60, 2 * 60]
+EVENT_REMINDER_BATCH_SIZE = 500  # Recipients per send job
+REMINDER_NOTIFIER = os.getenv('REMINDER_NOTIFIER', 'events.notifiers.LocalNotifier')
+
+# Realtime updates (Server-Sent Events at /api/realtime/, served under ASGI)
+REALTIME_BACKEND = os.getenv('REALTIME_BACKEND', 'core.pubsub.LocalBackend')
+REALTIME_REDIS_URL = os.getenv('REALTIME_REDIS_URL', 'redis://localhost:6379/0')
+REALTIME_HEARTBEAT = 20  # Seconds between keep-alive comments on an idle stream
+REALTIME_RETRY_MS = 5000  # Reconnect delay suggested to clients
+REALTIME_QUEUE_SIZE = 100  # Events buffered per stream before the client is told to resync
+REALTIME_MAX_SQUADS = 20  # Extra squads one stream may follow
+
+# Batch requests (/api/batch/)
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))  # Reads of one batch run at the same time
+
+# Delta sync (/api/sync/)
+SYNC_PAGE_SIZE = 500  # Changes per response
+SYNC_GAP_SECONDS = 120  # A missing change id is read again until the change after it is this old
+SYNC_RETENTION_DAYS = int(os.getenv('SYNC_RETENTION_DAYS', '30'))  # Tombstones kept; older tokens answer 410
+
+# Staff roster exports (/api/exports/rosters.csv): rows fetched and written per chunk
+ROSTER_EXPORT_CHUNK_SIZE = 2000
+
+# Nearest centers (/api/centers/nearby/): seconds before a process reloads the
+# in-memory center coordinates, so centers changed by other processes show up
+CENTER_INDEX_MAX_AGE = 300
+
+# Idempotency-Key on POST requests (core.idempotency)
+IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))  # Responses replayed to retries this long
+IDEMPOTENCY_LOCK_SECONDS = 60  # An attempt unfinished after this long is presumed lost, and a retry runs
+
+# Bundled Kenyan boundary files (counties, constituencies) shared with the frontend
+GEODATA_DIR = Path(os.getenv('GEODATA_DIR', BASE_DIR.parent / 'frontend' / 'public'))
+# Hashed, precompressed copies served at /geodata/ (`manage.py build_geodata`)
+GEODATA_BUILD_DIR = Path(os.getenv('GEODATA_BUILD_DIR', BASE_DIR / 'geodata'))
+
+# Response compression (core.compression); Brotli needs the `brotli` package
+COMPRESSION_MIN_SIZE = 1024  # Bytes; smaller responses are sent as is
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4  # Brotli's fast levels beat gzip at similar speed
+
 # Twilio settings
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_VERIFY_SID = os.getenv('TWILIO_VERIFY_SID')
+TWILIO_FROM_NUMBER = os.getenv('TWILIO_FROM_NUMBER')
 
 # Google Maps API Key
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
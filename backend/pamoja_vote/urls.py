@@ -21,15 +21,18 @@ from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-# Import Spectacular views for API documentation
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
-
 # Import viewsets for API documentation
 from users.views import RegisterView, LoginView, VerifyOTPView, ProfileView, LogoutView
-from squads.views import SquadViewSet, PublicSquadsView
-from centers.views import CenterViewSet
-from events.views import EventViewSet, UpcomingEventsView
-from invites.views import InviteViewSet
+from squads.views import SquadViewSet, DiscoverSquadsView, PublicSquadsView, RosterExportView, async_public_squads, async_my_membership
+from centers.views import CenterViewSet, CentersByCountyView, NearbyCentersView, async_centers_by_county
+from events.views import EventViewSet, UpcomingEventsView, async_upcoming_events
+from invites.views import InviteViewSet, WhatsAppInviteView, BulkInviteView
+from core.batch import batch_view
+from core.dashboard import CountyDashboardView
+from core.lazy import lazy_view
+from core.sync import SyncView
+from core.realtime import realtime_stream
+from core.views import geodata_manifest_view, geodata_view, metrics_view
 
 # API Router
 router = DefaultRouter()
@@ -38,8 +41,25 @@ router.register(r'centers', CenterViewSet, basename='center')
 router.register(r'events', EventViewSet, basename='event')
 router.register(r'invites', InviteViewSet, basename='invite')
 
+# Hot read endpoints have native async implementations for ASGI deployments
+if settings.ASYNC_READ_ENDPOINTS:
+    read_endpoints = [
+        path('api/public/squads/', async_public_squads, name='public_squads'),
+        path('api/events/upcoming/', async_upcoming_events, name='upcoming_events'),
+        path('api/centers/county/<str:county>/', async_centers_by_county, name='centers_by_county'),
+        path('api/squads/my_membership/', async_my_membership, name='squad-my-membership'),
+    ]
+else:
+    read_endpoints = [
+        path('api/public/squads/', PublicSquadsView.as_view(), name='public_squads'),
+        path('api/events/upcoming/', UpcomingEventsView.as_view(), name='upcoming_events'),
+        path('api/centers/county/<str:county>/', CentersByCountyView.as_view(), name='centers_by_county'),
+    ]
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('geodata/<str:name>', geodata_view, name='geodata'),
 
     # Authentication endpoints
     path('api/auth/register/', RegisterView.as_view(), name='register'),
@@ -49,15 +69,26 @@ urlpatterns = [
     path('api/auth/profile/', ProfileView.as_view(), name='profile'),
     path('api/auth/logout/', LogoutView.as_view(), name='logout'),
 
-    # API endpoints
+    # API endpoints (listed before the router so they are not taken for detail routes)
+    *read_endpoints,
+    path('api/realtime/', realtime_stream, name='realtime'),
+    path('api/batch/', batch_view, name='batch'),
+    path('api/sync/', SyncView.as_view(), name='sync'),
+    path('api/dashboard/counties/', CountyDashboardView.as_view(), name='county_dashboard'),
+    path('api/squads/discover/', DiscoverSquadsView.as_view(), name='discover_squads'),
+    path('api/centers/nearby/', NearbyCentersView.as_view(), name='nearby_centers'),
+    path('api/geodata/', geodata_manifest_view, name='geodata_manifest'),
+    path('api/exports/rosters.<str:extension>', RosterExportView.as_view(), name='roster_export'),
+    path('api/invites/whatsapp/', WhatsAppInviteView.as_view(), name='whatsapp_invite'),
+    path('api/invites/bulk/', BulkInviteView.as_view(), name='bulk_invite'),
     path('api/', include(router.urls)),
-    path('api/public/squads/', PublicSquadsView.as_view(), name='public_squads'),
-    path('api/events/upcoming/', UpcomingEventsView.as_view(), name='upcoming_events'),
 
-    # API Documentation
-    path('api/docs/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/docs/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    # API Documentation (schema generation is only imported when first requested)
+    path('api/docs/', lazy_view('core.schema.CachedSchemaView'), name='schema'),
+    path('api/docs/swagger/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'),
+         name='swagger-ui'),
+    path('api/docs/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'),
+         name='redoc'),
 ]
 
 # Serve media files in development
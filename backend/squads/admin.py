@@ -6,7 +6,7 @@ from .models import Squad, SquadMember
 class SquadAdmin(admin.ModelAdmin):
     """Admin for Squad model"""
     list_display = ('name', 'county', 'owner', 'max_members', 'member_count', 'registration_progress', 'is_public', 'created_at')
-    list_filter = ('county', 'is_public', 'created_at')
+    list_filter = ('county_ref', 'is_public', 'created_at')
     search_fields = ('name', 'description', 'owner__phone_number')
     readonly_fields = ('created_at', 'member_count', 'registration_progress')
 
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class SquadsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'squads'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save, pre_delete
+        from . import discovery, models
+        from .models import Squad, SquadMember
+        from .realtime import member_deleted, member_saved
+
+        post_save.connect(member_saved, sender=SquadMember, dispatch_uid='squads.realtime.member_saved')
+        post_delete.connect(member_deleted, sender=SquadMember, dispatch_uid='squads.realtime.member_deleted')
+        pre_delete.connect(models.squad_deleting, sender=Squad, dispatch_uid='squads.models.squad_deleting')
+        post_delete.connect(models.squad_deleted, sender=Squad, dispatch_uid='squads.models.squad_deleted')
+        post_save.connect(discovery.squad_saved, sender=Squad, dispatch_uid='squads.discovery.squad_saved')
+        pre_delete.connect(discovery.squad_deleting, sender=Squad, dispatch_uid='squads.discovery.squad_deleting')
+        post_delete.connect(discovery.squad_deleted, sender=Squad, dispatch_uid='squads.discovery.squad_deleted')
+        post_save.connect(discovery.member_changed, sender=SquadMember, dispatch_uid='squads.discovery.member_saved')
+        post_delete.connect(discovery.member_changed, sender=SquadMember, dispatch_uid='squads.discovery.member_deleted')
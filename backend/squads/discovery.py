@@ -0,0 +1,148 @@
+"""
+Squad discovery: public squads that still have room.
+
+    GET /api/squads/discover/?center=<id>
+    GET /api/squads/discover/?county=Nairobi&date_from=2026-11-01&date_to=2026-11-30
+    GET /api/squads/discover/?lat=-1.2864&lng=36.8172&radius_km=5
+
+``OpenSquad`` holds a row for each public squad with free slots, with its
+center, county, registration date and remaining slots, so a search is an
+index range scan rather than a count of every candidate squad's members.
+Saving a squad, or adding or removing a member, recounts that squad and
+inserts, updates or deletes its row in the same transaction. Writes that
+send no signals (``bulk_create``, ``QuerySet.update``) are caught up by
+``rebuild()``: ``manage.py rebuild_open_squads``, and ``generate_dataset``
+after loading.
+
+Results are ranked by remaining slots, squads without a limit first, then by
+registration date. A proximity search takes the centers within
+``radius_km`` from the in-memory center index (``centers.nearest``) and
+reports each squad's distance. ``SquadCreateSerializer.validate`` asks the
+same index for a squad to join instead of creating a duplicate.
+"""
+import threading
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from core.regions import in_county
+from .models import OpenSquad, Squad, SquadMember
+
+NEAR_CENTERS = 200  # Centers considered by a proximity search, nearest first
+
+_local = threading.local()
+
+
+def ranking(prefix=''):
+    """Most remaining slots (unlimited first), then soonest registration date"""
+    return (
+        F(f'{prefix}remaining_slots').desc(nulls_first=True),
+        F(f'{prefix}voter_registration_date').asc(nulls_last=True),
+    )
+
+
+def member_count(SquadMember):
+    members = SquadMember.objects.filter(squad=OuterRef('pk')).order_by().values('squad')
+    return Coalesce(Subquery(members.annotate(count=Count('*')).values('count')), 0)
+
+
+def opening(OpenSquad, squad, count):
+    """The OpenSquad row for a squad with ``count`` members, or None when it cannot be joined"""
+    if not squad['is_public'] or (squad['max_members'] is not None and count >= squad['max_members']):
+        return None
+    return OpenSquad(
+        squad_id=squad['id'], registration_center_id=squad['registration_center_id'], county=squad['county'],
+        county_ref_id=squad['county_ref_id'],
+        voter_registration_date=squad['voter_registration_date'], member_count=count,
+        remaining_slots=None if squad['max_members'] is None else squad['max_members'] - count,
+        created_at=squad['created_at'])
+
+
+SQUAD_FIELDS = ('id', 'is_public', 'max_members', 'registration_center_id', 'county', 'county_ref_id',
+                'voter_registration_date', 'created_at')
+UPDATED_FIELDS = ['registration_center', 'county', 'county_ref', 'voter_registration_date', 'member_count',
+                  'remaining_slots', 'created_at']
+
+
+def refresh(squad_id):
+    """Recount one squad and insert, update or delete its row"""
+    squad = Squad.objects.filter(pk=squad_id).annotate(_count=member_count(SquadMember)).values(
+        *SQUAD_FIELDS, '_count').first()
+    row = opening(OpenSquad, squad, squad['_count']) if squad is not None else None
+    if row is None:
+        OpenSquad.objects.filter(squad_id=squad_id).delete()
+    else:
+        OpenSquad.objects.bulk_create([row], update_conflicts=True, unique_fields=['squad'],
+                                      update_fields=UPDATED_FIELDS)
+
+
+def rebuild(get_model=apps.get_model, batch_size=5000):
+    """
+    Recompute every row from the squads and members tables. ``get_model``
+    is ``apps.get_model`` in a migration. Returns the number of open squads.
+    """
+    Squad = get_model('squads', 'Squad')
+    OpenSquad = get_model('squads', 'OpenSquad')
+    squads = Squad.objects.filter(is_public=True).annotate(_count=member_count(get_model('squads', 'SquadMember')))
+    squads = squads.filter(Q(max_members=None) | Q(max_members__gt=F('_count'))).order_by()
+    total = 0
+    with transaction.atomic():
+        OpenSquad.objects.all().delete()
+        batch = []
+        for squad in squads.values(*SQUAD_FIELDS, '_count').iterator(batch_size):
+            batch.append(opening(OpenSquad, squad, squad['_count']))
+            if len(batch) >= batch_size:
+                OpenSquad.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        OpenSquad.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+# Signal handlers (connected in SquadsConfig.ready)
+
+def squad_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh(instance.pk)
+
+
+def squad_deleting(sender, instance, **kwargs):
+    # Its members are deleted first; recounting them would re-add the row
+    _local.deleting = getattr(_local, 'deleting', set()) | {instance.pk}
+
+
+def squad_deleted(sender, instance, **kwargs):
+    getattr(_local, 'deleting', set()).discard(instance.pk)
+
+
+def member_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.squad_id not in getattr(_local, 'deleting', ()):
+        refresh(instance.squad_id)
+
+
+# Searches
+
+def search(center_ids=None, county=None, date_from=None, date_to=None, min_slots=None, exclude_user=None):
+    """Open squads matching every filter given, best ranked first"""
+    queryset = OpenSquad.objects.all()
+    if center_ids is not None:
+        queryset = queryset.filter(registration_center_id__in=center_ids)
+    if county:
+        queryset = in_county(queryset, county)
+    if date_from:
+        queryset = queryset.filter(voter_registration_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(voter_registration_date__lte=date_to)
+    if min_slots:
+        queryset = queryset.filter(Q(remaining_slots=None) | Q(remaining_slots__gte=min_slots))
+    if exclude_user is not None and exclude_user.is_authenticated:
+        queryset = queryset.exclude(squad__members__user=exclude_user)
+    return queryset.order_by(*ranking(), 'squad_id')
+
+
+def squad_to_join(center_id, voter_registration_date):
+    """The best open squad registering at a center on a date, or None"""
+    return search(center_ids=[center_id]).filter(voter_registration_date=voter_registration_date).select_related(
+        'squad', 'registration_center').first()
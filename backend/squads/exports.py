@@ -0,0 +1,127 @@
+"""
+Squad roster exports for campaign coordinators.
+
+Rows are read with ``values_list()`` (no model instances) through
+``.iterator(chunk_size=ROSTER_EXPORT_CHUNK_SIZE)``, so the database streams
+them through a cursor, and each chunk of rows is written out as one block of
+CSV or JSON Lines. Memory use is bounded by the chunk size however many rows
+the export has.
+"""
+import csv
+import io
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+from django.utils.text import slugify
+from rest_framework import exceptions
+
+from core.regions import county_filter
+from .models import SquadMember
+
+# (column name, lookup from SquadMember)
+COLUMNS = (
+    ('squad_id', 'squad_id'),
+    ('squad', 'squad__name'),
+    ('county', 'squad__county'),
+    ('registration_center', 'squad__registration_center__name'),
+    ('voter_registration_date', 'squad__voter_registration_date'),
+    ('phone_number', 'user__phone_number'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('role', 'role'),
+    ('has_registered', 'has_registered'),
+    ('joined_at', 'joined_at'),
+)
+HEADER = [name for name, _ in COLUMNS]
+
+
+def parse_filters(params):
+    """Queryset filters from the export's query parameters"""
+    filters = {}
+    if params.get('county'):
+        filters.update(county_filter(params['county'], prefix='squad__'))
+    if params.get('squad'):
+        try:
+            filters['squad_id'] = uuid.UUID(params['squad'])
+        except ValueError:
+            raise exceptions.ValidationError({'squad': ['Expected a squad id.']})
+    if params.get('has_registered') in ('true', 'false'):
+        filters['has_registered'] = params['has_registered'] == 'true'
+    for param, lookup in (('joined_after', 'joined_at__date__gte'), ('joined_before', 'joined_at__date__lte')):
+        if params.get(param):
+            value = parse_date(params[param])
+            if value is None:
+                raise exceptions.ValidationError({param: ['Expected a date (YYYY-MM-DD).']})
+            filters[lookup] = value
+    return filters
+
+
+def roster_queryset(filters):
+    return SquadMember.objects.filter(**filters).order_by('squad_id', 'joined_at').values_list(
+        *(lookup for _, lookup in COLUMNS)
+    )
+
+
+def roster_rows(filters):
+    return roster_queryset(filters).iterator(chunk_size=settings.ROSTER_EXPORT_CHUNK_SIZE)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Columns users type freely; ids, phone numbers, dates and flags are written as they are
+FREE_TEXT = [HEADER.index(name) for name in ('squad', 'county', 'registration_center', 'first_name', 'last_name')]
+
+
+def csv_cells(row):
+    """
+    The row with free text that a spreadsheet would run as a formula (a
+    squad named ``=HYPERLINK(...)``) quoted with a leading ``'``.
+    """
+    row = list(row)
+    for index in FREE_TEXT:
+        if isinstance(row[index], str) and row[index].startswith(FORMULA_PREFIXES):
+            row[index] = f"'{row[index]}"
+    return row
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for chunk in chunked(rows, settings.ROSTER_EXPORT_CHUNK_SIZE):
+        writer.writerows(map(csv_cells, chunk))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # Header of an empty export
+
+
+def jsonl_chunks(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for chunk in chunked(rows, settings.ROSTER_EXPORT_CHUNK_SIZE):
+        yield ''.join(encoder.encode(dict(zip(HEADER, row))) + '\n' for row in chunk).encode()
+
+
+FORMATS = {
+    'csv': (csv_chunks, 'text/csv; charset=utf-8'),
+    'jsonl': (jsonl_chunks, 'application/x-ndjson'),
+}
+
+
+def export_filename(extension, params):
+    scope = slugify(params.get('county') or params.get('squad') or 'all')
+    return f'rosters-{scope}-{date.today().isoformat()}.{extension}'
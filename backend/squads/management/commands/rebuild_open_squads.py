@@ -0,0 +1,26 @@
+"""
+Rebuild the open-squads index used by squad discovery.
+
+    python manage.py rebuild_open_squads
+
+The index is kept current as squads and members are saved; run this after
+bulk loads or other writes that send no signals, or to repair drift. See
+``squads.discovery``.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from squads import discovery
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the open squads index from the squads and members tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per batch')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = discovery.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Indexed {rows} open squads in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("squads", "0006_rename_goal_count_squad_max_members"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="squad",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="squadmember",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("squads", "0007_squad_updated_at_squadmember_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="squad",
+            index=models.Index(
+                fields=["registration_center", "voter_registration_date"],
+                name="squads_squad_center_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="squad",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["-created_at"],
+                name="squads_squad_public_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="squadmember",
+            index=models.Index(
+                fields=["user", "-joined_at"], name="squads_member_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="squadmember",
+            index=models.Index(
+                fields=["squad", "has_registered"], name="squads_member_registered_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0005_centerrecommendation"),
+        ("squads", "0008_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OpenSquad",
+            fields=[
+                (
+                    "squad",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="opening",
+                        serialize=False,
+                        to="squads.squad",
+                    ),
+                ),
+                ("county", models.CharField(max_length=50)),
+                ("voter_registration_date", models.DateField(blank=True, null=True)),
+                ("member_count", models.PositiveIntegerField()),
+                (
+                    "remaining_slots",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Empty when the squad has no limit",
+                        null=True,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(help_text="When the squad was created"),
+                ),
+                (
+                    "registration_center",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="centers.center",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["registration_center", "voter_registration_date"],
+                        name="squads_open_center_idx",
+                    ),
+                    models.Index(
+                        fields=["county", "voter_registration_date"],
+                        name="squads_open_county_idx",
+                    ),
+                    models.Index(
+                        fields=["voter_registration_date"], name="squads_open_date_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
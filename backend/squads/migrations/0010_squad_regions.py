@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from core.regions import backfill
+    from squads.discovery import rebuild
+    backfill(apps.get_model, models=[('squads', 'Squad')])
+    # Fills the open squads table added in 0009, now with county keys
+    rebuild(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0007_center_regions"),
+        ("core", "0005_regions"),
+        ("squads", "0009_opensquad"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="opensquad",
+            name="squads_open_county_idx",
+        ),
+        migrations.AddField(
+            model_name="opensquad",
+            name="county_ref",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="core.county",
+            ),
+        ),
+        migrations.AddField(
+            model_name="squad",
+            name="county_ref",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Set from county",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="squads",
+                to="core.county",
+                verbose_name="county",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="opensquad",
+            index=models.Index(
+                fields=["county_ref", "voter_registration_date"],
+                name="squads_open_county_idx",
+            ),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
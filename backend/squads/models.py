@@ -1,17 +1,62 @@
+import threading
+
 from django.db import models
-import uuid
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from core import outbox
+from core.ids import uuid7
+from core.regions import RegionFields
+
+
+class SquadQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+        Annotate member and registered counts so that member_count,
+        remaining_slots and registration_progress need no extra queries.
+
+        The counts are subqueries rather than a join with GROUP BY, so a
+        page of squads only counts the members of that page and can still
+        be read in index order (squads_squad_public_idx).
+        """
+        members = SquadMember.objects.filter(squad=OuterRef('pk')).order_by().values('squad')
+        return self.annotate(
+            _member_count=Coalesce(Subquery(members.annotate(count=Count('*')).values('count')), 0),
+            _registered_count=Coalesce(Subquery(
+                members.filter(has_registered=True).annotate(count=Count('*')).values('count')), 0),
+        )
 
+    def for_display(self, fieldset=None):
+        """
+        Everything SquadSerializer reads, in a single query. With a sparse
+        ``fieldset`` (see core.sparse) the member counts are only computed
+        when a field needs them, and members are prefetched when expanded.
+        """
+        queryset = self.select_related('owner', 'registration_center')
+        if fieldset is None or fieldset.includes('member_count', 'registration_progress', 'remaining_slots'):
+            queryset = queryset.with_stats()
+        if fieldset is not None and fieldset.expands('members'):
+            queryset = queryset.prefetch_related(
+                Prefetch('members', queryset=SquadMember.objects.select_related('user'))
+            )
+        return queryset
 
-class Squad(models.Model):
+
+class Squad(RegionFields, outbox.DomainEvents, models.Model):
     """
     Squad model for PamojaVote
+
+    A change of county is recorded as a ``squad.moved`` outbox event (see
+    core.outbox); the save is one transaction, which the county dashboard's
+    handler moving the squad's counts runs in.
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     max_members = models.PositiveIntegerField(help_text="Maximum number of members allowed in the squad", null=True, blank=True)
     county = models.CharField(max_length=50)
+    county_ref = models.ForeignKey('core.County', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                   related_name='squads', verbose_name='county', help_text="Set from county")
     is_public = models.BooleanField(default=True)
     voter_registration_date = models.DateField(
         help_text="Date when squad members should register to vote",
@@ -33,12 +78,25 @@ class Squad(models.Model):
         related_name='owned_squads'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SquadQuerySet.as_manager()
+
+    tracked_fields = ('county_ref_id',)
 
     def __str__(self):
         return self.name
 
+    def saved_events(self, created):
+        moved, previous = self.changed('county_ref_id')
+        if created or not moved:
+            return []
+        return [(outbox.SQUAD_MOVED, {'squad': self.pk, 'from': previous, 'to': self.county_ref_id})]
+
     @property
     def member_count(self):
+        if hasattr(self, '_member_count'):
+            return self._member_count
         return self.members.count()
 
     @property
@@ -53,23 +111,47 @@ class Squad(models.Model):
         """Calculate percentage of members who have confirmed registration"""
         if self.member_count == 0:
             return 0
-        confirmed_count = self.members.filter(has_registered=True).count()
+        if hasattr(self, '_registered_count'):
+            confirmed_count = self._registered_count
+        else:
+            confirmed_count = self.members.filter(has_registered=True).count()
         return (confirmed_count / self.member_count) * 100
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Duplicate-squad check in SquadCreateSerializer.validate: same center and date
+            models.Index(fields=['registration_center', 'voter_registration_date'], name='squads_squad_center_date_idx'),
+            # Public squad list, newest first; private squads are never listed by date
+            models.Index(fields=['-created_at'], condition=Q(is_public=True), name='squads_squad_public_idx'),
+        ]
+
+
+_local = threading.local()
+
+
+def squad_deleting(sender, instance, **kwargs):
+    # Its members are deleted first; their events read its county from here, not one query each
+    _local.counties = {**getattr(_local, 'counties', {}), instance.pk: instance.county_ref_id}
+
+
+def squad_deleted(sender, instance, **kwargs):
+    getattr(_local, 'counties', {}).pop(instance.pk, None)
 
 
-class SquadMember(models.Model):
+class SquadMember(outbox.DomainEvents, models.Model):
     """
     Squad member relationship model
+
+    Joining, leaving and (un)registering are recorded as outbox events (see
+    core.outbox).
     """
     ROLE_CHOICES = [
         ('member', 'Member'),
         ('leader', 'Leader'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -83,10 +165,73 @@ class SquadMember(models.Model):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='member')
     has_registered = models.BooleanField(default=False, help_text="Whether this member has registered to vote")
     joined_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    tracked_fields = ('has_registered',)
 
     def __str__(self):
         return f"{self.user.phone_number} - {self.squad.name} ({self.role})"
 
+    def event_payload(self):
+        deleting = getattr(_local, 'counties', {})
+        if SquadMember.squad.is_cached(self):
+            county = self.squad.county_ref_id
+        elif self.squad_id in deleting:
+            county = deleting[self.squad_id]
+        else:
+            county = Squad.objects.filter(pk=self.squad_id).values_list('county_ref', flat=True).first()
+        return {'member': self.pk, 'squad': self.squad_id, 'user': self.user_id, 'county': county,
+                'joined_at': self.joined_at,
+                'registered': self._meta.get_field('has_registered').to_python(self.has_registered)}
+
+    def saved_events(self, created):
+        if created:
+            return [(outbox.MEMBER_JOINED, self.event_payload())]
+        flipped, _ = self.changed('has_registered')
+        if not flipped:
+            return []
+        payload = self.event_payload()
+        return [(outbox.MEMBER_REGISTERED if payload['registered'] else outbox.MEMBER_UNREGISTERED, payload)]
+
+    def deleted_events(self):
+        return [(outbox.MEMBER_LEFT, self.event_payload())]
+
     class Meta:
         unique_together = ['user', 'squad']  # Users can only join each squad once
         ordering = ['-joined_at']
+        indexes = [
+            # A user's memberships, newest first (my_membership, my_squads)
+            models.Index(fields=['user', '-joined_at'], name='squads_member_user_idx'),
+            # Registered member counts per squad, read from the index alone
+            models.Index(fields=['squad', 'has_registered'], name='squads_member_registered_idx'),
+        ]
+
+
+class OpenSquad(models.Model):
+    """
+    A public squad that still has room (see squads.discovery).
+
+    Kept in step with squads and memberships, so that "which squads at this
+    center, in this county or on these dates can I still join?" is an index
+    lookup rather than a count of every candidate squad's members.
+    """
+    squad = models.OneToOneField(Squad, on_delete=models.CASCADE, primary_key=True, related_name='opening')
+    registration_center = models.ForeignKey('centers.Center', on_delete=models.SET_NULL, null=True, blank=True,
+                                            related_name='+')
+    county = models.CharField(max_length=50)
+    county_ref = models.ForeignKey('core.County', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    voter_registration_date = models.DateField(null=True, blank=True)
+    member_count = models.PositiveIntegerField()
+    remaining_slots = models.PositiveIntegerField(null=True, blank=True, help_text="Empty when the squad has no limit")
+    created_at = models.DateTimeField(help_text="When the squad was created")
+
+    def __str__(self):
+        return f"{self.squad_id} ({self.remaining_slots if self.remaining_slots is not None else 'unlimited'} slots)"
+
+    class Meta:
+        indexes = [
+            # Squads to join instead of creating one (SquadCreateSerializer.validate), and by center
+            models.Index(fields=['registration_center', 'voter_registration_date'], name='squads_open_center_idx'),
+            models.Index(fields=['county_ref', 'voter_registration_date'], name='squads_open_county_idx'),
+            models.Index(fields=['voter_registration_date'], name='squads_open_date_idx'),
+        ]
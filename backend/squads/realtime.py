@@ -0,0 +1,23 @@
+"""Publish membership changes to the realtime stream (see ``core.realtime``)"""
+from core.pubsub import publish
+from core.realtime import squad_channel, user_channel
+
+
+def member_data(member):
+    """Ids and flags only: phone numbers and names are read from the REST API"""
+    return {'id': member.id, 'user': member.user_id, 'role': member.role, 'has_registered': member.has_registered}
+
+
+def member_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    change = 'joined' if created else 'updated'
+    data = {'squad': instance.squad_id, 'member': member_data(instance)}
+    publish(squad_channel(instance.squad_id), f'member.{change}', data)
+    publish(user_channel(instance.user_id), f'membership.{change}', data)
+
+
+def member_deleted(sender, instance, **kwargs):
+    data = {'squad': instance.squad_id, 'member': instance.id}
+    publish(squad_channel(instance.squad_id), 'member.left', data)
+    publish(user_channel(instance.user_id), 'membership.left', data)
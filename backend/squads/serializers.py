@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.conf import settings
-from .models import Squad, SquadMember
+from core.sparse import SparseFieldsetMixin
+from .models import OpenSquad, Squad, SquadMember
 
 
-class SquadMemberSerializer(serializers.ModelSerializer):
+class SquadMemberSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for SquadMember model"""
     user = serializers.StringRelatedField(read_only=True)
 
@@ -13,7 +14,7 @@ class SquadMemberSerializer(serializers.ModelSerializer):
         read_only_fields = ('joined_at',)
 
 
-class CenterSerializer(serializers.ModelSerializer):
+class CenterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Center model"""
     class Meta:
         from centers.models import Center
@@ -21,10 +22,10 @@ class CenterSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'county', 'constituency', 'ward', 'address', 'lat', 'lng')
         read_only_fields = fields
 
-class SquadSerializer(serializers.ModelSerializer):
+class SquadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Squad model"""
     owner = serializers.StringRelatedField(read_only=True)
-    members = SquadMemberSerializer(source='squad_members', many=True, read_only=True)
+    members = SquadMemberSerializer(many=True, read_only=True)
     member_count = serializers.ReadOnlyField()
     registration_progress = serializers.ReadOnlyField()
     registration_center = CenterSerializer(read_only=True)
@@ -36,11 +37,57 @@ class SquadSerializer(serializers.ModelSerializer):
                  'is_public', 'voter_registration_date', 'owner', 'members', 'member_count',
                  'registration_progress', 'registration_center', 'remaining_slots', 'created_at')
         read_only_fields = ('id', 'owner', 'created_at', 'member_count', 'registration_progress', 'remaining_slots')
+        expandable_fields = ('members',)  # Only with ?expand=members
+        # What the computed fields read (annotations from with_stats(), else the members prefetch)
+        sparse_sources = {
+            'member_count': ('_member_count', 'members'),
+            'registration_progress': ('_member_count', '_registered_count', 'members'),
+            'remaining_slots': ('max_members', '_member_count', 'members'),
+        }
 
     def create(self, validated_data):
         validated_data['owner'] = self.context['request'].user
         return super().create(validated_data)
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'members' in data and not self.is_member(instance):
+            # Members' phone numbers and names are only shown within the squad
+            for member in data['members']:
+                member.pop('user', None)
+        return data
+
+    def is_member(self, squad):
+        """Whether the requesting user is in ``squad`` (or staff); reads the members prefetch"""
+        user = getattr(self.context.get('request'), 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        return user.is_staff or any(member.user_id == user.pk for member in squad.members.all())
+
+
+class SquadSyncSerializer(serializers.ModelSerializer):
+    """Squad as delivered by /api/sync/: related rows by id, counts from with_stats()"""
+    member_count = serializers.ReadOnlyField()
+    registration_progress = serializers.ReadOnlyField()
+    remaining_slots = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Squad
+        fields = ('id', 'name', 'description', 'max_members', 'county', 'is_public',
+                 'voter_registration_date', 'owner', 'registration_center', 'member_count',
+                 'registration_progress', 'remaining_slots', 'created_at', 'updated_at')
+        read_only_fields = fields
+
+
+class SquadMemberSyncSerializer(serializers.ModelSerializer):
+    """SquadMember as delivered by /api/sync/"""
+    user_display = serializers.StringRelatedField(source='user', read_only=True)
+
+    class Meta:
+        model = SquadMember
+        fields = ('id', 'squad', 'user', 'user_display', 'role', 'has_registered', 'joined_at', 'updated_at')
+        read_only_fields = fields
+
 
 class SquadCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating a new squad"""
@@ -74,70 +121,42 @@ class SquadCreateSerializer(serializers.ModelSerializer):
         voter_registration_date = data.get('voter_registration_date')
         
         if registration_center_data and voter_registration_date:
-            from .models import Squad
             from centers.models import Center
-            
-            print(f"DEBUG: Validating squad creation - center data: {registration_center_data}, date: {voter_registration_date}")
-            
+            from .discovery import squad_to_join
+
             # Handle different formats of registration center data
             center_id = None
-            
+
             if isinstance(registration_center_data, str):
                 # If it's a UUID string, use it directly
-                try:
-                    center_id = registration_center_data
-                    print(f"DEBUG: Using center ID from string: {center_id}")
-                except (ValueError, TypeError):
-                    center_id = None
-                    
+                center_id = registration_center_data
+
             elif isinstance(registration_center_data, dict):
-                # If it's a dictionary, try to find or create the center first
+                # If it's a dictionary, look for an existing center (it is created with the squad)
                 center_name = registration_center_data.get('name')
                 county = registration_center_data.get('county')
-                
+
                 if center_name and county:
-                    # Try to find existing center
                     center = Center.objects.filter(
                         name__iexact=center_name,
                         county__iexact=county
                     ).first()
-                    
                     if center:
                         center_id = str(center.id)
-                        print(f"DEBUG: Found existing center: {center.name} (ID: {center_id})")
-                    else:
-                        # For validation purposes, we can't create the center here
-                        # but we need to check if a similar center exists
-                        print(f"DEBUG: Center not found, will create during squad creation")
-            
-            # Check for existing squads with the same center and date
+
+            # A public squad for the same center and date that still has room
             if center_id:
-                print(f"DEBUG: Checking for existing squads with center ID: {center_id}")
-                existing_squads = Squad.objects.filter(
-                    registration_center_id=center_id,
-                    voter_registration_date=voter_registration_date
-                )
-                
-                print(f"DEBUG: Found {existing_squads.count()} existing squads")
-                for squad in existing_squads:
-                    print(f"DEBUG: Existing squad: {squad.name}, remaining slots: {squad.remaining_slots}")
-                    if squad.remaining_slots is None or squad.remaining_slots > 0:
-                        # Get center information for the error message
-                        try:
-                            center = Center.objects.get(id=center_id)
-                            center_name = center.name
-                        except Center.DoesNotExist:
-                            center_name = "Unknown Center"
-                        
-                        raise serializers.ValidationError({
-                            'non_field_errors': [
-                                f'A squad "{squad.name}" already exists for {center_name} on {voter_registration_date} '
-                                f'with available slots. Please join "{squad.name}" instead of creating a new squad.'
-                            ]
-                        })
-            else:
-                print("DEBUG: No center ID found for validation")
-        
+                opening = squad_to_join(center_id, voter_registration_date)
+                if opening is not None:
+                    squad = opening.squad
+                    center_name = opening.registration_center.name if opening.registration_center else "Unknown Center"
+                    raise serializers.ValidationError({
+                        'non_field_errors': [
+                            f'A squad "{squad.name}" already exists for {center_name} on {voter_registration_date} '
+                            f'with available slots. Please join "{squad.name}" instead of creating a new squad.'
+                        ]
+                    })
+
         return data
         
     def validate_registration_center(self, value):
@@ -300,10 +319,50 @@ class SquadJoinSerializer(serializers.Serializer):
         return SquadMember.objects.create(user=user, squad=squad, role='member')
 
 
+class OpenSquadSerializer(serializers.ModelSerializer):
+    """A squad found by /api/squads/discover/ (see squads.discovery)"""
+    id = serializers.UUIDField(source='squad_id', read_only=True)
+    name = serializers.CharField(source='squad.name', read_only=True)
+    description = serializers.CharField(source='squad.description', read_only=True)
+    max_members = serializers.IntegerField(source='squad.max_members', read_only=True)
+    registration_center = CenterSerializer(read_only=True)
+    distance = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OpenSquad
+        fields = ('id', 'name', 'description', 'county', 'voter_registration_date', 'member_count',
+                  'max_members', 'remaining_slots', 'registration_center', 'distance', 'created_at')
+        read_only_fields = fields
+
+    def get_distance(self, obj):
+        """Kilometres to the squad's center, for proximity searches"""
+        distance = self.context.get('distances', {}).get(obj.registration_center_id)
+        return round(distance, 2) if distance is not None else None
+
+
+class DiscoverQuerySerializer(serializers.Serializer):
+    """Query parameters of /api/squads/discover/"""
+    center = serializers.UUIDField(required=False)
+    county = serializers.CharField(required=False, max_length=50)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    min_slots = serializers.IntegerField(required=False, min_value=1)
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lng = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, default=10, min_value=0.1, max_value=100)
+
+    def validate(self, data):
+        if ('lat' in data) != ('lng' in data):
+            raise serializers.ValidationError("Pass both lat and lng, or neither.")
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({'date_to': 'Must not be before date_from.'})
+        return data
+
+
 class SquadLeaderboardSerializer(serializers.Serializer):
     """Serializer for squad leaderboard"""
     county = serializers.CharField()
-    squad_name = serializers.CharField()
+    squad_name = serializers.CharField(source='name')
     member_count = serializers.IntegerField()
     registration_progress = serializers.FloatField()
     created_at = serializers.DateTimeField()
@@ -1,3 +1,232 @@
+import datetime
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from centers.models import Center
+from core import outbox, regions
+from core.models import OutboxEvent
+from core.realtime import owned_squads
+from users.models import User
+from . import discovery
+from .exports import csv_chunks
+from .models import OpenSquad, Squad, SquadMember
+
+
+class ExpandMembersTests(TestCase):
+    """Members' phone numbers and names are only shown to the squad's own members"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        cls.outsider = User.objects.create_user('+254700000002', 'outsider@example.com')
+        cls.squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=cls.owner,
+                                         voter_registration_date=datetime.date(2027, 1, 15))
+        SquadMember.objects.create(squad=cls.squad, user=cls.owner, role='leader')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def members(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        squads = data['results'] if 'results' in data else [data]
+        return [member for squad in squads for member in squad['members']]
+
+    def test_anonymous(self):
+        members = self.members(self.client.get('/api/public/squads/?expand=members&fields=id,members'))
+        self.assertEqual(len(members), 1)
+        self.assertNotIn('user', members[0])
+
+    def test_outsider(self):
+        self.client.force_authenticate(self.outsider)
+        members = self.members(self.client.get(f'/api/squads/{self.squad.pk}/?expand=members'))
+        self.assertNotIn('user', members[0])
+
+    def test_member(self):
+        self.client.force_authenticate(self.owner)
+        members = self.members(self.client.get(f'/api/squads/{self.squad.pk}/?expand=members'))
+        self.assertEqual(members[0]['user'], str(self.owner))
+
+
+class SquadListQueriesTests(TestCase):
+    """Squad lists read the member counts from with_stats(), not one query per squad"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('+254700000001', 'owner@example.com')
+        self.client.force_authenticate(self.user)
+
+    def add_squads(self, count):
+        for n in range(count):
+            squad = Squad.objects.create(name=f'Squad {n}', county='Nairobi', owner=self.user,
+                                         voter_registration_date=datetime.date(2027, 1, 15))
+            SquadMember.objects.create(squad=squad, user=self.user, has_registered=True)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_constant(self):
+        for url in ('/api/squads/', '/api/squads/?expand=members'):
+            with self.subTest(url=url):
+                self.add_squads(2)
+                few = self.queries(url)
+                self.add_squads(4)
+                self.assertEqual(self.queries(url), few)
+
+    def test_counts(self):
+        self.add_squads(1)
+        [squad] = self.client.get('/api/squads/').json()['results']
+        self.assertEqual((squad['member_count'], squad['registration_progress']), (1, 100))
+        self.assertNotIn('members', squad)
+
+    def test_leaderboard(self):
+        url = '/api/squads/leaderboard/?county=Nairobi'
+        self.add_squads(2)
+        few = self.queries(url)
+        self.add_squads(4)
+        self.assertEqual(self.queries(url), few)
+        board = self.client.get(url).json()
+        self.assertEqual(len(board), 6)
+        self.assertEqual({(row['member_count'], row['registration_progress']) for row in board}, {(1, 100)})
+
+
+class MemberRealtimeTests(TestCase):
+    """Realtime member events carry no phone numbers and only reach the squad"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        cls.joiner = User.objects.create_user('+254700000002', 'joiner@example.com')
+        cls.squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=cls.owner,
+                                         voter_registration_date=datetime.date(2027, 1, 15))
+
+    def test_member_event(self):
+        with mock.patch('squads.realtime.publish') as publish:
+            member = SquadMember.objects.create(squad=self.squad, user=self.joiner)
+        channel, event, data = publish.call_args_list[0].args
+        self.assertEqual((channel, event), (f'squad:{self.squad.pk}', 'member.joined'))
+        self.assertEqual(data['member'], {'id': member.pk, 'user': self.joiner.pk, 'role': 'member',
+                                          'has_registered': False})
+
+    def test_requested_squads(self):
+        self.assertEqual(async_to_sync(owned_squads)(self.owner, {self.squad.pk}), {self.squad.pk})
+        self.assertEqual(async_to_sync(owned_squads)(self.joiner, {self.squad.pk}), set())
+
+
+class SquadDeleteTests(TestCase):
+    def test_members_left_with_the_squads_county(self):
+        owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        squad = Squad.objects.create(name='Kilimani', county='Nairobi', owner=owner,
+                                     voter_registration_date=datetime.date(2027, 1, 15))
+        for i in range(3):
+            user = User.objects.create_user(f'+25470000001{i}', f'member{i}@example.com')
+            SquadMember.objects.create(squad=squad, user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            Squad.objects.get(pk=squad.pk).delete()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "squads_squad"."county_ref_id"')])
+        left = OutboxEvent.objects.filter(name=outbox.MEMBER_LEFT)
+        self.assertEqual([event.payload['county'] for event in left], [squad.county_ref_id] * 3)
+
+
+class RosterExportTests(TestCase):
+    def test_formulas_are_quoted(self):
+        row = ('id', '=HYPERLINK("http://example.com")', 'Nairobi', '@center', None, '+254700000001', '-Amina',
+               'Otieno', 'member', True, None)
+        exported = b''.join(csv_chunks([row])).decode().splitlines()[1]
+        self.assertEqual(exported, 'id,"\'=HYPERLINK(""http://example.com"")",Nairobi,\'@center,,+254700000001,'
+                                   '\'-Amina,Otieno,member,True,')
+
+
+class DiscoveryTests(TestCase):
+    """OpenSquad rows follow squads and members; /api/squads/discover/ searches them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        if regions.resolver().county('Nairobi') is None:
+            regions.seed()
+        cls.owner = User.objects.create_user('+254700000001', 'owner@example.com')
+        cls.users = [User.objects.create_user(f'+25470000001{n}', f'user{n}@example.com') for n in range(3)]
+        cls.kilimani = Center.objects.create(name='Kilimani Primary School', county='Nairobi', address='Kilimani',
+                                             lat='-1.29000000', lng='36.78000000')
+        cls.tononoka = Center.objects.create(name='Tononoka Hall', county='Mombasa', address='Tononoka',
+                                             lat='-4.05000000', lng='39.66000000')
+
+    def create_squad(self, center, max_members=2, **fields):
+        return Squad.objects.create(name=center.name, county=center.county, owner=self.owner, is_public=True,
+                                    max_members=max_members, registration_center=center,
+                                    voter_registration_date=datetime.date(2027, 1, 15), **fields)
+
+    def remaining_slots(self, squad):
+        return OpenSquad.objects.filter(squad=squad).values_list('remaining_slots', flat=True).first()
+
+    def test_kept_in_step(self):
+        squad = self.create_squad(self.kilimani)
+        self.assertEqual(self.remaining_slots(squad), 2)
+        SquadMember.objects.create(squad=squad, user=self.users[0])
+        self.assertEqual(self.remaining_slots(squad), 1)
+        member = SquadMember.objects.create(squad=squad, user=self.users[1])
+        self.assertIsNone(self.remaining_slots(squad))  # Full
+
+        member.delete()  # Leaving frees a slot
+        self.assertEqual(self.remaining_slots(squad), 1)
+        squad.is_public = False
+        squad.save()
+        self.assertFalse(OpenSquad.objects.filter(squad=squad).exists())
+
+    def test_deleting_a_squad(self):
+        squad = self.create_squad(self.kilimani, max_members=5)
+        SquadMember.objects.create(squad=squad, user=self.users[0])
+        with mock.patch.object(discovery, 'refresh', wraps=discovery.refresh) as refresh:
+            squad.delete()
+        # Its members go first, and recounting the squad for each would re-add its row
+        refresh.assert_not_called()
+        self.assertFalse(OpenSquad.objects.exists())
+        self.assertEqual(discovery._local.deleting, set())
+
+    def test_rebuild(self):
+        squad = self.create_squad(self.kilimani)
+        full = self.create_squad(self.tononoka, max_members=1)
+        # bulk_create and update() send no signals
+        SquadMember.objects.bulk_create([SquadMember(squad=squad, user=self.users[0]),
+                                         SquadMember(squad=full, user=self.users[1])])
+        Squad.objects.filter(pk=squad.pk).update(max_members=None)
+        self.assertEqual(OpenSquad.objects.count(), 2)
+
+        self.assertEqual(discovery.rebuild(), 1)
+        opening = OpenSquad.objects.get()
+        self.assertEqual((opening.squad_id, opening.member_count, opening.remaining_slots), (squad.pk, 1, None))
+
+    def test_proximity(self):
+        kilimani = self.create_squad(self.kilimani)
+        self.create_squad(self.tononoka)
+        client = APIClient()
+        results = client.get('/api/squads/discover/?lat=-1.2864&lng=36.8172&radius_km=10').json()['results']
+        self.assertEqual([squad['id'] for squad in results], [str(kilimani.pk)])
+        self.assertLess(results[0]['distance'], 10)
+        self.assertEqual(client.get('/api/squads/discover/?lat=-1.2864&lng=36.8172&radius_km=1').json()['results'], [])
+
+        # Within the radius, and neither another center nor a squad the user is in
+        nearby = f'/api/squads/discover/?lat=-1.2864&lng=36.8172&center={self.tononoka.pk}'
+        self.assertEqual(client.get(nearby).json()['results'], [])
+        SquadMember.objects.create(squad=kilimani, user=self.users[0])
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.get('/api/squads/discover/?lat=-1.2864&lng=36.8172').json()['results'], [])
 
-# Create your tests here.
+    def test_filters(self):
+        nairobi = self.create_squad(self.kilimani, max_members=None)
+        mombasa = self.create_squad(self.tononoka, max_members=5)
+        client = APIClient()
+        self.assertEqual([squad['id'] for squad in client.get('/api/squads/discover/').json()['results']],
+                         [str(nairobi.pk), str(mombasa.pk)])  # Unlimited first
+        in_mombasa = client.get('/api/squads/discover/?county=MOMBASA').json()['results']
+        self.assertEqual([squad['id'] for squad in in_mombasa], [str(mombasa.pk)])
+        self.assertEqual(client.get('/api/squads/discover/?min_slots=6').json()['results'][0]['id'], str(nairobi.pk))
+        self.assertEqual(client.get('/api/squads/discover/?lat=-1.2').status_code, 400)
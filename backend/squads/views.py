@@ -1,27 +1,39 @@
+import logging
+
 from rest_framework import status, generics, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.views import APIView
-from django.db.models import Count, Q
+from django.db.models import Q
+from core import metrics
+from core.async_views import apaginate, async_api_view
+from core.regions import in_county
+from core.sparse import Fieldset, SparseFieldsetViewMixin, sparse_queryset
+from core.streaming import streaming_response
+from . import discovery
+from .exports import FORMATS, export_filename, parse_filters, roster_rows
 from .models import Squad, SquadMember
 from .serializers import (
-    SquadSerializer, SquadCreateSerializer, SquadJoinSerializer,
-    SquadLeaderboardSerializer, SquadMemberSerializer
+    DiscoverQuerySerializer, OpenSquadSerializer, SquadSerializer, SquadCreateSerializer,
+    SquadJoinSerializer, SquadLeaderboardSerializer, SquadMemberSerializer
 )
 
+logger = logging.getLogger(__name__)
+
 
-class SquadViewSet(viewsets.ModelViewSet):
+class SquadViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for Squad CRUD operations"""
     serializer_class = SquadSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        # Users can see public squads and squads they're members of
+        # Users can see public squads and squads they're members of (a subquery, so no DISTINCT)
         return Squad.objects.filter(
-            Q(is_public=True) | Q(owner=user) | Q(members__user=user)
-        ).distinct().prefetch_related('members')
+            Q(is_public=True) | Q(owner=user) | Q(pk__in=SquadMember.objects.filter(user=user).values('squad'))
+        ).for_display(self.fieldset)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -39,6 +51,7 @@ class SquadViewSet(viewsets.ModelViewSet):
         # Check if user is already a member of another squad (but allow joining their own squad)
         existing_membership = SquadMember.objects.filter(user=request.user).first()
         if existing_membership and existing_membership.squad != squad:
+            metrics.SQUAD_JOIN_CONFLICTS.inc(reason='other_squad')
             return Response(
                 {'error': f'You are already a member of "{existing_membership.squad.name}". Leave that squad first to join another.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -46,12 +59,15 @@ class SquadViewSet(viewsets.ModelViewSet):
 
         # If user is the owner, they don't need to join - they're already the leader
         if squad.owner == request.user:
+            metrics.SQUAD_JOIN_CONFLICTS.inc(reason='owner')
             return Response(
                 {'error': 'You are the owner of this squad and cannot join it as a member.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         serializer = SquadJoinSerializer(data={'squad_id': pk}, context={'request': request})
+        if not serializer.is_valid():
+            metrics.SQUAD_JOIN_CONFLICTS.inc(reason='invalid')
         serializer.is_valid(raise_exception=True)
 
         # Override squad_id with the URL parameter
@@ -122,14 +138,13 @@ class SquadViewSet(viewsets.ModelViewSet):
         """Get squad leaderboard by county"""
         county = request.query_params.get('county')
 
-        squads = Squad.objects.annotate(
-            member_count=Count('members')
-        ).filter(
-            member_count__gt=0
-        ).order_by('-member_count')
+        # registration_progress reads the counts annotated by with_stats()
+        squads = Squad.objects.with_stats().filter(
+            _member_count__gt=0
+        ).order_by('-_member_count').only('name', 'county', 'created_at')
 
         if county:
-            squads = squads.filter(county=county)
+            squads = in_county(squads, county)
 
         serializer = SquadLeaderboardSerializer(squads, many=True)
         return Response(serializer.data)
@@ -188,10 +203,75 @@ class SquadMemberViewSet(viewsets.ModelViewSet):
         })
 
 
-class PublicSquadsView(generics.ListAPIView):
+class PublicSquadsView(SparseFieldsetViewMixin, generics.ListAPIView):
     """List all public squads"""
     serializer_class = SquadSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return Squad.objects.filter(is_public=True).prefetch_related('members')
+        return Squad.objects.filter(is_public=True).for_display(self.fieldset)
+
+
+class DiscoverSquadsView(generics.ListAPIView):
+    """Public squads with free slots by center, county, date window or proximity (see squads.discovery)"""
+    serializer_class = OpenSquadSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        params = DiscoverQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        center_ids = [params['center']] if 'center' in params else None
+        self.distances = {}
+        if 'lat' in params:
+            from centers.nearest import get_index
+
+            nearest = get_index().nearest(params['lat'], params['lng'], discovery.NEAR_CENTERS)
+            self.distances = {center_id: km for center_id, km in nearest if km <= params['radius_km']}
+            center_ids = list(self.distances) if center_ids is None else \
+                [center_id for center_id in center_ids if center_id in self.distances]
+        return discovery.search(
+            center_ids=center_ids, county=params.get('county'), date_from=params.get('date_from'),
+            date_to=params.get('date_to'), min_slots=params.get('min_slots'),
+            exclude_user=self.request.user).select_related('squad', 'registration_center')
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'distances': getattr(self, 'distances', {})}
+
+
+@async_api_view(allow_anonymous=True)
+async def async_public_squads(request):
+    """Async PublicSquadsView for ASGI deployments"""
+    fieldset = Fieldset.from_request(request)
+    serializer = SquadSerializer(many=True, fieldset=fieldset)
+    queryset = sparse_queryset(Squad.objects.filter(is_public=True).for_display(fieldset), serializer)
+    return await apaginate(request, queryset, lambda squads: SquadSerializer(squads, many=True, fieldset=fieldset).data)
+
+
+@async_api_view()
+async def async_my_membership(request):
+    """Async SquadViewSet.my_membership for ASGI deployments"""
+    membership = await SquadMember.objects.filter(user=request.user).select_related('squad').afirst()
+    if membership:
+        membership.user = request.user
+        return SquadMemberSerializer(membership).data
+    return {'message': 'Not a member of any squad'}
+
+
+class RosterExportView(APIView):
+    """
+    Stream squad rosters (members, phone numbers, registration status) as
+    CSV or JSON Lines. Staff only. Filters: county, squad, has_registered,
+    joined_after, joined_before.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, extension):
+        if extension not in FORMATS:
+            raise NotFound()
+        filters = parse_filters(request.query_params)
+        logger.info('Roster export by user %s: %s', request.user.pk, request.query_params.urlencode())
+        write, content_type = FORMATS[extension]
+        return streaming_response(request, write(roster_rows(filters)), content_type,
+                                  export_filename(extension, request.query_params))
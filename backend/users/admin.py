@@ -7,7 +7,7 @@ from .models import User
 class CustomUserAdmin(UserAdmin):
     """Custom admin for User model"""
     list_display = ('phone_number', 'email', 'first_name', 'last_name', 'county', 'is_active', 'created_at')
-    list_filter = ('is_active', 'county', 'created_at')
+    list_filter = ('is_active', 'county_ref', 'created_at')
     search_fields = ('phone_number', 'email', 'first_name', 'last_name')
     ordering = ('-created_at',)
 
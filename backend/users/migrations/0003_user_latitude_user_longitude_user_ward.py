@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:46
+
+import decimal
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_alter_user_managers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="latitude",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=8,
+                max_digits=10,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(decimal.Decimal("-90")),
+                    django.core.validators.MaxValueValidator(decimal.Decimal("90")),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="longitude",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=8,
+                max_digits=11,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(decimal.Decimal("-180")),
+                    django.core.validators.MaxValueValidator(decimal.Decimal("180")),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="ward",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from core.regions import backfill
+    # After centers, whose wards users' wards link to
+    backfill(apps.get_model, models=[('users', 'User')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("centers", "0007_center_regions"),
+        ("core", "0005_regions"),
+        ("users", "0003_user_latitude_user_longitude_user_ward"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="county_ref",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Set from county",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="users",
+                to="core.county",
+                verbose_name="county",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="ward_ref",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Set from ward",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="users",
+                to="core.ward",
+                verbose_name="ward",
+            ),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
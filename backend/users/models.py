@@ -1,6 +1,10 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-import uuid
+from django.core.validators import MaxValueValidator, MinValueValidator
+from core.ids import uuid7
+from core.regions import RegionFields
 
 
 class UserManager(BaseUserManager):
@@ -29,13 +33,22 @@ class UserManager(BaseUserManager):
         return self.create_user(phone_number, email, password, **extra_fields)
 
 
-class User(AbstractUser):
+class User(RegionFields, AbstractUser):
     """
     Custom user model for PamojaVote
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     phone_number = models.CharField(max_length=15, unique=True)
     county = models.CharField(max_length=50, blank=True, null=True)
+    ward = models.CharField(max_length=100, blank=True, null=True)
+    county_ref = models.ForeignKey('core.County', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                   related_name='users', verbose_name='county', help_text="Set from county")
+    ward_ref = models.ForeignKey('core.Ward', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                 related_name='users', verbose_name='ward', help_text="Set from ward")
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True,
+                                   validators=[MinValueValidator(Decimal('-90')), MaxValueValidator(Decimal('90'))])
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True,
+                                    validators=[MinValueValidator(Decimal('-180')), MaxValueValidator(Decimal('180'))])
     profile_pic = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -47,8 +60,16 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    region_fields = ('county', 'ward')
+
     def __str__(self):
         return f"{self.phone_number} - {self.get_full_name()}"
 
+    def get_coordinates(self):
+        """Return coordinates as a tuple"""
+        if self.latitude is not None and self.longitude is not None:
+            return (float(self.latitude), float(self.longitude))
+        return None
+
     class Meta:
         ordering = ['-created_at']
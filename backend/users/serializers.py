@@ -10,7 +10,7 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'phone_number', 'email', 'first_name', 'last_name',
-                 'county', 'profile_pic', 'created_at', 'password')
+                 'county', 'ward', 'latitude', 'longitude', 'profile_pic', 'created_at', 'password')
         read_only_fields = ('id', 'created_at')
 
     def create(self, validated_data):
@@ -26,7 +26,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ('first_name', 'last_name', 'county', 'profile_pic')
+        fields = ('first_name', 'last_name', 'county', 'ward', 'latitude', 'longitude', 'profile_pic')
         read_only_fields = ('phone_number', 'email')
 
 
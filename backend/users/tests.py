@@ -1,3 +1,40 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import User
+from .serializers import UserUpdateSerializer
+
+
+class LocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('+254700000001', 'user@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile(self):
+        response = self.client.patch('/api/auth/profile/', {'latitude': '-1.28640000', 'longitude': '36.81720000'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.get_coordinates(), (-1.2864, 36.8172))
+        data = self.client.get('/api/auth/profile/').json()
+        self.assertEqual((data['latitude'], data['longitude']), ('-1.28640000', '36.81720000'))
+
+    def test_range(self):
+        for field, value in [('latitude', '90.00000001'), ('latitude', '-91'), ('longitude', '180.5'),
+                             ('longitude', '-181')]:
+            with self.subTest(field=field, value=value):
+                serializer = UserUpdateSerializer(self.user, data={field: value}, partial=True)
+                self.assertFalse(serializer.is_valid())
+                self.assertIn(field, serializer.errors)
+        serializer = UserUpdateSerializer(self.user, data={'latitude': '-90', 'longitude': '180'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
 
-# Create your tests here.
+    def test_model_validators(self):
+        self.user.latitude, self.user.longitude = Decimal('-90.5'), Decimal('180.00000001')
+        with self.assertRaises(ValidationError) as raised:
+            self.user.full_clean(exclude=['password'])
+        self.assertEqual(set(raised.exception.message_dict), {'latitude', 'longitude'})
@@ -6,6 +6,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
 import random
 import string
+from core import metrics
+from core.throttling import IPRateThrottle, PhoneRateThrottle
 from .models import User
 from .serializers import (
     UserSerializer, UserUpdateSerializer, LoginSerializer,
@@ -18,6 +20,8 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'otp_send'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -28,12 +32,14 @@ class RegisterView(generics.CreateAPIView):
         otp = '123456'  # Mock OTP
 
         # In production, integrate with Twilio Verify API
-        # twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        # (core.integrations.get_twilio_client imports twilio on first use)
+        # twilio_client = get_twilio_client()
         # verification = twilio_client.verify.services(settings.TWILIO_VERIFY_SID).verifications.create(
         #     to=phone_number, channel='sms'
         # )
 
         user = serializer.save()
+        metrics.OTP_SENT.inc(flow='register')
 
         return Response({
             'message': 'User registered successfully. Please verify OTP.',
@@ -48,6 +54,8 @@ class RegisterView(generics.CreateAPIView):
 class LoginView(APIView):
     """Login with phone number (sends OTP)"""
     permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'otp_send'
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -70,10 +78,12 @@ class LoginView(APIView):
             )
 
         # In production, integrate with Twilio Verify API
-        # twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        # (core.integrations.get_twilio_client imports twilio on first use)
+        # twilio_client = get_twilio_client()
         # verification = twilio_client.verify.services(settings.TWILIO_VERIFY_SID).verifications.create(
         #     to=phone_number, channel='sms'
         # )
+        metrics.OTP_SENT.inc(flow='login')
 
         return Response({
             'message': 'OTP sent to your phone number.',
@@ -86,9 +96,13 @@ class LoginView(APIView):
 class VerifyOTPView(APIView):
     """Verify OTP and get JWT tokens"""
     permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'otp_verify'
 
     def post(self, request):
         serializer = OTPSerializer(data=request.data)
+        valid = serializer.is_valid()
+        metrics.OTP_VERIFICATIONS.inc(result='success' if valid else 'failure')
         serializer.is_valid(raise_exception=True)
 
         user = serializer.validated_data['user']
@@ -113,6 +127,8 @@ class VerifyOTPView(APIView):
 class PasswordResetView(APIView):
     """Reset password with OTP"""
     permission_classes = [AllowAny]
+    throttle_classes = [PhoneRateThrottle, IPRateThrottle]
+    throttle_scope = 'otp_verify'
 
     def post(self, request):
         serializer = PasswordResetSerializer(data=request.data)